@@ -1,4 +1,11 @@
+import os
 from demo_web import app
 
 if __name__ == '__main__':
+    # reloader 的監看程序不處理請求，只在實際服務的程序裡載入模型
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        from material_segmentation.object_detect import detectors
+        from material_segmentation.run_on_image_cpu import get_segmenter
+        detectors.preload(app.config.get('DETECTOR_MODELS', []))
+        get_segmenter().warmup()
     app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=True)
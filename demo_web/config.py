@@ -7,4 +7,6 @@ class Config:
     #SECRET_KEY = secrets.token_hex(16)
     SECRET_KEY = 'your-fixed-secret-key-here-for-development'
     SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(BASE_DIR, 'site.db')
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # YOLO 模型在 worker 啟動時先載入並 warmup
+    DETECTOR_MODELS = ['yolo12x.pt']
@@ -2,11 +2,14 @@
 import os, shutil, subprocess, platform, time
 from realsense.no_cap import no_cap
 from realsense.coor_reconstruct import *
-from material_segmentation.object_detect import detect_objects
+from material_segmentation.object_detect import detect_objects, detect_objects_batch
 from material_segmentation.run_on_image_cpu import run_on_image_cpu
 from material_segmentation.dbscan2 import dbscan_clustering
 from material_segmentation.build_obs import build_obs_json
 from material_segmentation.fds import generate_fds
+from realsense.point_io import POINT_FORMAT, point_path as point_file_path
+from realsense.voxel import voxel_downsample_file
+from realsense.stitch import decode_captures, stitch_point_files
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DEMO_DIR = os.path.join(BASE_DIR, 'demo_web')
@@ -22,29 +25,80 @@ def run_media_bat():
     return res.stdout
 
 
-def run_pipeline(pic_input: str) -> dict:
+def run_stitched(bag_files: list, out_dir: str, point_format: str = POINT_FORMAT, voxel_size: float = None,
+                 depth_filters=None, workers: int = None, detect_on_projection: bool = False,
+                 artifacts: bool = True) -> tuple:
+    """
+    Several .bag captures of the same room: decode them in parallel (one process per bag),
+    detect objects / materials on each capture's own image, then register and merge the
+    labelled world-space clouds into pointcloud_stitched.<fmt>.
+    voxel_size: downsample each capture's world-space cloud right after decoding, see run_pipeline.
+    """
+    captures = decode_captures(bag_files, out_dir, workers, point_format=point_format, depth_filters=depth_filters)
+    if voxel_size:
+        for cap in captures:
+            voxel_downsample_file(cap['pointcloud'], voxel_size)
+    # 降採樣後的點雲重建不出完整影像，YOLO 改看 projection.png
+    on_projection = detect_on_projection or bool(voxel_size)
+    # 所有 capture 一起送進 YOLO (batched)
+    detected = detect_objects_batch([cap['pointcloud'] for cap in captures], [cap['out_dir'] for cap in captures],
+                                    image_paths=[cap['projection'] if on_projection else None for cap in captures],
+                                    plot=artifacts)
+    labelled = []
+    for cap, obj_out in zip(captures, detected):
+        seg_out = run_on_image_cpu(cap['projection'], obj_out['object_csv'], cap['out_dir'], artifacts=artifacts)
+        labelled.append(seg_out['output_csv'])
+
+    stitched = stitch_point_files(labelled, point_file_path(out_dir, 'pointcloud_stitched', point_format))
+    real_out = {'captures': captures, 'pointcloud': stitched['pointcloud']}
+    seg_out = {'output_csv': stitched['pointcloud'], 'registrations': stitched['registrations']}
+    return real_out, seg_out
+
+
+def run_pipeline(pic_input, point_format: str = POINT_FORMAT, voxel_size: float = None,
+                 depth_filters=None, workers: int = None, detect_on_projection: bool = False,
+                 artifacts: bool = True) -> dict:
+    """
+    pic_input: one .bag, or a list of .bag captures of the same room to stitch together.
+    detect_on_projection: run YOLO on no_cap's projection.png instead of the image rebuilt from the points.
+    voxel_size: voxel edge (m) the world-space cloud is downsampled to right after world_coordinates,
+    so detection, material lookup, clustering and build_obs all see one point per voxel. YOLO and the
+    material network then run on projection.png and label each voxel by its representative u / v.
+    artifacts: render the YOLO / material preview images (in the background), False skips them.
+    """
     timestamp = time.strftime("%Y%m%d_%H%M%S")
     os.makedirs(FILE_DIR, exist_ok=True)
     os.makedirs(os.path.join(FILE_DIR, timestamp), exist_ok=True)
     out_dir = os.path.join(FILE_DIR, timestamp)
-    if pic_input.endswith('.bag'):
+    bag_files = list(pic_input) if isinstance(pic_input, (list, tuple)) else None
+    if bag_files is None and pic_input.endswith('.bag'):
         bag_file = pic_input
     try:
-        # 1. Realsense
-        real_out = no_cap(bag_file, out_dir)
-        world_coordinates(bag_file, real_out['pointcloud'])
+        if bag_files:
+            # 1.-3. 多個 capture：平行解碼 + 各自偵測 / 材質分割，再拼接
+            real_out, seg_out = run_stitched(bag_files, out_dir, point_format, voxel_size, depth_filters, workers,
+                                             detect_on_projection, artifacts)
+        else:
+            # 1. Realsense
+            real_out = no_cap(bag_file, out_dir, point_format=point_format, depth_filters=depth_filters)
+            world_coordinates(bag_file, real_out['pointcloud'], calibration=real_out['calibration'])
+            if voxel_size:
+                # 每個 voxel 只留一點 (公尺)，後面各階段的點數跟著變少
+                voxel_downsample_file(real_out['pointcloud'], voxel_size)
         
-        # 2. Object detection
-        point_path = real_out['pointcloud']
-        obj_out = detect_objects(point_path, out_dir)
+            # 2. Object detection (降採樣後改在 projection.png 上偵測)
+            point_path = real_out['pointcloud']
+            obj_out = detect_objects(point_path, out_dir,
+                                     image_path=real_out['projection'] if detect_on_projection or voxel_size else None,
+                                     artifacts=artifacts)
         
-        # 3. Material segmentation
-        img_path = real_out['projection']
-        point_path = obj_out['object_csv']
-        print(f'[INFO] {timestamp}')
-        print(f'[INFO] {img_path}')
-        print(f'[INFO] {point_path}')
-        seg_out = run_on_image_cpu(img_path, point_path, out_dir)
+            # 3. Material segmentation
+            img_path = real_out['projection']
+            point_path = obj_out['object_csv']
+            print(f'[INFO] {timestamp}')
+            print(f'[INFO] {img_path}')
+            print(f'[INFO] {point_path}')
+            seg_out = run_on_image_cpu(img_path, point_path, out_dir, artifacts=artifacts)
         
         # 4. DBSCAN clustering
         db_out = dbscan_clustering(seg_out['output_csv'], out_dir)
@@ -0,0 +1,124 @@
+"""
+Debug / preview images of the pipeline (YOLO boxes, material overlay + legend), rendered off the
+request path: one background thread, headless Agg figures that never enter pyplot's global
+state and are cleared as soon as they are saved. Jobs pass artifacts=False to skip them.
+
+    future = artifacts.submit(render_detections, results.plot, path)
+    artifacts.wait()                     # only needed by scripts that exit right away
+"""
+import numpy as np
+import cv2
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.patches import Rectangle
+
+MATL_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MAX_PENDING = 8     # 排隊中的圖超過這個數量就略過新的，避免拖慢 pipeline / 吃記憶體
+
+class ArtifactWriter:
+    def __init__(self, max_pending: int = MAX_PENDING):
+        self.max_pending = max_pending
+        self.skipped = 0
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._futures = []
+        self._pool = None
+
+    def submit(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on the artifact thread, None if the backlog is full."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.skipped += 1
+                print(f"[WARN] artifact backlog full, skipped {getattr(fn, '__name__', fn)}")
+                return None
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='artifacts')
+            self._pending += 1
+            future = self._pool.submit(fn, *args, **kwargs)
+            self._futures = [f for f in self._futures if not f.done()] + [future]
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self._pending -= 1
+        if future.exception() is not None:
+            print(f"[WARN] artifact failed: {future.exception()!r}")
+
+    def wait(self):
+        """Block until every submitted artifact is written."""
+        with self._lock:
+            futures = list(self._futures)
+        for future in futures:
+            future.exception()
+
+    def close(self):
+        self.wait()
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+artifacts = ArtifactWriter()
+
+def load_palette(path: str = os.path.join(MATL_DIR, 'palette.txt')) -> np.ndarray:
+    return np.loadtxt(path).astype(np.uint8)
+
+def color_image_w_masks(image, masks, palette=None):
+    image = image.astype(np.uint8)
+    palette = load_palette() if palette is None else palette
+
+    for index in range(23):
+        mask = (masks == index).astype(np.uint8)
+        if mask.sum() == 0:
+            continue
+        color = palette[index]
+        mask = np.expand_dims(mask, axis=-1)
+        mask = np.repeat(mask, 3, axis=-1)
+        mask = mask * np.array(color).reshape((-1, 3)) + (1 - mask) * image
+        mask = mask.astype(np.uint8)
+        image = cv2.addWeighted(image, .2, mask, .8, 0)
+    return image
+
+def _save(fig: Figure, path: str, **kwargs) -> str:
+    try:
+        FigureCanvasAgg(fig)
+        fig.savefig(path, **kwargs)
+    finally:
+        fig.clear()
+    return path
+
+def render_detections(annotated, path: str) -> str:
+    """YOLO annotated image (BGR array, or a callable returning one, e.g. results.plot)."""
+    if callable(annotated):
+        annotated = annotated()
+    fig = Figure()
+    ax = fig.add_subplot()
+    ax.imshow(cv2.cvtColor(annotated, cv2.COLOR_BGR2RGB))
+    ax.set_title("YOLOv12 Detection")
+    ax.axis('off')
+    return _save(fig, path, bbox_inches='tight', pad_inches=0.1)
+
+def render_materials(img, labelmap, labels, path: str, labelmap_path: str = None, palette=None) -> str:
+    """Material overlay with a legend of all 23 classes, plus the raw labelmap as text when labelmap_path is given."""
+    palette = load_palette() if palette is None else palette
+    fig = Figure(figsize=(15, 15))
+    ax = fig.add_subplot()
+
+    # 使用color_image_w_masks函數將所有材質標籤合併到同一張圖上
+    colored_image = color_image_w_masks(img.copy(), labelmap, palette)
+    ax.imshow(colored_image[:, :, ::-1])
+    ax.axis("off")
+
+    # 添加圖例
+    legend_elements = [Rectangle((0, 0), 1, 1, fc=tuple(palette[i] / 255.0), label=labels[i]) for i in range(23)]
+    ax.legend(handles=legend_elements, bbox_to_anchor=(1.05, 1), loc='upper left', borderaxespad=0.)
+    fig.tight_layout()
+    _save(fig, path, bbox_inches='tight')
+    if labelmap_path is not None:
+        np.savetxt(labelmap_path, labelmap, fmt='%d')
+    return path
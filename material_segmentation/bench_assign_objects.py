@@ -0,0 +1,79 @@
+"""
+Parity + timing check of the label-raster point assignment (object_detect.assign_objects)
+against the old per-box df.loc loop, on synthetic points and random overlapping boxes.
+NO NEED of YOLO weights or a capture.
+Usage: python -m material_segmentation.bench_assign_objects [--points 307200 --boxes 1 10 50]
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from material_segmentation.object_detect import assign_objects
+
+def synthetic_points(n, width=640, height=480, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'x': rng.normal(size=n).astype(np.float32),
+        'y': rng.normal(size=n).astype(np.float32),
+        'z': rng.uniform(0.3, 4, n).astype(np.float32),
+        'u': rng.integers(0, width, n).astype(np.uint16),
+        'v': rng.integers(0, height, n).astype(np.uint16),
+    })
+
+def synthetic_detections(n, width=640, height=480, seed=0):
+    rng = np.random.default_rng(seed)
+    # YOLO 的框是 float32，會貼齊影像邊界，也會有一樣大的框
+    x1 = rng.uniform(-5, width, n).clip(0, width).astype(np.float32)
+    y1 = rng.uniform(-5, height, n).clip(0, height).astype(np.float32)
+    x2 = (x1 + rng.uniform(1, width / 2, n)).clip(0, width).astype(np.float32)
+    y2 = (y1 + rng.uniform(1, height / 2, n)).clip(0, height).astype(np.float32)
+    if n > 1:
+        x1[1], y1[1], x2[1], y2[1] = x1[0], y1[0], x2[0], y2[0]
+    rows = [{"label": f"cls{i % 7}", "score": 0.5, "x1": a, "y1": b, "x2": c, "y2": d, "area": (c - a) * (d - b)}
+            for i, (a, b, c, d) in enumerate(zip(x1, y1, x2, y2))]
+    detection_results = pd.DataFrame(rows, columns=["label", "score", "x1", "y1", "x2", "y2", "area"])
+    return detection_results.sort_values(by="area", ascending=True).reset_index(drop=True)
+
+def loop_assign(df, detection_results):
+    # the old detect_objects body
+    df["object_label"] = ""
+    df["object_num"] = np.nan
+    df["bbox_x1"] = np.nan
+    df["bbox_y1"] = np.nan
+    df["bbox_x2"] = np.nan
+    df["bbox_y2"] = np.nan
+    for obj_id, (_, det) in enumerate(detection_results.iterrows(), start=1):
+        x1, y1, x2, y2 = det["x1"], det["y1"], det["x2"], det["y2"]
+        label = det["label"]
+        mask = (
+            (df["u"] >= x1) & (df["u"] <= x2) &
+            (df["v"] >= y1) & (df["v"] <= y2) &
+            (df["object_label"] == "")
+        )
+        df.loc[mask, "object_label"] = label
+        df.loc[mask, "object_num"] = obj_id
+        df.loc[mask, "bbox_x1"] = round(x1, 2)
+        df.loc[mask, "bbox_y1"] = round(y1, 2)
+        df.loc[mask, "bbox_x2"] = round(x2, 2)
+        df.loc[mask, "bbox_y2"] = round(y2, 2)
+    return df
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--points', type=int, default=640 * 480)
+    parser.add_argument('--boxes', type=int, nargs='+', default=[0, 1, 10, 50])
+    args = parser.parse_args()
+
+    df = synthetic_points(args.points)
+    for n in args.boxes:
+        detection_results = synthetic_detections(n, seed=n)
+        t0 = time.perf_counter()
+        expected = loop_assign(df.copy(), detection_results)
+        t1 = time.perf_counter()
+        got = assign_objects(df, detection_results)
+        t2 = time.perf_counter()
+        pd.testing.assert_frame_equal(got, expected)
+        print(f"{n:3d} boxes: loop {(t1 - t0) * 1000:8.1f} ms, raster {(t2 - t1) * 1000:6.1f} ms, identical")
+
+if __name__ == "__main__":
+    main()
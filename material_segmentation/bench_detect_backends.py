@@ -0,0 +1,86 @@
+"""
+Latency and detection agreement of the YOLO CPU backends (torch / onnx / openvino) on the
+sample images in material_segmentation/images. The first backend is the reference, a box of
+another backend agrees when it has the same label and IoU >= --iou with a reference box.
+Exports are cached next to the weights, so only the first run pays for them.
+Usage: python -m material_segmentation.bench_detect_backends [--model yolo12x.pt --backends torch onnx openvino
+                                                              --imgsz 640 --threads 4 --repeat 5]
+"""
+import argparse
+import glob
+import os
+import time
+import cv2
+import numpy as np
+from material_segmentation.object_detect import MATL_DIR, DETECTOR_BACKENDS, DETECTOR_IMGSZ, \
+    detect_image, detector_timings
+
+def box_iou(a, b):
+    """IoU matrix between two (N, 4) / (M, 4) xyxy arrays."""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+def match_detections(reference, candidate, iou_threshold: float = 0.5) -> int:
+    """Greedy one-to-one matching (highest IoU first, same label), returns the number of matches."""
+    if len(reference) == 0 or len(candidate) == 0:
+        return 0
+    cols = ['x1', 'y1', 'x2', 'y2']
+    iou = box_iou(reference[cols].to_numpy(np.float64), candidate[cols].to_numpy(np.float64))
+    iou[reference['label'].to_numpy()[:, None] != candidate['label'].to_numpy()[None, :]] = 0
+    matched = 0
+    while iou.size and iou.max() >= iou_threshold:
+        i, j = np.unravel_index(iou.argmax(), iou.shape)
+        iou[i, :] = 0
+        iou[:, j] = 0
+        matched += 1
+    return matched
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', default='yolo12x.pt')
+    parser.add_argument('--backends', nargs='+', default=list(DETECTOR_BACKENDS), choices=DETECTOR_BACKENDS)
+    parser.add_argument('--images', default=os.path.join(MATL_DIR, 'images'))
+    parser.add_argument('--imgsz', type=int, default=DETECTOR_IMGSZ)
+    parser.add_argument('--threads', type=int, default=None, help='torch backend only')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--iou', type=float, default=0.5)
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.images, '*.jpg')) + glob.glob(os.path.join(args.images, '*.png')))
+    images = [cv2.imread(p) for p in paths]
+    print(f"{len(images)} images from {args.images}, imgsz {args.imgsz}, torch threads {args.threads or 'default'}")
+
+    detections, latency = {}, {}
+    for backend in args.backends:
+        detections[backend], times = [], []
+        for image in images:
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                _, table = detect_image(image, args.model, backend, args.imgsz,
+                                        args.threads if backend == 'torch' else None)
+                times.append(time.perf_counter() - t0)
+            detections[backend].append(table)
+        latency[backend] = np.median(times) * 1000
+
+    reference = args.backends[0]
+    n_ref = sum(len(t) for t in detections[reference])
+    print(f"\n{'backend':<10} {'median ms':>10} {'boxes':>6} {'agree':>7}   (reference: {reference})")
+    for backend in args.backends:
+        n = sum(len(t) for t in detections[backend])
+        matched = sum(match_detections(r, c, args.iou) for r, c in zip(detections[reference], detections[backend]))
+        agree = matched / max(n_ref, n, 1)
+        print(f"{backend:<10} {latency[backend]:10.1f} {n:6d} {agree:7.1%}")
+
+    print("\ncold start:")
+    for (model_path, backend, imgsz), t in detector_timings().items():
+        print(f"  {model_path} {backend:<9} export {t['export_s']:6.2f} s  load {t['load_s']:5.2f} s  "
+              f"warmup {t['warmup_s']:5.2f} s")
+
+if __name__ == "__main__":
+    main()
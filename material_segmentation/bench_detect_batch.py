@@ -0,0 +1,48 @@
+"""
+Throughput of detect_objects_batch against the single-frame loop (one detect_image per frame).
+Frames are the sample images in material_segmentation/images resized to the capture size and
+repeated up to --frames; detections of every batch size are compared with the loop's.
+Usage: python -m material_segmentation.bench_detect_batch [--model yolo12x.pt --frames 24 --batch-sizes 1 2 4 8]
+"""
+import argparse
+import glob
+import os
+import time
+import cv2
+from material_segmentation.object_detect import MATL_DIR, DETECTOR_IMGSZ, detect_image, detect_objects_batch
+from material_segmentation.bench_detect_backends import match_detections
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', default='yolo12x.pt')
+    parser.add_argument('--images', default=os.path.join(MATL_DIR, 'images'))
+    parser.add_argument('--frames', type=int, default=24)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--imgsz', type=int, default=DETECTOR_IMGSZ)
+    parser.add_argument('--threads', type=int, default=None)
+    args = parser.parse_args()
+
+    samples = [cv2.resize(cv2.imread(p), (640, 480)) for p in sorted(glob.glob(os.path.join(args.images, '*.jpg')))]
+    frames = [samples[i % len(samples)] for i in range(args.frames)]
+
+    # 先載入 + warmup，計時不含 cold start
+    detect_image(frames[0], args.model, imgsz=args.imgsz, threads=args.threads)
+
+    t0 = time.perf_counter()
+    reference = [detect_image(f, args.model, imgsz=args.imgsz, threads=args.threads)[1] for f in frames]
+    loop_fps = len(frames) / (time.perf_counter() - t0)
+    n_ref = sum(len(t) for t in reference)
+    print(f"{len(frames)} frames, single-frame loop: {loop_fps:6.2f} FPS")
+
+    for batch_size in args.batch_sizes:
+        t0 = time.perf_counter()
+        outputs = detect_objects_batch(frames, model_path=args.model, batch_size=batch_size,
+                                       imgsz=args.imgsz, threads=args.threads)
+        fps = len(frames) / (time.perf_counter() - t0)
+        n = sum(len(o['detections']) for o in outputs)
+        matched = sum(match_detections(r, o['detections']) for r, o in zip(reference, outputs))
+        print(f"batch {batch_size:2d}: {fps:6.2f} FPS  x{fps / loop_fps:4.2f}  "
+              f"agree {matched / max(n_ref, n, 1):7.1%}")
+
+if __name__ == "__main__":
+    main()
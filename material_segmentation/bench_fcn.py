@@ -0,0 +1,92 @@
+"""
+Checks of the size-generic shift_pool (models/googlenet.py, models/vgg.py):
+  1. 256x256 patches: shift_pool and the full googlenet / vgg16 outputs equal the old 16x16-only code.
+  2. arbitrary input sizes run, the output map is about 1/16 of the input.
+  3. tiled vs whole-image (tiled=False) multi-scale inference: latency and labelmap agreement.
+Usage: python -m material_segmentation.bench_fcn [--size 512 --repeat 3 --skip-vgg]
+"""
+import argparse
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+import material_segmentation.models.googlenet as googlenet_module
+import material_segmentation.models.vgg as vgg_module
+from material_segmentation.run_on_image_cpu import multi_scale_inference
+from material_segmentation.bench_minc import load_model, sample_images, timed
+
+def old_shift_pool(x, pool2d):
+    # the 256x256-only version
+    n,c,h,w = x.size()
+    x = F.pad(x, (1, 1, 1, 1), "constant", 0)
+    x0 = pool2d(x[:, :, :-1, :-1]).unsqueeze(2)
+    x1 = pool2d(x[:, :, :-1, 1: ]).unsqueeze(2)
+    x2 = pool2d(x[:, :, 1: , :-1]).unsqueeze(2)
+    x3 = pool2d(x[:, :, 1: , 1: ]).unsqueeze(2)
+    x = torch.cat((x0, x1, x2, x3), 2)
+    x = x.view(n, c, 4, 64)
+    x = x.permute(0,1,3,2)
+    x = x.view(n,c,8,8,2,2)
+    x = x.permute(0,1,2,4,3,5)
+    x = x.reshape(n,c,16,16)
+    return x
+
+def model_output(module, model, x, shift_pool):
+    new_shift_pool = module.shift_pool
+    module.shift_pool = shift_pool
+    try:
+        return model(x)
+    finally:
+        module.shift_pool = new_shift_pool
+
+def check_patch_parity(skip_vgg: bool):
+    torch.manual_seed(0)
+    x = torch.relu(torch.randn(2, 64, 16, 16))
+    for name, pool in [('maxpool', nn.MaxPool2d(3, stride=2, ceil_mode=True)), ('adapool', nn.AdaptiveAvgPool2d((8, 8)))]:
+        same = torch.equal(googlenet_module.shift_pool(x, pool), old_shift_pool(x, pool))
+        print(f"shift_pool 16x16 {name:<8} identical {same}")
+
+    models = [('googlenet', googlenet_module, load_model())]
+    if not skip_vgg:
+        torch.manual_seed(0)
+        models.append(('vgg16', vgg_module, vgg_module.vgg16().eval()))
+    rgb = torch.randn(2, 3, 256, 256) * 50
+    for name, module, model in models:
+        new = model_output(module, model, rgb, module.shift_pool)
+        old = model_output(module, model, rgb, old_shift_pool)
+        print(f"{name:<9} 256x256 output {tuple(new.shape)} identical {torch.equal(new, old)}")
+    return models
+
+def check_sizes(models):
+    for h, w in [(256, 256), (384, 512), (300, 417), (768, 768)]:
+        rgb = torch.randn(1, 3, h, w) * 50
+        for name, _, model in models:
+            if name == 'vgg16' and h * w > 256 * 256 * 4:
+                continue
+            out = model(rgb)
+            print(f"{name:<9} {h}x{w} -> {tuple(out.shape[2:])}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=512)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--skip-vgg', action='store_true')
+    args = parser.parse_args()
+
+    with torch.inference_mode():
+        models = check_patch_parity(args.skip_vgg)
+        check_sizes(models)
+
+        model = models[0][2]
+        tiled_ms, whole_ms, agree = [], [], []
+        for img in sample_images(args.size):
+            tiled, ms_t = timed(lambda: multi_scale_inference(img, model), args.repeat)
+            whole, ms_w = timed(lambda: multi_scale_inference(img, model, tiled=False), args.repeat)
+            tiled_ms.append(ms_t)
+            whole_ms.append(ms_w)
+            agree.append(np.mean(tiled.argmax(-1) == whole.argmax(-1)))
+    print(f"multi-scale {args.size}x{args.size}: tiled {np.mean(tiled_ms):.1f} ms, whole image {np.mean(whole_ms):.1f} ms "
+          f"(x{np.mean(tiled_ms) / np.mean(whole_ms):.2f}), labelmap agreement {np.mean(agree):.1%}")
+
+if __name__ == "__main__":
+    main()
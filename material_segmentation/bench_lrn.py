@@ -0,0 +1,76 @@
+"""
+Fused LRN (models/googlenet.py, LRN(impl='fused')) against the original AvgPool3d LRN:
+  1. numerical equivalence of both LRN call sites, inference and autograd (output + input grad).
+  2. per-layer timing and feature-map sized allocations (torch.profiler) at those call sites.
+  3. full googlenet, same weights: logit difference, argmax agreement and forward time.
+Shapes are those of a TILE_BATCH batch of 256x256 tiles.
+Usage: python -m material_segmentation.bench_lrn [--batch 16 --repeat 10]
+"""
+import argparse
+import numpy as np
+import torch
+from torch.profiler import profile, ProfilerActivity
+from material_segmentation.models.googlenet import LRN, googlenet
+from material_segmentation.run_on_image_cpu import TILE, TILE_BATCH
+from material_segmentation.bench_minc import timed
+
+def lrn_sites(batch: int) -> dict:
+    # conv1 -> maxpool1 -> lrn (64 ch, 1/4) and conv2_3x3 -> lrn (192 ch, 1/4)
+    return {'lrn1': (batch, 64, TILE // 4, TILE // 4), 'lrn2': (batch, 192, TILE // 4, TILE // 4)}
+
+def feature_map_allocations(fn, x) -> tuple:
+    """(count, MB) of allocations of at least one feature map made by the top-level ops of fn(x)."""
+    with profile(activities=[ProfilerActivity.CPU], profile_memory=True) as prof:
+        fn(x)
+    nbytes = x.numel() * x.element_size()
+    sizes = [e.cpu_memory_usage for e in prof.events() if e.cpu_parent is None and e.cpu_memory_usage >= nbytes]
+    return len(sizes), sum(sizes) / 2**20
+
+def check_equivalence(shape):
+    torch.manual_seed(0)
+    x = torch.relu(torch.randn(shape)) * 30
+    pool, fused = LRN(impl='pool'), LRN(impl='fused')
+    with torch.no_grad():
+        ref = pool(x)
+        out = fused(x)
+    xa = x.clone().requires_grad_(True)
+    xb = x.clone().requires_grad_(True)
+    pool(xa).square().sum().backward()
+    fused(xb).square().sum().backward()
+    rel = ((out - ref).abs() / ref.abs().clamp_min(1e-6)).max().item()
+    grad = ((xb.grad - xa.grad).abs().max() / xa.grad.abs().max()).item()
+    return (out - ref).abs().max().item(), rel, grad
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch', type=int, default=TILE_BATCH)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{torch.get_num_threads()} threads, batch {args.batch}")
+    for name, shape in lrn_sites(args.batch).items():
+        abs_diff, rel_diff, grad_diff = check_equivalence(shape)
+        print(f"\n{name} {shape}: max |d| {abs_diff:.2e}, max rel {rel_diff:.2e}, grad rel {grad_diff:.2e}")
+        x = torch.relu(torch.randn(shape))
+        with torch.inference_mode():
+            for impl in ('pool', 'fused'):
+                layer = LRN(impl=impl)
+                layer(x)
+                _, ms = timed(lambda: layer(x), args.repeat)
+                count, mb = feature_map_allocations(layer, x)
+                print(f"  {impl:<6} {ms:8.2f} ms   {count} feature-map allocations, {mb:7.1f} MB")
+
+    torch.manual_seed(0)
+    pool_model = googlenet(lrn='pool').eval()
+    fused_model = googlenet(lrn='fused').eval()
+    fused_model.load_state_dict(pool_model.state_dict())
+    x = torch.randn(args.batch, 3, TILE, TILE) * 50
+    with torch.inference_mode():
+        ref, ms_pool = timed(lambda: pool_model(x), max(1, args.repeat // 5))
+        out, ms_fused = timed(lambda: fused_model(x), max(1, args.repeat // 5))
+    agree = (ref.argmax(1) == out.argmax(1)).float().mean().item()
+    print(f"\ngooglenet {tuple(x.shape)}: max |dlogit| {(out - ref).abs().max().item():.2e}, argmax agreement {agree:.2%}, "
+          f"pool {ms_pool:.1f} ms, fused {ms_fused:.1f} ms")
+
+if __name__ == "__main__":
+    main()
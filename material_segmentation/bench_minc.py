@@ -0,0 +1,127 @@
+"""
+Parity + CPU latency of the batched multi-scale MINC inference (run_on_image_cpu.multi_scale_inference)
+against the old one-tile-at-a-time loop, on the sample images in material_segmentation/images.
+Uses weights/minc-googlenet.pth when present, seeded random weights otherwise (parity only then).
+Usage: python -m material_segmentation.bench_minc [--size 512 --batch 16 --repeat 3]
+"""
+import argparse
+import glob
+import os
+import tempfile
+import time
+import cv2
+import numpy as np
+import torch
+import torch.nn as nn
+from material_segmentation.models.googlenet import googlenet
+from material_segmentation.run_on_image_cpu import MATL_DIR, MINC_WEIGHTS, TILE_BATCH, image_tiles, multi_scale_inference
+
+def load_model(weights: str = MINC_WEIGHTS, seed: int = 0):
+    model = googlenet()
+    if os.path.exists(weights):
+        model.load_state_dict(torch.load(weights, weights_only=True), strict=False)
+    else:
+        print(f"[WARN] {weights} not found, using random weights")
+        torch.manual_seed(seed)
+        model = googlenet()
+    return model.eval()
+
+def normalized_googlenet(seed: int = 0, logit_std: float = 4.0):
+    """
+    Seeded random googlenet whose convs are rescaled, in forward order, to unit output std on a
+    sample image (classifier: logit_std). Plain random weights give near-constant logits and one
+    label everywhere, this one gives signed logits and several labels, so precision modes can be
+    compared against fp32 without the real weights.
+    """
+    torch.manual_seed(seed)
+    model = googlenet().eval()
+    def rescale(module, inputs, out):
+        std = out.std() / (logit_std if module is model.conv_fc8 else 1.0)
+        module.weight.data.div_(std)
+        module.bias.data.div_(std)
+        return out / std
+    hooks = [m.register_forward_hook(rescale) for m in model.modules() if isinstance(m, nn.Conv2d)]
+    with torch.no_grad():
+        model(image_tiles(sample_images()[0])[0])
+    for hook in hooks:
+        hook.remove()
+    return model
+
+def weights_or_random(weights: str = MINC_WEIGHTS, seed: int = 0) -> str:
+    """weights when it exists, else a temporary file with normalized_googlenet weights."""
+    if os.path.exists(weights):
+        return weights
+    print(f"[WARN] {weights} not found, using normalized random weights")
+    path = os.path.join(tempfile.mkdtemp(prefix='minc_'), os.path.basename(weights))
+    torch.save(normalized_googlenet(seed).state_dict(), path)
+    return path
+
+def sample_images(size: int = 512, images_dir: str = os.path.join(MATL_DIR, 'images')) -> list:
+    return [cv2.resize(cv2.imread(p), (size, size)) for p in sorted(glob.glob(os.path.join(images_dir, '*.jpg')))]
+
+def timed(fn, repeat: int):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t0)
+    return out, np.median(times) * 1000
+
+# ---- the old implementation ----
+def loop_inference_on_whole_image(img, model):
+    h, w, c = img.shape
+    h_ = (h // 256 + 1) * 256 if h % 256 != 0 else h
+    w_ = (w // 256 + 1) * 256 if w % 256 != 0 else w
+    img = cv2.resize(img, (w_, h_))
+    img = img.astype(np.float32).transpose(2, 0, 1)
+    img[0, :, :] -= 104
+    img[1, :, :] -= 117
+    img[2, :, :] -= 124
+    img = torch.FloatTensor(img).unsqueeze(0)
+    softmax = nn.Softmax(dim=1)
+    prob = np.zeros((h_, w_, 23))
+    for i in range(h_ // 256):
+        for j in range(w_ // 256):
+            pred = model(img[:, :, i*256:(i+1)*256, j*256:(j+1)*256])
+            pred = softmax(pred).squeeze().cpu().numpy().transpose(1, 2, 0)
+            prob[i*256:(i+1)*256, j*256:(j+1)*256, :] = cv2.resize(pred, (256, 256))
+    return prob
+
+def loop_multi_scale_inference(img, model):
+    h, w, c = img.shape
+    prob = np.zeros((h, w, 23))
+    for scale in [.5, 1, 1.5]:
+        img_ = cv2.resize(img, (int(w*scale), int(h*scale)))
+        prob += cv2.resize(loop_inference_on_whole_image(img_, model), (w, h))
+    return prob / 3
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=512)
+    parser.add_argument('--batch', type=int, nargs='+', default=[TILE_BATCH, 4])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    model = load_model()
+    images = sample_images(args.size)
+    with torch.inference_mode():
+        multi_scale_inference(images[0], model)   # warmup
+        results = {'loop': []}
+        for img in images:
+            prob, ms = timed(lambda: loop_multi_scale_inference(img, model), args.repeat)
+            results['loop'].append((prob, ms))
+            for batch in args.batch:
+                prob_b, ms_b = timed(lambda: multi_scale_inference(img, model, max_batch=batch), args.repeat)
+                results.setdefault(batch, []).append((prob_b, ms_b))
+
+    print(f"{len(images)} images, {args.size}x{args.size}, {torch.get_num_threads()} threads")
+    loop_ms = np.mean([ms for _, ms in results['loop']])
+    print(f"{'loop':<10} {loop_ms:8.1f} ms")
+    for batch in args.batch:
+        ms = np.mean([ms for _, ms in results[batch]])
+        diff = max(np.abs(p - ref).max() for (p, _), (ref, _) in zip(results[batch], results['loop']))
+        same = all(np.array_equal(p.argmax(-1), ref.argmax(-1)) for (p, _), (ref, _) in zip(results[batch], results['loop']))
+        print(f"batch {batch:<4} {ms:8.1f} ms  x{loop_ms / ms:4.2f}  max |dprob| {diff:.2e}  argmax identical {same}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Eager vs TorchScript (frozen graph cached next to the weights, run_on_image_cpu.export_torchscript)
+for the MINC googlenet: output parity on 256x256 tiles and whole images, labelmap agreement of
+the multi-scale probabilities and CPU latency, on the sample images in material_segmentation/images.
+Usage: python -m material_segmentation.bench_minc_backends [--size 512 --repeat 3]
+"""
+import argparse
+import time
+import numpy as np
+import torch
+from material_segmentation.run_on_image_cpu import MINC_WEIGHTS, MINC_BACKENDS, load_minc_model, \
+    multi_scale_inference, image_tensor
+from material_segmentation.bench_minc import weights_or_random, sample_images, timed
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--weights', default=MINC_WEIGHTS)
+    parser.add_argument('--size', type=int, default=512)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    weights = weights_or_random(args.weights)
+    models = {}
+    for backend in MINC_BACKENDS:
+        t0 = time.perf_counter()
+        models[backend] = load_minc_model(weights, backend)
+        print(f"{backend:<12} load {time.perf_counter() - t0:6.2f} s")
+    images = sample_images(args.size)
+
+    with torch.inference_mode():
+        eager = models['eager']
+        x = torch.stack([image_tensor(img[:256, :256]) for img in images])
+        for backend, model in models.items():
+            tiles = (model(x) - eager(x)).abs().max().item()
+            whole = (model(image_tensor(images[0]).unsqueeze(0)) - eager(image_tensor(images[0]).unsqueeze(0))).abs().max().item()
+            print(f"{backend:<12} max |dlogit|  tiles {tiles:.2e}  whole image {whole:.2e}")
+
+        for backend, model in models.items():
+            multi_scale_inference(images[0], model)   # warmup
+        latency, agree = {b: [] for b in models}, {b: [] for b in models}
+        for img in images:
+            reference = None
+            for backend, model in models.items():
+                prob, ms = timed(lambda: multi_scale_inference(img, model), args.repeat)
+                reference = prob if reference is None else reference
+                latency[backend].append(ms)
+                agree[backend].append(np.mean(prob.argmax(-1) == reference.argmax(-1)))
+
+    print(f"\n{'backend':<12} {'ms / image':>10} {'speedup':>8} {'labelmap':>9}  ({len(images)} images, "
+          f"{args.size}x{args.size}, {torch.get_num_threads()} threads)")
+    base = np.mean(latency['eager'])
+    for backend in models:
+        ms = np.mean(latency[backend])
+        print(f"{backend:<12} {ms:10.1f} {base / ms:7.2f}x {np.mean(agree[backend]):9.2%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+CPU precision modes of the MINC googlenet (run_on_image_cpu.quantize_minc_model): multi-scale
+latency, speedup and labelmap agreement against fp32 on the sample images in
+material_segmentation/images (static int8 is calibrated on the same folder).
+Usage: python -m material_segmentation.bench_minc_precision [--size 512 --repeat 3 --modes fp32 dynamic_int8 ...]
+"""
+import argparse
+import time
+import numpy as np
+import torch
+from material_segmentation.run_on_image_cpu import MINC_WEIGHTS, MINC_PRECISIONS, load_minc_model, multi_scale_inference
+from material_segmentation.bench_minc import weights_or_random, sample_images, timed
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--weights', default=MINC_WEIGHTS)
+    parser.add_argument('--size', type=int, default=512)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--modes', nargs='+', default=list(MINC_PRECISIONS), choices=MINC_PRECISIONS)
+    args = parser.parse_args()
+
+    weights = weights_or_random(args.weights)
+    images = sample_images(args.size)
+    configs = [('fp32', False)] + [(mode, cl) for mode in args.modes for cl in (False, True) if (mode, cl) != ('fp32', False)]
+
+    reference, rows = None, []
+    with torch.inference_mode():
+        for precision, channels_last in configs:
+            t0 = time.perf_counter()
+            model = load_minc_model(weights, precision=precision, channels_last=channels_last)
+            load_s = time.perf_counter() - t0
+            multi_scale_inference(images[0], model)   # warmup
+            labelmaps, times = [], []
+            for img in images:
+                prob, ms = timed(lambda: multi_scale_inference(img, model), args.repeat)
+                labelmaps.append(prob.argmax(-1))
+                times.append(ms)
+            reference = labelmaps if reference is None else reference
+            agree = np.mean([np.mean(a == b) for a, b in zip(labelmaps, reference)])
+            rows.append((precision + (' +cl' if channels_last else ''), load_s, np.mean(times), agree))
+
+    print(f"\n{len(images)} images, {args.size}x{args.size}, {torch.get_num_threads()} threads")
+    print(f"{'mode':<18} {'load s':>7} {'ms / image':>10} {'speedup':>8} {'labelmap vs fp32':>17}")
+    base = rows[0][2]
+    for name, load_s, ms, agree in rows:
+        print(f"{name:<18} {load_s:7.2f} {ms:10.1f} {base / ms:7.2f}x {agree:17.2%}")
+
+if __name__ == "__main__":
+    main()
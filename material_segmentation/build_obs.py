@@ -2,6 +2,7 @@ import numpy as np
 import json
 import pandas as pd
 import os
+from realsense.point_io import read_points
 
 # ------------------------------------------------
 # 1) 計算單一物件在 DataFrame 中的軸平行邊界
@@ -45,7 +46,7 @@ def is_xz_overlap(box1, box2):
 # ------------------------------------------------
 def build_obs_json(input_path: str, out_dir: str, SPACE_X: float = 10.0, SPACE_Y: float = 3.0, SPACE_Z: float = 8.0) -> dict:
     # --- 讀取原始 CSV（已含歸一化後的 x,y,z, material, object_num, object_label）---
-    df = pd.read_csv(input_path)
+    df = read_points(input_path)
 
     # --- （選擇性）印出最低/最高 Y、Z 材質模式供參考 ---
     bottom_10 = df.nsmallest(int(len(df) * 0.1), 'y')
@@ -2,6 +2,7 @@ import pandas as pd
 import numpy as np
 import json
 import os
+from realsense.point_io import read_points, write_points, point_path, point_format
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DEMO_DIR = os.path.join(BASE_DIR, 'demo_web')
@@ -48,7 +49,7 @@ def dbscan_clustering(input_csv: str, out_dir: str = None) -> dict:
         }
     """
     # 1. 讀取 CSV
-    df = pd.read_csv(input_csv)
+    df = read_points(input_csv)
 
     # 確認必要欄位存在
     required_cols = {'x', 'y', 'z', 'material', 'object_num'}
@@ -104,8 +105,7 @@ def dbscan_clustering(input_csv: str, out_dir: str = None) -> dict:
         })
 
     # 輸出更新後的 CSV
-    output_path = os.path.join(out_dir, f'pointcloud_clustered.csv')
-    df.to_csv(output_path, index=False)
+    output_path = write_points(df, point_path(out_dir, 'pointcloud_clustered', point_format(input_csv)))
 
     return {
         'cluster_path': output_path
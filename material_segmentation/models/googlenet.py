@@ -7,41 +7,75 @@ import torch.nn.functional as F
 import matplotlib.pyplot as plt
 
 def shift_pool(x, pool2d):
+    """
+    Stride-2 pool applied at the four one-pixel shifts of the zero-padded input, interleaved
+    back to the input's h x w (any size; 16x16 for a 256x256 patch).
+    """
     n,c,h,w = x.size()
     p1d = (1, 1, 1, 1)
     x = F.pad(x, p1d, "constant", 0)
+    if isinstance(pool2d, nn.AdaptiveAvgPool2d):
+        # 輸出大小跟著輸入走，16x16 時就是原本的 8x8
+        size = ((h + 1) // 2, (w + 1) // 2)
+        pool2d = lambda t: F.adaptive_avg_pool2d(t, size)
 
-    x0 = pool2d(x[:, :, :-1, :-1]).unsqueeze(2)
-    x1 = pool2d(x[:, :, :-1, 1: ]).unsqueeze(2)
-    x2 = pool2d(x[:, :, 1: , :-1]).unsqueeze(2)
-    x3 = pool2d(x[:, :, 1: , 1: ]).unsqueeze(2)
+    x0 = pool2d(x[:, :, :-1, :-1])
+    x1 = pool2d(x[:, :, :-1, 1: ])
+    x2 = pool2d(x[:, :, 1: , :-1])
+    x3 = pool2d(x[:, :, 1: , 1: ])
 
-    x = torch.cat((x0, x1, x2, x3), 2)
-    x = x.view(n, c, 4, 64)
-    x = x.permute(0,1,3,2)
-    x = x.view(n,c,8,8,2,2)
-    x = x.permute(0,1,2,4,3,5)
-    x = x.reshape(n,c,16,16)
-    return x
+    ho, wo = x0.size(2), x0.size(3)
+    x = torch.stack((x0, x1, x2, x3), 2)   # (n, c, dy * 2 + dx, ho, wo)
+    x = x.view(n, c, 2, 2, ho, wo)
+    x = x.permute(0, 1, 4, 2, 5, 3)        # (n, c, ho, dy, wo, dx)
+    x = x.reshape(n, c, 2 * ho, 2 * wo)
+    return x[:, :, :h, :w]
+
+LRN_IMPLS = ('pool', 'fused')
 
 class LRN(nn.Module):
-    def __init__(self, local_size=5, alpha=1e-4, beta=0.75):
+    """
+    Cross-channel local response norm, x / (1 + alpha * mean_window(x^2)) ^ beta.
+    impl='pool': AvgPool3d over the squared activations (the original layer).
+    impl='fused': sliding channel-window sum with in-place adds, only two feature-map sized
+    buffers; fully in place (output written over the squares) when autograd is off.
+    """
+    def __init__(self, local_size=5, alpha=1e-4, beta=0.75, impl='pool'):
         super(LRN, self).__init__()
+        if impl not in LRN_IMPLS:
+            raise ValueError(f"unknown LRN impl: {impl}, expected one of {LRN_IMPLS}")
         self.average=nn.AvgPool3d(kernel_size=(local_size, 1, 1),
                 stride=1,
                 padding=(int((local_size-1.0)/2), 0, 0))
+        self.local_size = local_size
         self.alpha = alpha
         self.beta = beta
+        self.impl = impl
 
     def forward(self, x):
+        if self.impl == 'fused':
+            return self.forward_fused(x)
         div = x.pow(2).unsqueeze(1)
         div = self.average(div).squeeze(1) #* 5
         div = div.mul(self.alpha).add(1.0).pow(self.beta)
         x = x.div(div)
         return x
 
+    def forward_fused(self, x):
+        c = x.size(1)
+        sq = x * x
+        div = sq.clone()
+        # 視窗內其他 channel 的平方加進來 (超出範圍的補 0，和 AvgPool3d 的 padding 一樣)
+        for off in range(1, (self.local_size - 1) // 2 + 1):
+            div.narrow(1, off, c - off).add_(sq.narrow(1, 0, c - off))
+            div.narrow(1, 0, c - off).add_(sq.narrow(1, off, c - off))
+        if torch.is_grad_enabled():
+            return x / (div * (self.alpha / self.local_size) + 1.0).pow(self.beta)
+        div.mul_(self.alpha / self.local_size).add_(1.0).pow_(self.beta)
+        return torch.div(x, div, out=sq)
+
 class googlenet(nn.Module):
-    def __init__(self):
+    def __init__(self, lrn='pool'):
         super(googlenet, self).__init__()
 
         self.conv1_7x7_s2 = nn.Conv2d(3, 64, kernel_size=7, stride=2, padding=3, bias=True)
@@ -50,7 +84,7 @@ class googlenet(nn.Module):
         self.conv2_3x3 = nn.Conv2d(64, 192, kernel_size=3, stride=1, padding=1, bias=True)
         self.maxpool2 = nn.MaxPool2d(3, stride=2, ceil_mode=True)
 
-        self.lrn = LRN()
+        self.lrn = LRN(impl=lrn)
         self.relu = nn.ReLU(inplace=True)
 
         self.inception_3a_1x1 = nn.Conv2d(192, 64, kernel_size=1, stride=1, padding=0, bias=True)
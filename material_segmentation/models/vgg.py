@@ -10,22 +10,29 @@ def conv1x1(in_planes, out_planes, stride=1):
     return nn.Conv2d(in_planes, out_planes, kernel_size=3, stride=stride, padding=1, bias=False)
 
 def shift_pool(x, pool2d):
+    """
+    Stride-2 pool applied at the four one-pixel shifts of the zero-padded input, interleaved
+    back to the input's h x w (any size; 16x16 for a 256x256 patch).
+    """
     n,c,h,w = x.size()
-    p1d = (1,1,1,1)
+    p1d = (1, 1, 1, 1)
     x = F.pad(x, p1d, "constant", 0)
-
-    x0 = pool2d(x[:, :, :-1, :-1]).unsqueeze(2)
-    x1 = pool2d(x[:, :, :-1, 1: ]).unsqueeze(2)
-    x2 = pool2d(x[:, :, 1: , :-1]).unsqueeze(2)
-    x3 = pool2d(x[:, :, 1: , 1: ]).unsqueeze(2)
-
-    x = torch.cat((x0, x1, x2, x3), 2)
-    x = x.view(n, c, 4, 64)
-    x = x.permute(0,1,3,2)
-    x = x.view(n,c,8,8,2,2)
-    x = x.permute(0,1,2,4,3,5)
-    x = x.reshape(n,c,16,16)
-    return x
+    if isinstance(pool2d, nn.AdaptiveAvgPool2d):
+        # 輸出大小跟著輸入走，16x16 時就是原本的 8x8
+        size = ((h + 1) // 2, (w + 1) // 2)
+        pool2d = lambda t: F.adaptive_avg_pool2d(t, size)
+
+    x0 = pool2d(x[:, :, :-1, :-1])
+    x1 = pool2d(x[:, :, :-1, 1: ])
+    x2 = pool2d(x[:, :, 1: , :-1])
+    x3 = pool2d(x[:, :, 1: , 1: ])
+
+    ho, wo = x0.size(2), x0.size(3)
+    x = torch.stack((x0, x1, x2, x3), 2)   # (n, c, dy * 2 + dx, ho, wo)
+    x = x.view(n, c, 2, 2, ho, wo)
+    x = x.permute(0, 1, 4, 2, 5, 3)        # (n, c, ho, dy, wo, dx)
+    x = x.reshape(n, c, 2 * ho, 2 * wo)
+    return x[:, :, :h, :w]
 
 
 class vgg16(nn.Module):
@@ -1,9 +1,14 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 import cv2
 import os
+import time
+import threading
+from collections import OrderedDict
 from ultralytics import YOLO
+from material_segmentation.artifacts import artifacts as artifact_writer, render_detections
+from realsense.point_io import read_points, write_points, derived_path, point_colors
+from realsense.raster import splat
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DEMO_DIR = os.path.join(BASE_DIR, 'demo_web')
@@ -11,28 +16,129 @@ MATL_DIR = os.path.join(BASE_DIR, 'material_segmentation')
 SENS_DIR = os.path.join(BASE_DIR, 'realsense')
 FILE_DIR = os.path.join(DEMO_DIR, 'results')
 
-def detect_objects(csv_file: str, saved_path: str, model_path: str = "yolo12x.pt") -> dict:
-    # ----------------- 重建圖片 -----------------
-    df = pd.read_csv(csv_file)
-    width, height = 640, 480
-    image = np.zeros((height, width, 3), dtype=np.uint8)
+DETECTOR_CACHE_SIZE = 2     # 同時留在記憶體裡的模型數 (yolo12n / s / x ...)
+WARMUP_SHAPE = (480, 640, 3)
 
-    for idx, row in df.iterrows():
-        u, v = int(row['u']), int(row['v'])
-        R, G, B = int(row['R']), int(row['G']), int(row['B'])
-        if 0 <= u < width and 0 <= v < height:
-            image[v, u] = [R, G, B]
+# torch: 原本的 PyTorch 權重; onnx / openvino: 匯出一次後存在權重旁邊重複使用 (CPU 較快)
+DETECTOR_BACKENDS = ('torch', 'onnx', 'openvino')
+DETECTOR_IMGSZ = 640
+DETECT_BATCH_SIZE = 4       # frames per forward pass in detect_objects_batch
 
-    # ----------------- YOLOv12 物件偵測 -----------------
-    model = YOLO(model_path)
-    results = model(image)[0]
+def exported_path(model_path: str, backend: str, imgsz: int = DETECTOR_IMGSZ) -> str:
+    """yolo12x.pt -> yolo12x_640.onnx / yolo12x_640_openvino_model/, next to the weights."""
+    stem = os.path.splitext(model_path)[0]
+    if backend == 'onnx':
+        return f'{stem}_{imgsz}.onnx'
+    if backend == 'openvino':
+        return f'{stem}_{imgsz}_openvino_model'
+    raise ValueError(f"unknown export backend: {backend}, expected one of {DETECTOR_BACKENDS[1:]}")
+
+def export_detector(model_path: str, backend: str = 'torch', imgsz: int = DETECTOR_IMGSZ) -> str:
+    """Path of the model to load for backend, exporting it on first use (fixed input size imgsz)."""
+    if backend not in DETECTOR_BACKENDS:
+        raise ValueError(f"unknown detector backend: {backend}, expected one of {DETECTOR_BACKENDS}")
+    if backend == 'torch':
+        return model_path
+    target = exported_path(model_path, backend, imgsz)
+    if os.path.exists(target):
+        return target
+
+    exported = YOLO(model_path).export(format=backend, imgsz=imgsz, device='cpu')
+    if os.path.abspath(exported) != os.path.abspath(target):
+        os.replace(exported, target)
+    print(f"[INFO] exported {model_path} -> {target}")
+    return target
+
+def set_detector_threads(threads: int = None, backend: str = 'torch'):
+    """
+    CPU threads for inference, torch backend only (torch intra-op threads). ultralytics creates the
+    onnxruntime session / OpenVINO compiled model itself without thread options, and neither
+    runtime reads OMP_NUM_THREADS, so threads is rejected for 'onnx' / 'openvino'.
+    """
+    if not threads:
+        return
+    if backend != 'torch':
+        raise ValueError(f"threads is only supported by the torch detector backend, not {backend}")
+    import torch
+    torch.set_num_threads(threads)
+
+class DetectorRegistry:
+    """
+    Process-wide cache of YOLO detectors: each (model_path, backend, imgsz) is loaded once per
+    worker process, warmed up with one dummy inference and reused across requests.
+    Beyond max_models the least recently used detector is dropped.
+    """
+    def __init__(self, max_models: int = DETECTOR_CACHE_SIZE, warmup_shape: tuple = WARMUP_SHAPE):
+        self.max_models = max_models
+        self.warmup_shape = warmup_shape
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        self.timings = {}   # key -> {'export_s', 'load_s', 'warmup_s', 'hits'}
+
+    def get(self, model_path: str, backend: str = 'torch', imgsz: int = DETECTOR_IMGSZ):
+        key = (model_path, backend, imgsz)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                self.timings[key]['hits'] += 1
+                return self._models[key]
+
+            t0 = time.perf_counter()
+            path = export_detector(model_path, backend, imgsz)
+            t1 = time.perf_counter()
+            model = YOLO(path, task='detect')
+            t2 = time.perf_counter()
+            model(np.zeros(self.warmup_shape, dtype=np.uint8), imgsz=imgsz, verbose=False)
+            t3 = time.perf_counter()
+            self.timings[key] = {'export_s': t1 - t0, 'load_s': t2 - t1, 'warmup_s': t3 - t2, 'hits': 0}
+            print(f"[INFO] detector {path} ({backend}, {imgsz}): "
+                  f"export {t1 - t0:.2f} s, load {t2 - t1:.2f} s, warmup {t3 - t2:.2f} s")
+
+            self._models[key] = model
+            while len(self._models) > self.max_models:
+                evicted, _ = self._models.popitem(last=False)
+                print(f"[INFO] detector {evicted} evicted")
+            return model
+
+    def preload(self, model_paths, backend: str = 'torch', imgsz: int = DETECTOR_IMGSZ) -> dict:
+        """Load + warm up at worker startup, returns the timings of those models."""
+        if isinstance(model_paths, str):
+            model_paths = [model_paths]
+        keys = [(p, backend, imgsz) for p in model_paths]
+        for key in keys:
+            self.get(*key)
+        return {key: self.timings[key] for key in keys if key in self.timings}
+
+    def loaded(self) -> list:
+        return list(self._models)
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+    def __contains__(self, key):
+        return key in self._models
+
+    def __len__(self):
+        return len(self._models)
+
+detectors = DetectorRegistry()
+
+def get_detector(model_path: str = "yolo12x.pt", backend: str = 'torch', imgsz: int = DETECTOR_IMGSZ):
+    return detectors.get(model_path, backend, imgsz)
+
+def detector_timings() -> dict:
+    """Cold-start cost per (model_path, backend, imgsz): export / load / warmup seconds and cache hits."""
+    return {key: dict(t) for key, t in detectors.timings.items()}
 
+def detection_table(results, names) -> pd.DataFrame:
+    """One row per YOLO box (label, score, x1..y2, area), sorted by area, smallest first."""
     detection_results = []
     for box in results.boxes:
         x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
         cls_id = int(box.cls[0].item())
         score = float(box.conf[0].item())
-        label = model.names[cls_id]
+        label = names[cls_id]
         area = (x2 - x1) * (y2 - y1)
         detection_results.append({
             "label": label,
@@ -42,55 +148,164 @@ def detect_objects(csv_file: str, saved_path: str, model_path: str = "yolo12x.pt
         })
 
     # 依面積排序（由小到大）
-    detection_results = pd.DataFrame(detection_results)
-    detection_results = detection_results.sort_values(by="area", ascending=True).reset_index(drop=True)
+    detection_results = pd.DataFrame(detection_results, columns=["label", "score", "x1", "y1", "x2", "y2", "area"])
+    return detection_results.sort_values(by="area", ascending=True).reset_index(drop=True)
+
+def detect_image(image: np.ndarray, model_path: str = "yolo12x.pt", backend: str = 'torch',
+                 imgsz: int = DETECTOR_IMGSZ, threads: int = None) -> tuple:
+    """Run the cached detector on one image, returns (ultralytics result, detection table)."""
+    set_detector_threads(threads, backend)
+    model = get_detector(model_path, backend, imgsz)
+    results = model(image, imgsz=imgsz, verbose=False)[0]
+    return results, detection_table(results, model.names)
+
+def reconstruct_image(df: pd.DataFrame, width: int = 640, height: int = 480) -> np.ndarray:
+    """
+    Scatter the point table back into a (height, width, 3) BGR image, the order YOLO and cv2 expect.
+    Out-of-bounds u/v are dropped and later rows overwrite earlier ones, same as a row-by-row loop.
+    """
+    bgr = point_colors(df, 'BGR')
+    return splat(df['u'].to_numpy(), df['v'].to_numpy(), bgr, (height, width))
+
+def read_image(image_path: str) -> np.ndarray:
+    image = cv2.imread(image_path)
+    if image is None:
+        raise FileNotFoundError(f"cannot read image: {image_path}")
+    return image
+
+def label_raster(detection_results: pd.DataFrame, width: int = 640, height: int = 480) -> np.ndarray:
+    """
+    (height, width) int32 raster of object ids: row i of detection_results is object i + 1, 0 = none.
+    Boxes are inclusive on both ends. Rows are painted in reverse so the earlier one (smaller area
+    after sorting) wins every pixel two boxes share.
+    """
+    raster = np.zeros((height, width), dtype=np.int32)
+    cols, rows = np.arange(width), np.arange(height)
+    boxes = detection_results[['x1', 'y1', 'x2', 'y2']].to_numpy()
+    for obj_id in range(len(boxes), 0, -1):
+        x1, y1, x2, y2 = boxes[obj_id - 1]
+        c = np.flatnonzero((cols >= x1) & (cols <= x2))
+        r = np.flatnonzero((rows >= y1) & (rows <= y2))
+        if len(c) and len(r):
+            raster[r[0]:r[-1] + 1, c[0]:c[-1] + 1] = obj_id
+    return raster
+
+def assign_objects(df: pd.DataFrame, detection_results: pd.DataFrame, width: int = 640, height: int = 480) -> pd.DataFrame:
+    """
+    Give every point the first box (in detection_results order) containing its (u, v):
+    object_label ("" if none), object_num (1-based, NaN if none) and the bbox rounded to 2 decimals.
+    One gather from label_raster(), cost does not depend on the number of boxes.
+    Returns a new table, df itself is left unchanged.
+    """
+    u = df['u'].to_numpy().astype(np.int64)
+    v = df['v'].to_numpy().astype(np.int64)
+    # 框可能貼齊影像邊界 (x2 = width)，raster 放大到涵蓋所有點
+    w = max(width, int(u.max()) + 1) if len(u) else width
+    h = max(height, int(v.max()) + 1) if len(v) else height
+    raster = label_raster(detection_results, w, h)
+    inside = (u >= 0) & (v >= 0)
+    ids = np.zeros(len(df), dtype=np.int32)
+    ids[inside] = raster[v[inside], u[inside]]
+
+    # 第 0 列給沒有框的點
+    labels = np.concatenate([[""], detection_results['label'].to_numpy(dtype=object)])
+    columns = {
+        "object_label": labels[ids],
+        "object_num": np.where(ids > 0, ids, np.nan),
+    }
+    for c in ('x1', 'y1', 'x2', 'y2'):
+        # 和原本一樣用 Python round (np.round 在 .xx5 附近的進位不同)
+        bbox = [np.nan] + [round(float(x), 2) for x in detection_results[c]]
+        columns[f"bbox_{c}"] = np.asarray(bbox, dtype=np.float64)[ids]
+    return df.assign(**columns)
+
+def detect_objects(csv_file: str, saved_path: str, model_path: str = "yolo12x.pt", image_path: str = None,
+                   backend: str = 'torch', imgsz: int = DETECTOR_IMGSZ, threads: int = None,
+                   artifacts: bool = True) -> dict:
+    """
+    image_path: run YOLO on this image (e.g. no_cap's projection.png) instead of
+    rebuilding it from the point table. Both are BGR images.
+    backend: 'torch', or 'onnx' / 'openvino' (exported once next to the weights),
+    imgsz: network input size, threads: CPU inference threads (torch backend only).
+    artifacts=False skips yolo_detection_result.png, otherwise it is rendered in the background.
+    """
+    # ----------------- 重建圖片 -----------------
+    df = read_points(csv_file)
+    image = read_image(image_path) if image_path is not None else reconstruct_image(df)
+
+    # ----------------- YOLOv12 物件偵測 -----------------
+    results, detection_results = detect_image(image, model_path, backend, imgsz, threads)
     print("YOLOv12 偵測結果：")
     print(detection_results)
 
     # ----------------- 更新原始 CSV -----------------
-    df["object_label"] = ""
-    df["object_num"] = np.nan
-    df["bbox_x1"] = np.nan
-    df["bbox_y1"] = np.nan
-    df["bbox_x2"] = np.nan
-    df["bbox_y2"] = np.nan
-
-    # 為每個框分配一個 object_num（從 1 開始編號）
-    for obj_id, (_, det) in enumerate(detection_results.iterrows(), start=1):
-        x1, y1, x2, y2 = det["x1"], det["y1"], det["x2"], det["y2"]
-        label = det["label"]
-
-        mask = (
-            (df["u"] >= x1) & (df["u"] <= x2) &
-            (df["v"] >= y1) & (df["v"] <= y2) &
-            (df["object_label"] == "")
-        )
-
-        df.loc[mask, "object_label"] = label
-        df.loc[mask, "object_num"] = obj_id
-        df.loc[mask, "bbox_x1"] = round(x1, 2)
-        df.loc[mask, "bbox_y1"] = round(y1, 2)
-        df.loc[mask, "bbox_x2"] = round(x2, 2)
-        df.loc[mask, "bbox_y2"] = round(y2, 2)
-
-    output_file = os.path.join(saved_path, os.path.basename(csv_file).replace(".csv", "_with_objects.csv"))
-    df.to_csv(output_file, index=False)
-    print(f"更新後的 CSV 檔案已儲存為 {output_file}")
-
-    # ----------------- 顯示 YOLO 結果 -----------------
-    annotated_image = results.plot()
-    plt.imshow(cv2.cvtColor(annotated_image, cv2.COLOR_BGR2RGB))
-    plt.title("YOLOv12 Detection")
-    plt.axis('off')
-    # plt.show()
-    plt.savefig(os.path.join(saved_path, 'yolo_detection_result.png'), bbox_inches='tight', pad_inches=0.1)
+    df = assign_objects(df, detection_results)
+
+    output_file = write_points(df, derived_path(csv_file, '_with_objects', saved_path))
+    print(f"更新後的點雲檔案已儲存為 {output_file}")
+
+    # ----------------- 顯示 YOLO 結果 (background) -----------------
+    if artifacts:
+        artifact_writer.submit(render_detections, results.plot, os.path.join(saved_path, 'yolo_detection_result.png'))
 
     return {
         'object_csv': output_file,
     }
 
+def _frame_inputs(frame, image_path: str = None) -> tuple:
+    # -> (image, point table or None, point file or None)
+    if isinstance(frame, np.ndarray):
+        return frame, None, None
+    path = None
+    if isinstance(frame, str):
+        path, frame = frame, read_points(frame)
+    image = read_image(image_path) if image_path is not None else reconstruct_image(frame)
+    return image, frame, path
+
+def detect_objects_batch(frames, saved_path=None, model_path: str = "yolo12x.pt", batch_size: int = DETECT_BATCH_SIZE,
+                         image_paths=None, backend: str = 'torch', imgsz: int = DETECTOR_IMGSZ, threads: int = None,
+                         plot: bool = False) -> list:
+    """
+    YOLO on several frames, batch_size frames per forward pass.
+    frames: images (H, W, 3), point tables (DataFrame) or point files. 'points' is a copy of the table
+    with the object columns of detect_objects, the caller's DataFrames are not modified. Point files
+    are also written to saved_path (*_with_objects).
+    image_paths: per-frame image to detect on instead of the reconstruction (None entries allowed).
+    saved_path: one directory, or one per frame. plot renders the annotated YOLO image there (background).
+    Exported backends keep batch 1, their input shape is fixed at export.
+    Returns one dict per frame: detections, points (None for images), object_csv (None unless written).
+    """
+    frames = list(frames)
+    image_paths = list(image_paths) if image_paths is not None else [None] * len(frames)
+    per_frame_dirs = isinstance(saved_path, (list, tuple))
+    dirs = list(saved_path) if per_frame_dirs else [saved_path] * len(frames)
+
+    set_detector_threads(threads, backend)
+    model = get_detector(model_path, backend, imgsz)
+    step = max(1, batch_size) if backend == 'torch' else 1
+
+    outputs = []
+    for start in range(0, len(frames), step):
+        # 一次只讀一個 batch 的點雲，記憶體不隨 frame 數增加
+        chunk = [_frame_inputs(f, p) for f, p in zip(frames[start:start + step], image_paths[start:start + step])]
+        results = model([image for image, _, _ in chunk], imgsz=imgsz, verbose=False)
+        for i, ((_, df, path), result) in enumerate(zip(chunk, results), start=start):
+            detection_results = detection_table(result, model.names)
+            out = {'detections': detection_results, 'points': None, 'object_csv': None}
+            if df is not None:
+                out['points'] = assign_objects(df, detection_results)
+                if path is not None and dirs[i] is not None:
+                    out['object_csv'] = write_points(out['points'], derived_path(path, '_with_objects', dirs[i]))
+            if plot and dirs[i] is not None:
+                name = 'yolo_detection_result.png' if per_frame_dirs else f'yolo_detection_result_{i}.png'
+                artifact_writer.submit(render_detections, result.plot, os.path.join(dirs[i], name))
+            outputs.append(out)
+    print(f"[INFO] detected {len(frames)} frame(s) in batches of {step}")
+    return outputs
+
 # only for testing
 if __name__ == "__main__":
     csv_file = os.path.join(FILE_DIR, 'test', 'pointcloud.csv')
     saved_path = os.path.join(FILE_DIR, 'test')
     detect_objects(csv_file, saved_path)
+    artifact_writer.wait()
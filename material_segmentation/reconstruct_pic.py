@@ -15,7 +15,7 @@ for idx, row in df.iterrows():
     u, v = int(row['u']), int(row['v'])
     R, G, B = int(row['R']), int(row['G']), int(row['B'])
     if 0 <= u < width and 0 <= v < height:
-        image[v, u] = [R, G, B]
+        image[v, u] = [B, G, R]  # YOLO 吃 BGR
 
 # ----------------- YOLOv8 物件偵測 -----------------
 # 載入預訓練模型（YOLOv8n 是最輕量版，也可以換成 yolov8s, yolov8m, yolov8l...）
@@ -1,15 +1,17 @@
 #%%
 import numpy as np
 import cv2
-import matplotlib.pyplot as plt
-import pandas as pd
 import torch
 import torch.nn as nn
 import pydensecrf.densecrf as dcrf
 import pydensecrf.utils as utils
 import os
+import time
+import threading
 from material_segmentation.models.vgg import vgg16
 from material_segmentation.models.googlenet import googlenet
+from material_segmentation.artifacts import artifacts as artifact_writer, render_materials, load_palette
+from realsense.point_io import read_points, write_points, point_path as point_file_path, point_format
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DEMO_DIR = os.path.join(BASE_DIR, 'demo_web')
@@ -17,68 +19,101 @@ MATL_DIR = os.path.join(BASE_DIR, 'material_segmentation')
 SENS_DIR = os.path.join(BASE_DIR, 'realsense')
 FILE_DIR = os.path.join(DEMO_DIR, 'results')
 
-def color_image_w_masks(image, masks):
-    image = image.astype(np.uint8)
+TILE = 256                  # googlenet / vgg16 input patch
+SCALES = (.5, 1, 1.5)
+TILE_BATCH = 16             # tiles per forward pass, bounds the activation memory of one pass
 
-    for index in range(23):
-        mask = (masks == index).astype(np.uint8)
-        if mask.sum() == 0:
-            continue
-        color_palette = np.loadtxt(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'palette.txt')).astype(np.uint8)
-        color = color_palette[index]
-        mask = np.expand_dims(mask, axis=-1)
-        mask = np.repeat(mask, 3, axis=-1)
-        mask = mask * np.array(color).reshape((-1, 3)) + (1 - mask) * image
-        mask = mask.astype(np.uint8)
-        image = cv2.addWeighted(image, .2, mask, .8, 0)
-    return image
-
-def inference_on_whole_image(img, model):
+def image_tensor(img) -> torch.Tensor:
+    """BGR uint8 (h, w, 3) -> mean-subtracted float (3, h, w)."""
+    img = img.astype(np.float32).transpose(2, 0, 1)
+    img[0, :, :] -= 104
+    img[1, :, :] -= 117
+    img[2, :, :] -= 124
+    return torch.from_numpy(img)
+
+def image_tiles(img) -> tuple:
+    """
+    Resize up to a multiple of TILE, subtract the BGR mean and cut into (nh * nw, 3, TILE, TILE)
+    tiles in row-major order. Returns (tiles, (h_, w_)).
+    """
     h, w, c = img.shape
-    if h % 256 != 0:
-        h_ = (h // 256 + 1) * 256
+    if h % TILE != 0:
+        h_ = (h // TILE + 1) * TILE
     else:
         h_ = h
-    if w % 256 != 0:
-        w_ = (w // 256 + 1) * 256
+    if w % TILE != 0:
+        w_ = (w // TILE + 1) * TILE
     else:
         w_ = w
 
-    img = cv2.resize(img, (w_, h_))
-    img = img.astype(np.float32).transpose(2, 0, 1)
-    img[0, :, :] -= 104
-    img[1, :, :] -= 117
-    img[2, :, :] -= 124
-    img = torch.FloatTensor(img)
-    img = img.unsqueeze(0)  # 移除 .cuda()
+    img = image_tensor(cv2.resize(img, (w_, h_)))
+    nh, nw = h_ // TILE, w_ // TILE
+    tiles = img.view(3, nh, TILE, nw, TILE).permute(1, 3, 0, 2, 4).reshape(-1, 3, TILE, TILE)
+    return tiles, (h_, w_)
 
-    softmax = nn.Softmax(dim=1)
+def tile_probabilities(tiles, model, max_batch: int = TILE_BATCH) -> np.ndarray:
+    """Softmax output of every tile, max_batch tiles per forward pass -> (N, h, w, 23) float32."""
+    preds = []
+    for start in range(0, tiles.shape[0], max_batch):
+        pred = model(tiles[start:start + max_batch])
+        preds.append(torch.softmax(pred, dim=1).permute(0, 2, 3, 1).cpu().numpy())
+    return np.concatenate(preds)
 
-    nh = h_ // 256
-    nw = w_ // 256
-    prob = np.zeros((h_, w_, 23))
+def stitch_tiles(preds, size) -> np.ndarray:
+    """Upsample each tile's probabilities to TILE x TILE and put them back -> (h_, w_, 23)."""
+    h_, w_ = size
+    nw = w_ // TILE
+    prob = np.zeros((h_, w_, preds.shape[-1]))
+    for k, pred in enumerate(preds):
+        i, j = divmod(k, nw)
+        prob[i*TILE:(i+1)*TILE, j*TILE:(j+1)*TILE, :] = cv2.resize(pred, (TILE, TILE))
+    return prob
 
-    for i in range(nh):
-        for j in range(nw):
-            img_patch = img[:, :, i*256:(i+1)*256, j*256:(j+1)*256]
-            pred = model(img_patch)
-            pred = softmax(pred).squeeze().cpu().numpy().transpose(1, 2, 0)  # 保留在 CPU
-            pred = cv2.resize(pred, (256, 256))
-            prob[i*256:(i+1)*256, j*256:(j+1)*256, :] = pred
+def inference_on_whole_image(img, model, max_batch: int = TILE_BATCH):
+    tiles, size = image_tiles(img)
+    return stitch_tiles(tile_probabilities(tiles, model, max_batch), size)
 
-    return prob
+def whole_image_probabilities(img, model) -> np.ndarray:
+    """
+    One fully-convolutional pass over the image as it is (no resize to a multiple of TILE,
+    no tile seams), probabilities upsampled back to (h, w, 23).
+    """
+    h, w, c = img.shape
+    pred = model(image_tensor(img).unsqueeze(0))
+    pred = torch.softmax(pred, dim=1)[0].permute(1, 2, 0).cpu().numpy()
+    return cv2.resize(pred, (w, h))
 
-def multi_scale_inference(img, model):
+def multi_scale_inference(img, model, scales=SCALES, max_batch: int = TILE_BATCH, tiled: bool = True):
+    """
+    Mean of the whole-image probabilities at every scale. The tiles of all scales go through
+    the network together (for 512x512: 1 + 4 + 9 tiles in one batch), then are scattered back.
+    tiled=False: one whole-image pass per scale instead (whole_image_probabilities).
+    """
     h, w, c = img.shape
-    scales = [.5, 1, 1.5]
-    prob = np.zeros((h, w, 23))
+    if not tiled:
+        prob = np.zeros((h, w, 23))
+        for scale in scales:
+            img_ = cv2.resize(img, (int(w*scale), int(h*scale)))
+            prob += cv2.resize(whole_image_probabilities(img_, model), (w, h))
+        prob /= len(scales)
+        return prob
 
+    tiles, sizes = [], []
     for scale in scales:
         img_ = cv2.resize(img, (int(w*scale), int(h*scale)))
-        prob_ = inference_on_whole_image(img_, model)
+        t, size = image_tiles(img_)
+        tiles.append(t)
+        sizes.append(size)
+    preds = tile_probabilities(torch.cat(tiles), model, max_batch)
+
+    prob = np.zeros((h, w, 23))
+    start = 0
+    for t, size in zip(tiles, sizes):
+        prob_ = stitch_tiles(preds[start:start + len(t)], size)
+        start += len(t)
         prob += cv2.resize(prob_, (w, h))
 
-    prob /= 3
+    prob /= len(scales)
     return prob
 
 class DenseCRF(object):
@@ -123,80 +158,274 @@ def get_material(row, labelmap, labels):
     else:
         return ""
     
+MINC_WEIGHTS = os.path.join(MATL_DIR, 'weights', 'minc-googlenet.pth')
+CRF_PARAMS = dict(
+    iter_max=10,
+    pos_xy_std=1,
+    pos_w=3,
+    bi_xy_std=67,
+    bi_rgb_std=3,
+    bi_w=4,
+)
+MINC_BACKENDS = ('eager', 'torchscript')
+MINC_BACKEND = 'eager'
+# fp32 / dynamic int8 (convs between ReLUs) / static int8 (calibrated on images/, cached) / bf16 autocast
+MINC_PRECISIONS = ('fp32', 'dynamic_int8', 'static_int8', 'bf16')
+MINC_PRECISION = 'fp32'
+CALIBRATION_DIR = os.path.join(MATL_DIR, 'images')
+# dynamic 量化的 Conv2d 把輸入當 [0, max] 的 quint8、輸出 clamp 在 >= 0，只適合前後都是 ReLU 的 conv；
+# conv1 (減過 mean 的影像) 和 conv_fc8 (logits，約一半是負的) 留在 fp32
+DYNAMIC_INT8_SKIP = ('conv1_7x7_s2', 'conv_fc8')
+MINC_LRN = 'fused'          # googlenet LRN: 'pool' (AvgPool3d) or 'fused' (in-place channel window)
+INPUT_SIZE = (512, 512)     # (w, h) fed to multi_scale_inference
+OUTPUT_SIZE = (640, 480)    # (w, h) of the labelmap, same as the projection / u, v
+
+def load_googlenet(weights: str = MINC_WEIGHTS, lrn: str = MINC_LRN):
+    model = googlenet(lrn=lrn)
+    model.load_state_dict(torch.load(weights, weights_only=True), strict=False)
+    return model.eval()
+
+def torchscript_path(weights: str = MINC_WEIGHTS) -> str:
+    """weights/minc-googlenet.pth -> weights/minc-googlenet.torchscript.pt"""
+    return os.path.splitext(weights)[0] + '.torchscript.pt'
+
+def export_torchscript(weights: str = MINC_WEIGHTS, path: str = None) -> str:
+    """
+    Trace googlenet (LRN and shift_pool included) on one TILE x TILE patch and freeze it,
+    cached next to the weights and exported again when the weights are newer.
+    The graph keeps batch size and input height / width dynamic.
+    """
+    path = path or torchscript_path(weights)
+    if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(weights):
+        return path
+    model = load_googlenet(weights)
+    with torch.no_grad():
+        graph = torch.jit.freeze(torch.jit.trace(model, torch.zeros(1, 3, TILE, TILE)))
+    torch.jit.save(graph, path)
+    print(f"[INFO] exported {weights} -> {path}")
+    return path
+
+class CPUInference(nn.Module):
+    """Feeds the model channels-last inputs and / or runs it under CPU autocast, returns fp32 logits."""
+    def __init__(self, model, channels_last: bool = False, autocast_dtype=None):
+        super(CPUInference, self).__init__()
+        self.model = model
+        self.channels_last = channels_last
+        self.autocast_dtype = autocast_dtype
+
+    def forward(self, x):
+        if self.channels_last:
+            x = x.contiguous(memory_format=torch.channels_last)
+        if self.autocast_dtype is None:
+            return self.model(x)
+        with torch.autocast('cpu', dtype=self.autocast_dtype):
+            return self.model(x).float()
+
+def calibration_tiles(images_dir: str = CALIBRATION_DIR) -> torch.Tensor:
+    """Every tile multi_scale_inference would see for the images in images_dir."""
+    tiles = []
+    for name in sorted(os.listdir(images_dir)):
+        img = cv2.imread(os.path.join(images_dir, name))
+        if img is None:
+            continue
+        img = cv2.resize(img, INPUT_SIZE)
+        h, w, c = img.shape
+        for scale in SCALES:
+            tiles.append(image_tiles(cv2.resize(img, (int(w*scale), int(h*scale))))[0])
+    return torch.cat(tiles)
+
+def quantize_minc_model(model, precision: str = MINC_PRECISION, channels_last: bool = False,
+                        calibration_dir: str = CALIBRATION_DIR):
+    """Apply a MINC_PRECISIONS mode (and the channels-last layout) to an eager googlenet."""
+    if precision not in MINC_PRECISIONS:
+        raise ValueError(f"unknown material model precision: {precision}, expected one of {MINC_PRECISIONS}")
+    if precision == 'dynamic_int8':
+        from torch.ao.quantization import quantize_dynamic, default_dynamic_qconfig
+        import torch.ao.nn.quantized.dynamic as nnqd
+        # Conv2d 不在預設的 dynamic mapping 裡，要自己指定；用名字挑，跳過 DYNAMIC_INT8_SKIP
+        qconfig_spec = {name: default_dynamic_qconfig for name, module in model.named_modules()
+                        if isinstance(module, nn.Conv2d) and name not in DYNAMIC_INT8_SKIP}
+        model = quantize_dynamic(model, qconfig_spec, dtype=torch.qint8, mapping={nn.Conv2d: nnqd.Conv2d})
+    elif precision == 'static_int8':
+        from torch.ao.quantization import get_default_qconfig_mapping
+        from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+        qconfig_mapping = get_default_qconfig_mapping(torch.backends.quantized.engine)
+        # LRN(fused) 在 autograd 關掉時走 in-place / out= 的分支，FX 量化會算錯，trace 時開著 grad
+        with torch.enable_grad():
+            model = prepare_fx(model, qconfig_mapping, example_inputs=(torch.zeros(1, 3, TILE, TILE),))
+        with torch.no_grad():
+            for batch in calibration_tiles(calibration_dir).split(TILE_BATCH):
+                model(batch)
+        model = convert_fx(model)
+
+    if channels_last:
+        model = model.to(memory_format=torch.channels_last)
+    if channels_last or precision == 'bf16':
+        model = CPUInference(model, channels_last, torch.bfloat16 if precision == 'bf16' else None)
+    return model.eval()
+
+def static_int8_path(weights: str = MINC_WEIGHTS, lrn: str = MINC_LRN) -> str:
+    """weights/minc-googlenet.pth -> weights/minc-googlenet.static_int8-fused.torchscript.pt"""
+    return os.path.splitext(weights)[0] + f'.static_int8-{lrn}.torchscript.pt'
+
+def export_static_int8(weights: str = MINC_WEIGHTS, lrn: str = MINC_LRN, calibration_dir: str = CALIBRATION_DIR,
+                       path: str = None) -> str:
+    """
+    Calibrate + convert the static int8 googlenet once and cache it next to the weights as a frozen
+    graph (exported again when the weights are newer; delete it after changing calibration_dir).
+    """
+    path = path or static_int8_path(weights, lrn)
+    if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(weights):
+        return path
+    t0 = time.perf_counter()
+    model = quantize_minc_model(load_googlenet(weights, lrn), 'static_int8', calibration_dir=calibration_dir)
+    with torch.no_grad():
+        graph = torch.jit.freeze(torch.jit.trace(model, torch.zeros(1, 3, TILE, TILE)))
+    torch.jit.save(graph, path)
+    print(f"[INFO] calibrated {weights} ({time.perf_counter() - t0:.1f} s) -> {path}")
+    return path
+
+def load_minc_model(weights: str = MINC_WEIGHTS, backend: str = MINC_BACKEND, precision: str = MINC_PRECISION,
+                    channels_last: bool = False, lrn: str = MINC_LRN):
+    """
+    backend: 'eager' (the nn.Module) or 'torchscript' (frozen graph from export_torchscript).
+    precision / channels_last: see quantize_minc_model, eager backend only
+    (static_int8 loads the graph cached by export_static_int8).
+    lrn: googlenet LRN implementation ('pool' / 'fused'), eager backend only.
+    """
+    if backend == 'eager':
+        if precision == 'static_int8':
+            model = torch.jit.load(export_static_int8(weights, lrn))
+            return CPUInference(model, channels_last).eval() if channels_last else model
+        return quantize_minc_model(load_googlenet(weights, lrn), precision, channels_last)
+    if backend == 'torchscript':
+        if precision != 'fp32' or channels_last:
+            raise ValueError("precision / channels_last modes run on the eager backend")
+        return torch.jit.optimize_for_inference(torch.jit.load(export_torchscript(weights)))
+    raise ValueError(f"unknown material model backend: {backend}, expected one of {MINC_BACKENDS}")
+
+class MaterialSegmenter:
+    """
+    MINC googlenet + labels + palette + DenseCRF, loaded once and kept by a long-lived worker,
+    so a request only pays for inference. Runs under torch.inference_mode(), the global grad
+    mode is left alone. tiled=False runs each scale as one whole-image pass (no 256x256 tiles),
+    backend='torchscript' runs the frozen graph cached next to the weights,
+    precision / channels_last pick a CPU precision mode (MINC_PRECISIONS).
+
+        with MaterialSegmenter() as seg:
+            seg.warmup()
+            out = seg(img_path, point_path, out_dir)
+    """
+    def __init__(self, weights: str = MINC_WEIGHTS, crf_params: dict = None, tiled: bool = True,
+                 backend: str = MINC_BACKEND, precision: str = MINC_PRECISION, channels_last: bool = False):
+        t0 = time.perf_counter()
+        self.weights = weights
+        self.tiled = tiled
+        self.backend = backend
+        self.precision = precision
+        self.model = load_minc_model(weights, backend, precision, channels_last)
+
+        labels = open(os.path.join(MATL_DIR, 'categories.txt'), 'r').readlines()
+        self.labels = [i.strip() for i in labels]
+        self.palette = load_palette(os.path.join(MATL_DIR, 'palette.txt'))
+        self.postprocessor = DenseCRF(**(crf_params or CRF_PARAMS))
+        self.load_s = time.perf_counter() - t0
+        self.warmup_s = None
+        print(f"[INFO] material model {weights} ({backend}, {precision}): load {self.load_s:.2f} s")
+
+    def warmup(self) -> float:
+        """One dummy multi-scale pass (allocator / kernel selection), returns its seconds."""
+        t0 = time.perf_counter()
+        with torch.inference_mode():
+            multi_scale_inference(np.zeros(INPUT_SIZE[::-1] + (3,), dtype=np.uint8), self.model, tiled=self.tiled)
+        self.warmup_s = time.perf_counter() - t0
+        print(f"[INFO] material model warmup {self.warmup_s:.2f} s")
+        return self.warmup_s
+
+    def predict(self, img: np.ndarray) -> tuple:
+        """BGR image -> (labelmap (480, 640), the image resized to the labelmap)."""
+        if self.model is None:
+            raise RuntimeError("MaterialSegmenter is closed")
+        img = cv2.resize(img, INPUT_SIZE)
+        with torch.inference_mode():
+            prob = multi_scale_inference(img, self.model, tiled=self.tiled)
+
+        prob = cv2.resize(prob, OUTPUT_SIZE)
+        img = cv2.resize(img, OUTPUT_SIZE)
+        prob = prob.transpose(2, 0, 1)
+        prob = self.postprocessor(img, prob)
+        return np.argmax(prob, axis=0), img
+
+    def __call__(self, img_path: str, point_path: str, out_dir: str, artifacts: bool = True) -> dict:
+        os.makedirs(os.path.join(MATL_DIR, 'results'), exist_ok=True)
+        os.makedirs(os.path.join(MATL_DIR, 'labelmaps'), exist_ok=True)
+        os.makedirs(os.path.join(MATL_DIR, 'fds_output'), exist_ok=True)
+
+        # ------- projection -------
+        img = cv2.imread(img_path)
+
+        # ------- pointclouds -------
+        df = read_points(point_path)
+
+        # ------- image processing -------
+        labelmap, img = self.predict(img)
+
+        # ------- drawing (background) -------
+        result_image = os.path.join(MATL_DIR, 'results', f"result.png")
+        if artifacts:
+            artifact_writer.submit(render_materials, img, labelmap, self.labels, result_image,
+                                   os.path.join(MATL_DIR, 'labelmaps', f"test_labelmap.txt"), self.palette)
+
+        labels = self.labels
+        df['material'] = df.apply(lambda row: get_material(row, labelmap, labels), axis=1)
+        output_csv_path = write_points(df, point_file_path(out_dir, 'pointcloud_with_material', point_format(point_path)))
+
+        return {
+            'labelmap': labelmap,
+            'labels': labels,
+            'result_image': result_image if artifacts else None,
+            'output_csv': output_csv_path
+        }
+
+    def close(self):
+        self.model = None
+        self.postprocessor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+_segmenters = {}
+_segmenter_lock = threading.Lock()
+
+def get_segmenter(backend: str = MINC_BACKEND, precision: str = MINC_PRECISION,
+                  channels_last: bool = False) -> MaterialSegmenter:
+    """The worker process' MaterialSegmenter for these settings, created on first use."""
+    key = (backend, precision, channels_last)
+    with _segmenter_lock:
+        if key not in _segmenters:
+            _segmenters[key] = MaterialSegmenter(backend=backend, precision=precision, channels_last=channels_last)
+        return _segmenters[key]
+
+def close_segmenter():
+    with _segmenter_lock:
+        for segmenter in _segmenters.values():
+            segmenter.close()
+        _segmenters.clear()
+
 #%%
-def run_on_image_cpu(img_path: str, point_path: str, out_dir: str) -> dict:
+def run_on_image_cpu(img_path: str, point_path: str, out_dir: str, artifacts: bool = True,
+                     segmenter: MaterialSegmenter = None, backend: str = MINC_BACKEND,
+                     precision: str = MINC_PRECISION) -> dict:
+    """
+    artifacts=False skips result.png / the labelmap dump, otherwise they are written in the background.
+    segmenter: defaults to the process-wide one for backend ('eager' / 'torchscript') and precision
+    (MINC_PRECISIONS), see get_segmenter().
+    """
     os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
-    os.makedirs(os.path.join(MATL_DIR, 'results'), exist_ok=True)
-    os.makedirs(os.path.join(MATL_DIR, 'labelmaps'), exist_ok=True)
-    os.makedirs(os.path.join(MATL_DIR, 'fds_output'), exist_ok=True)
-
-    model0 = googlenet
-    m0 = model0()
-    m0.load_state_dict(torch.load(os.path.join(MATL_DIR, 'weights', 'minc-googlenet.pth'), 
-                                weights_only=True), strict=False)
-    m0.eval()
-
-    torch.set_grad_enabled(False)
-
-    labels = open(os.path.join(MATL_DIR, 'categories.txt'), 'r').readlines()
-    labels = [i.strip() for i in labels]
-
-    postprocessor = DenseCRF(
-        iter_max=10,
-        pos_xy_std=1,
-        pos_w=3,
-        bi_xy_std=67,
-        bi_rgb_std=3,
-        bi_w=4,
-    )
-
-    # ------- projection -------
-    img = cv2.imread(img_path)
-
-    # ------- pointclouds -------
-    df = pd.read_csv(point_path)
-            
-    # ------- image processing -------
-    img = cv2.resize(img, (512, 512))
-    prob0 = multi_scale_inference(img, m0)
-    prob = prob0 
-
-    prob = cv2.resize(prob, (640, 480))
-    img = cv2.resize(img, (640, 480))
-    prob = prob.transpose(2, 0, 1)
-    prob = postprocessor(img, prob)
-    labelmap = np.argmax(prob, axis=0)
-
-    # ------- drawing -------
-    plt.figure(figsize=(15, 15))
-    
-    # 使用color_image_w_masks函數將所有材質標籤合併到同一張圖上
-    colored_image = color_image_w_masks(img.copy(), labelmap)
-    plt.imshow(colored_image[:, :, ::-1])
-    plt.axis("off")
-    
-    # 添加圖例
-    legend_elements = []
-    for i in range(23):
-        color = np.loadtxt(os.path.join(MATL_DIR, 'palette.txt')).astype(np.uint8)[i]
-        color = tuple(color / 255.0)  # 轉換為matplotlib可用的顏色格式
-        legend_elements.append(plt.Rectangle((0, 0), 1, 1, fc=color, label=labels[i]))
-    
-    plt.legend(handles=legend_elements, bbox_to_anchor=(1.05, 1), loc='upper left', borderaxespad=0.)
-    plt.tight_layout()
-    plt.savefig(os.path.join(MATL_DIR, 'results', f"result.png"), bbox_inches='tight')
-    np.savetxt(os.path.join(MATL_DIR, 'labelmaps', f"test_labelmap.txt"), labelmap, fmt='%d')
-
-    df['material'] = df.apply(lambda row: get_material(row, labelmap, labels), axis=1)
-    output_csv_path = os.path.join(out_dir, f'pointcloud_with_material.csv')
-    df.to_csv(output_csv_path, index=False)
-
-    return {
-        'labelmap': labelmap,
-        'labels': labels,
-        'result_image': os.path.join(MATL_DIR, 'results', f"result.png"),
-        'output_csv': output_csv_path
-    }
+    return (segmenter or get_segmenter(backend, precision))(img_path, point_path, out_dir, artifacts)
     
 # only for testing
 if __name__ == "__main__":
@@ -204,3 +433,4 @@ if __name__ == "__main__":
     img_path = os.path.join(FILE_DIR, 'test', 'projection.png')
     point_path = os.path.join(FILE_DIR, 'test', 'pointcloud_with_objects.csv')
     run_on_image_cpu(img_path, point_path, out_dir)
+    artifact_writer.wait()
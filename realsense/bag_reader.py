@@ -0,0 +1,222 @@
+"""
+Random-access reader for RealSense .bag recordings.
+Plays back in non-real-time mode and indexes frames lazily as playback reaches them:
+reading frame n of a fresh .bag decodes frames 0..n once, frames already indexed are
+reached by seeking. The full index (len(), a timestamp past the indexed range) is built
+on demand and cached next to the .bag for later runs.
+An optional depth_filter (realsense.depth_filters.DepthFilterChain) runs on every
+returned frameset before alignment.
+"""
+import pyrealsense2 as rs
+import numpy as np
+import datetime
+import json
+import os
+
+INDEX_SUFFIX = '.index.json'
+
+class BagReader:
+    def __init__(self, bag_file: str, align_to=rs.stream.color, index_path: str = None, depth_filter=None):
+        self.bag_file = bag_file
+        self.index_path = index_path or bag_file + INDEX_SUFFIX
+        self.depth_filter = depth_filter
+
+        # processing blocks are built once and reused for every frame
+        self.align = rs.align(align_to)
+        self.pc = rs.pointcloud()
+
+        self.pipeline = rs.pipeline()
+        self.config = rs.config()
+        self.config.enable_device_from_file(bag_file, False)
+        self._start()
+
+        cached = self._load_index()
+        self.complete = cached is not None
+        self.index = cached or {'position': [], 'timestamp': []}
+
+    def _start(self):
+        self.profile = self.pipeline.start(self.config)
+        self.playback = self.profile.get_device().as_playback()
+        self.playback.set_real_time(False)
+        # frame number the next try_wait_for_frames returns, None once playback has ended
+        self.cursor = 0
+
+    # ----------------- frame index -----------------
+    def _bag_signature(self) -> dict:
+        st = os.stat(self.bag_file)
+        return {'size': st.st_size, 'mtime': st.st_mtime}
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return None
+        with open(self.index_path, 'r') as f:
+            cached = json.load(f)
+        if cached.get('bag') != self._bag_signature():
+            return None
+        return {k: list(v) for k, v in cached['frames'].items()}
+
+    def _save_index(self):
+        cached = {
+            'bag': self._bag_signature(),
+            'frames': self.index,
+        }
+        try:
+            with open(self.index_path, 'w') as f:
+                json.dump(cached, f)
+        except OSError:
+            # read-only location, keep the in-memory index only
+            pass
+
+    def _next(self):
+        """Next frameset of the playback, indexing it on the way; None at the end of the recording."""
+        if self.cursor is None:
+            return None
+        ok, frames = self.pipeline.try_wait_for_frames(1000)
+        if not ok:
+            if self.cursor == self.indexed and not self.complete:
+                self.complete = True
+                print(f"[INFO] indexed {self.indexed} frames of {os.path.basename(self.bag_file)}")
+                self._save_index()
+            self.cursor = None
+            return None
+        if self.cursor == self.indexed and not self.complete:
+            self.index['position'].append(self.playback.get_position())   # playback position (ns)
+            self.index['timestamp'].append(frames.get_timestamp())        # frameset timestamp (ms)
+        self.cursor += 1
+        return frames
+
+    def _index_until(self, timestamp: float = None):
+        # decode on from the last indexed frame, to the end or past timestamp
+        while not self.complete:
+            if timestamp is not None and self.indexed and self.index['timestamp'][-1] >= timestamp:
+                return
+            try:
+                self._frameset(self.indexed)
+            except IndexError:
+                pass
+
+    @property
+    def indexed(self) -> int:
+        return len(self.index['position'])
+
+    @property
+    def depth_scale(self) -> float:
+        return self.profile.get_device().first_depth_sensor().get_depth_scale()
+
+    def __len__(self):
+        self._index_until()
+        return self.indexed
+
+    def frame_at(self, timestamp: float) -> int:
+        """Index of the frame nearest to a frameset timestamp (ms)."""
+        self._index_until(timestamp)
+        ts = np.asarray(self.index['timestamp'])
+        if not len(ts):
+            raise IndexError(f"{self.bag_file} has no frames")
+        i = int(np.clip(np.searchsorted(ts, timestamp), 0, len(ts) - 1))
+        if i > 0 and abs(ts[i - 1] - timestamp) <= abs(ts[i] - timestamp):
+            i -= 1
+        return i
+
+    # ----------------- frame access -----------------
+    def _seek(self, frame_number: int):
+        """Seek to an indexed frame and return its frameset."""
+        if self.cursor is None:
+            # playback has reached the end, restart it for seeking
+            self.pipeline.stop()
+            self._start()
+        target = self.index['timestamp'][frame_number]
+        self.playback.seek(datetime.timedelta(microseconds=int(self.index['position'][frame_number]) // 1000))
+
+        # frames queued before the seek are dropped until the target shows up
+        for _ in range(self.indexed):
+            ok, frames = self.pipeline.try_wait_for_frames(1000)
+            if not ok:
+                break
+            if frames.get_timestamp() >= target:
+                self.cursor = frame_number + 1
+                return frames
+        self.cursor = None
+        raise RuntimeError(f"frame {frame_number} could not be read from {self.bag_file}")
+
+    def _frameset(self, frame_number: int):
+        # indexed frames other than the next one are seeked to, the rest is decoded in order
+        if frame_number < 0 or (self.complete and frame_number >= self.indexed):
+            raise IndexError(f"frame {frame_number} out of range (0~{self.indexed - 1})")
+        if frame_number < self.indexed and frame_number != self.cursor:
+            return self._seek(frame_number)
+        if frame_number >= self.indexed and self.cursor is not None and self.cursor < self.indexed - 1:
+            # not indexed yet: jump to the last indexed frame and decode on from there
+            self._seek(self.indexed - 1)
+        frames = None
+        while self.cursor is not None and self.cursor <= frame_number:
+            frames = self._next()
+        if frames is None:
+            raise IndexError(f"frame {frame_number} out of range (0~{self.indexed - 1})")
+        return frames
+
+    def read_frames(self, frame_number: int):
+        """Aligned (depth_frame, color_frame) of frame_number."""
+        aligned_frames = self._align(self._frameset(frame_number))
+        depth_frame = aligned_frames.get_depth_frame()
+        color_frame = aligned_frames.get_color_frame()
+        if not depth_frame or not color_frame:
+            raise RuntimeError(f"frame {frame_number} could not be read from {self.bag_file}")
+        return depth_frame, color_frame
+
+    def read(self, frame_number: int):
+        """(color, depth, intrinsics) of one frame, depth aligned to color."""
+        depth_frame, color_frame = self.read_frames(frame_number)
+        return self._to_arrays(depth_frame, color_frame)
+
+    def read_at(self, timestamp: float):
+        return self.read(self.frame_at(timestamp))
+
+    def frames(self, start: int = 0, stop: int = None, step: int = 1):
+        """Stream (color, depth, intrinsics) tuples sequentially from frame start (to the end when stop is None)."""
+        current = start
+        while stop is None or current < stop:
+            try:
+                frames = self._frameset(current)
+            except IndexError:
+                return
+            if not (current - start) % step:
+                aligned_frames = self._align(frames)
+                depth_frame = aligned_frames.get_depth_frame()
+                color_frame = aligned_frames.get_color_frame()
+                if depth_frame and color_frame:
+                    yield self._to_arrays(depth_frame, color_frame)
+            current += 1
+
+    def _align(self, frames):
+        if self.depth_filter is not None:
+            frames = self.depth_filter.process(frames)
+        return self.align.process(frames)
+
+    def points(self, depth_frame, color_frame):
+        """Vertices (N, 3) and texture coordinates (N, 2) from the shared pointcloud block."""
+        self.pc.map_to(color_frame)
+        points = self.pc.calculate(depth_frame)
+        vtx = np.asanyarray(points.get_vertices()).view(np.float32).reshape(-1, 3)
+        tex = np.asanyarray(points.get_texture_coordinates()).view(np.float32).reshape(-1, 2)
+        return vtx, tex
+
+    @staticmethod
+    def _to_arrays(depth_frame, color_frame):
+        # copy out of the frame pool so the arrays outlive the frames
+        color_image = np.asanyarray(color_frame.get_data()).copy()
+        if color_frame.profile.format() == rs.format.bgr8:
+            # the pipeline works on RGB frames (rgb8 is what the recordings carry)
+            color_image = color_image[:, :, ::-1].copy()
+        depth_image = np.asanyarray(depth_frame.get_data()).copy()
+        intrinsics = color_frame.profile.as_video_stream_profile().get_intrinsics()
+        return color_image, depth_image, intrinsics
+
+    def close(self):
+        self.pipeline.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,138 @@
+"""
+Calibration sidecar for the image-to-world transform.
+no_cap writes it once per capture, world_coordinates (and repeat runs) load it
+instead of reopening the .bag and recomputing the pseudo-inverses.
+"""
+import pyrealsense2 as rs
+import numpy as np
+import hashlib
+import json
+import os
+from realsense.coor_reconstruct import (
+    ImageAndDepth2RealWorldTransformator,
+    referencePoints_pixelDepth,
+    referencePoints_realWorld,
+)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SENS_DIR = os.path.join(BASE_DIR, 'realsense')
+CALIB_DIR = os.path.join(SENS_DIR, 'calibration')
+SIDECAR_NAME = 'calibration.json'
+
+def intrinsics_to_dict(intrinsics) -> dict:
+    return {
+        'width': intrinsics.width,
+        'height': intrinsics.height,
+        'ppx': intrinsics.ppx,
+        'ppy': intrinsics.ppy,
+        'fx': intrinsics.fx,
+        'fy': intrinsics.fy,
+        'model': int(intrinsics.model),
+        'coeffs': list(intrinsics.coeffs),
+    }
+
+def intrinsics_from_dict(d: dict):
+    intrinsics = rs.intrinsics()
+    intrinsics.width = d['width']
+    intrinsics.height = d['height']
+    intrinsics.ppx = d['ppx']
+    intrinsics.ppy = d['ppy']
+    intrinsics.fx = d['fx']
+    intrinsics.fy = d['fy']
+    intrinsics.model = rs.distortion(d['model'])
+    intrinsics.coeffs = d['coeffs']
+    return intrinsics
+
+def stream_profile_to_dict(profile) -> dict:
+    video = profile.as_video_stream_profile()
+    return {
+        'stream': str(profile.stream_type()),
+        'format': str(profile.format()),
+        'fps': profile.fps(),
+        'width': video.width(),
+        'height': video.height(),
+    }
+
+def calibration_key(serial: str, depth_profile: dict, color_profile: dict,
+                    pixelDepth=referencePoints_pixelDepth, realWorld=referencePoints_realWorld) -> str:
+    # device serial + stream profiles + reference-point set
+    payload = json.dumps({
+        'serial': serial,
+        'depth': depth_profile,
+        'color': color_profile,
+        'pixelDepth': np.asarray(pixelDepth, dtype=np.float64).tolist(),
+        'realWorld': np.asarray(realWorld, dtype=np.float64).tolist(),
+    }, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+def check_reference_pixels(pixelDepth, width: int, height: int):
+    pixels = np.asarray(pixelDepth, dtype=np.float64)[:, :2]
+    outside = (pixels[:, 0] >= width) | (pixels[:, 1] >= height) | (pixels < 0).any(axis=1)
+    if outside.any():
+        raise ValueError(f"reference pixels {pixels[outside].astype(int).tolist()} lie outside the "
+                         f"{width}x{height} color stream, they were picked at another resolution")
+
+def build_calibration(profile, pixelDepth=referencePoints_pixelDepth, realWorld=referencePoints_realWorld) -> dict:
+    """
+    Collect intrinsics of an active pipeline profile and calibrate the transformator.
+    Reuses the cached result under realsense/calibration/ when the key matches.
+    """
+    depth_stream = profile.get_stream(rs.stream.depth)
+    color_stream = profile.get_stream(rs.stream.color)
+    try:
+        serial = profile.get_device().get_info(rs.camera_info.serial_number)
+    except RuntimeError:
+        serial = 'unknown'
+
+    depth_profile = stream_profile_to_dict(depth_stream)
+    color_profile = stream_profile_to_dict(color_stream)
+    key = calibration_key(serial, depth_profile, color_profile, pixelDepth, realWorld)
+
+    cache_path = os.path.join(CALIB_DIR, f'{key}.json')
+    if os.path.exists(cache_path):
+        return load_calibration(cache_path)
+
+    color_intrinsics = color_stream.as_video_stream_profile().get_intrinsics()
+    depth_intrinsics = depth_stream.as_video_stream_profile().get_intrinsics()
+    transformator = ImageAndDepth2RealWorldTransformator(
+        color_intrinsics,
+        pixelDepth,
+        np.asarray(realWorld, dtype=np.float64)
+    )
+
+    calibration = {
+        'key': key,
+        'serial': serial,
+        'depth_profile': depth_profile,
+        'color_profile': color_profile,
+        'depth_intrinsics': intrinsics_to_dict(depth_intrinsics),
+        'color_intrinsics': intrinsics_to_dict(color_intrinsics),
+        'referencePoints_pixelDepth': np.asarray(pixelDepth, dtype=np.float64).tolist(),
+        'referencePoints_realWorld': np.asarray(realWorld, dtype=np.float64).tolist(),
+        'transformationMatrixImage2RealWorld': transformator.transformationMatrixImage2RealWorld.tolist(),
+        'transformationMatrixRealWorld2Image': transformator.transformationMatrixRealWorld2Image.tolist(),
+    }
+    save_calibration(calibration, cache_path)
+    return calibration
+
+def save_calibration(calibration: dict, path: str) -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(calibration, f, indent=2)
+    return path
+
+def load_calibration(path: str) -> dict:
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def transformator_from_calibration(calibration: dict) -> ImageAndDepth2RealWorldTransformator:
+    return ImageAndDepth2RealWorldTransformator.from_matrix(
+        intrinsics_from_dict(calibration['color_intrinsics']),
+        np.array(calibration['transformationMatrixImage2RealWorld']),
+        np.array(calibration['transformationMatrixRealWorld2Image'])
+    )
+
+def find_sidecar(csv_file: str):
+    """Return the calibration.json written next to a pointcloud file, if any."""
+    path = os.path.join(os.path.dirname(os.path.abspath(csv_file)), SIDECAR_NAME)
+    return path if os.path.exists(path) else None
@@ -2,6 +2,7 @@ import pyrealsense2 as rs
 import numpy as np
 import pandas as pd
 import os
+from realsense.point_io import color_columns
 # import open3d as o3d
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -23,6 +24,96 @@ referencePoints_realWorld = np.array([
     [0.43, 0.0, 0.0, 1.0]
 ])
 
+def deproject_pixels(intrinsics, u, v, depth):
+    """
+    Vectorized rs.rs2_deproject_pixel_to_point over whole arrays.
+    Follows the librealsense distortion models, returns an (N, 3) float64 array.
+    """
+    u = np.asarray(u, dtype=np.float64)
+    v = np.asarray(v, dtype=np.float64)
+    depth = np.asarray(depth, dtype=np.float64)
+    c = list(intrinsics.coeffs)
+    model = intrinsics.model
+
+    x = (u - intrinsics.ppx) / intrinsics.fx
+    y = (v - intrinsics.ppy) / intrinsics.fy
+    xo, yo = x, y
+
+    if model == rs.distortion.inverse_brown_conrady:
+        # librealsense also uses a fixed 10 iterations here
+        for _ in range(10):
+            r2 = x * x + y * y
+            icdist = 1 / (1 + ((c[4] * r2 + c[1]) * r2 + c[0]) * r2)
+            xq = x / icdist
+            yq = y / icdist
+            delta_x = 2 * c[2] * xq * yq + c[3] * (r2 + 2 * xq * xq)
+            delta_y = 2 * c[3] * xq * yq + c[2] * (r2 + 2 * yq * yq)
+            x = (xo - delta_x) * icdist
+            y = (yo - delta_y) * icdist
+    elif model == rs.distortion.brown_conrady:
+        for _ in range(10):
+            r2 = x * x + y * y
+            icdist = 1 / (1 + ((c[4] * r2 + c[1]) * r2 + c[0]) * r2)
+            delta_x = 2 * c[2] * x * y + c[3] * (r2 + 2 * x * x)
+            delta_y = 2 * c[3] * x * y + c[2] * (r2 + 2 * y * y)
+            x = (xo - delta_x) * icdist
+            y = (yo - delta_y) * icdist
+    elif model == rs.distortion.kannala_brandt4:
+        eps = np.finfo(np.float32).eps
+        rd = np.maximum(np.sqrt(x * x + y * y), eps)
+        theta = rd.copy()
+        theta2 = rd * rd
+        for _ in range(4):
+            f = theta * (1 + theta2 * (c[0] + theta2 * (c[1] + theta2 * (c[2] + theta2 * c[3])))) - rd
+            active = np.abs(f) >= eps
+            if not active.any():
+                break
+            df = 1 + theta2 * (3 * c[0] + theta2 * (5 * c[1] + theta2 * (7 * c[2] + 9 * theta2 * c[3])))
+            theta = np.where(active, theta - f / df, theta)
+            theta2 = theta * theta
+        r = np.tan(theta)
+        x = x * r / rd
+        y = y * r / rd
+    elif model == rs.distortion.ftheta:
+        eps = np.finfo(np.float32).eps
+        rd = np.maximum(np.sqrt(x * x + y * y), eps)
+        r = np.tan(c[0] * rd) / np.arctan(2 * np.tan(c[0] / 2.0))
+        x = x * r / rd
+        y = y * r / rd
+    # none / modified_brown_conrady: plain pinhole, same as librealsense
+
+    return np.column_stack((depth * x, depth * y, depth))
+
+def pixel_rays(intrinsics):
+    """
+    Unit-depth ray of every pixel, shape (height, width, 3).
+    Deprojection is linear in depth, so deproject_pixels(intrinsics, u, v, d) == rays[v, u] * d
+    and a fixed camera only needs this table once instead of undistorting every frame.
+    """
+    v, u = np.mgrid[0:intrinsics.height, 0:intrinsics.width]
+    rays = deproject_pixels(intrinsics, u.ravel(), v.ravel(), np.ones(u.size))
+    return rays.reshape(intrinsics.height, intrinsics.width, 3)
+
+def depth_image_to_points(depth_image, color_image, intrinsics, depth_scale):
+    """
+    Whole depth image -> pointcloud table (x, y, z in meters, u, v, R, G, B).
+    depth_image must be aligned to color_image, an RGB frame as BagReader returns it.
+    Pixels with zero depth are dropped.
+    """
+    v, u = np.nonzero(depth_image)
+    depth = depth_image[v, u].astype(np.float64) * depth_scale
+    points = deproject_pixels(intrinsics, u, v, depth)
+    colors = color_image[v, u]
+
+    return pd.DataFrame({
+        'x': points[:, 0],
+        'y': points[:, 1],
+        'z': points[:, 2],
+        'u': u,
+        'v': v,
+        **color_columns(colors, 'RGB')
+    })
+
 class ImageAndDepth2RealWorldTransformator:
     def __init__(self, intrinsics, referencePoints_pixelDepth, referencePoints_realWorld):
         self.intrinsics = intrinsics
@@ -49,6 +140,17 @@ class ImageAndDepth2RealWorldTransformator:
         print("transformationMatrixImage2RealWorld:\n", self.transformationMatrixImage2RealWorld)
         print("transformationMatrixRealWorld2Image:\n", self.transformationMatrixRealWorld2Image)
 
+    @classmethod
+    def from_matrix(cls, intrinsics, image2RealWorld, realWorld2Image=None):
+        # rebuild a calibrated transformator from stored matrices, no pinv needed
+        self = cls.__new__(cls)
+        self.intrinsics = intrinsics
+        self.transformationMatrixImage2RealWorld = np.asarray(image2RealWorld, dtype=np.float64)
+        if realWorld2Image is None:
+            realWorld2Image = np.linalg.pinv(self.transformationMatrixImage2RealWorld)
+        self.transformationMatrixRealWorld2Image = np.asarray(realWorld2Image, dtype=np.float64)
+        return self
+
     def pixelDepth2VectorPoint(self, x, y, depth):
         point_x, point_y, point_z = rs.rs2_deproject_pixel_to_point(self.intrinsics, [x, y], depth)
         return np.array([point_x, point_y, point_z], dtype='float64')
@@ -68,57 +170,62 @@ class ImageAndDepth2RealWorldTransformator:
         vPoint[0, 0:3] = point
         return np.dot(self.transformationMatrixImage2RealWorld, np.array(vPoint[0]))[0:3]
 
-def world_coordinates(bag_file: str, csv_file: str, output_csv: str = None) -> str:
-    df = pd.read_csv(csv_file)
-    pipeline = rs.pipeline()
-    config = rs.config()
-    config.enable_device_from_file(bag_file)
-    pipeline.start(config)
-
-    profile = pipeline.get_active_profile()
-    depth_profile = rs.video_stream_profile(profile.get_stream(rs.stream.depth))
-    color_profile = rs.video_stream_profile(profile.get_stream(rs.stream.color))
-    depth_intrinsics = depth_profile.get_intrinsics()
-    color_intrinsics = color_profile.get_intrinsics()
-
-    imageAndDepth2RealWorldTransformator = ImageAndDepth2RealWorldTransformator(
-        color_intrinsics,
-        referencePoints_pixelDepth,
-        referencePoints_realWorld
-    )
-
-    world_points = []  # list of [X, Y, Z]
-    orig_colors  = []  # list of [R, G, B]
-    for index, row in df.iterrows():
-        u = row['u']
-        v = row['v']
-        z = row['z'] * 1000  # meter -> millimeter
-        R = row['R']
-        G = row['G']
-        B = row['B']
-
-        # 把 (u, v, depth) 轉成世界座標 (X, Y, Z)
-        X, Y, Z = imageAndDepth2RealWorldTransformator.pixelDepth2RealWorld(u, v, z)
-        world_points.append([X, Y, Z])
-        orig_colors.append([R, G, B])
-
-    pipeline.stop()
-    points_array = np.array(world_points)      # shape = (N, 3)
-    colors_array = np.array(orig_colors)       # shape = (N, 3)
+    def pixelDepth2RealWorld_batch(self, u, v, depth):
+        # pixelDepth2RealWorld for whole arrays, returns (N, 3)
+        points = deproject_pixels(self.intrinsics, u, v, depth)
+        vPoints = np.ones((points.shape[0], 4))
+        vPoints[:, 0:3] = points
+        return np.dot(vPoints, self.transformationMatrixImage2RealWorld.T)[:, 0:3]
+
+def world_coordinates(bag_file: str, csv_file: str, output_csv: str = None, calibration: str = None) -> str:
+    from realsense.calibration import load_calibration, transformator_from_calibration, find_sidecar
+    from realsense.point_io import read_points, write_points
+
+    df = read_points(csv_file)
+
+    # no_cap 已寫好 calibration.json 時直接載入，不必再開一次 .bag
+    if calibration is None:
+        calibration = find_sidecar(csv_file)
+
+    if calibration is not None:
+        imageAndDepth2RealWorldTransformator = transformator_from_calibration(load_calibration(calibration))
+    else:
+        pipeline = rs.pipeline()
+        config = rs.config()
+        config.enable_device_from_file(bag_file)
+        pipeline.start(config)
+
+        profile = pipeline.get_active_profile()
+        color_profile = rs.video_stream_profile(profile.get_stream(rs.stream.color))
+        color_intrinsics = color_profile.get_intrinsics()
+
+        imageAndDepth2RealWorldTransformator = ImageAndDepth2RealWorldTransformator(
+            color_intrinsics,
+            referencePoints_pixelDepth,
+            referencePoints_realWorld
+        )
+
+        pipeline.stop()
+
+    # 把 (u, v, depth) 轉成世界座標 (X, Y, Z)，整個點雲一次計算
+    z = df['z'].values * 1000  # meter -> millimeter
+    points_array = imageAndDepth2RealWorldTransformator.pixelDepth2RealWorld_batch(
+        df['u'].values, df['v'].values, z
+    )                                          # shape = (N, 3)
 
     df_out = pd.DataFrame(points_array, columns=['x', 'y', 'z'])
     df_out['u'] = df['u'].values
     df_out['v'] = df['v'].values
-    df_out['R'] = colors_array[:, 0].astype(int)
-    df_out['G'] = colors_array[:, 1].astype(int)
-    df_out['B'] = colors_array[:, 2].astype(int)
+    df_out['R'] = df['R'].values.astype(int)
+    df_out['G'] = df['G'].values.astype(int)
+    df_out['B'] = df['B'].values.astype(int)
 
 
     if output_csv is None:
         # output_csv = os.path.join(os.path.dirname(csv_file), f'world_{os.path.basename(csv_file)}')
         output_csv = csv_file
     
-    df_out.to_csv(output_csv, index=False)
+    write_points(df_out, output_csv)
     print(f"[INFO] 已將轉換後的世界座標與顏色存成：{output_csv}")
     
     return output_csv
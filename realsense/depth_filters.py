@@ -0,0 +1,120 @@
+"""
+Declarative depth post-processing chain over the librealsense filter blocks.
+Each block is built once and reused for every frame (temporal keeps its history),
+and every filter records its runtime and how many valid depth pixels it removed.
+
+    chain = DepthFilterChain(['decimation', ('spatial', {'filter_magnitude': 2}), 'hole_filling'])
+    chain = DepthFilterChain('decimation:filter_magnitude=2,spatial,temporal,hole_filling')
+    frames = chain.process(frames)        # frameset or depth frame, before rs.align
+    print(chain.report())
+"""
+import pyrealsense2 as rs
+import numpy as np
+import time
+
+FILTER_BLOCKS = {
+    'decimation': rs.decimation_filter,
+    'threshold': rs.threshold_filter,
+    'disparity': lambda: rs.disparity_transform(True),   # depth -> disparity
+    'spatial': rs.spatial_filter,
+    'temporal': rs.temporal_filter,
+    'depth': lambda: rs.disparity_transform(False),      # disparity -> depth
+    'hole_filling': rs.hole_filling_filter,
+}
+
+# librealsense 建議的順序 (rs-post-processing)
+DEFAULT_FILTERS = ['decimation', 'disparity', 'spatial', 'temporal', 'depth', 'hole_filling']
+
+def parse_filters(spec) -> list:
+    """
+    Normalise a chain spec into [(name, {option: value}), ...].
+    spec: 'name:opt=val;opt=val,name,...' or a list of names / (name, options) pairs.
+    """
+    if spec is None:
+        return []
+    if isinstance(spec, str):
+        items = []
+        for part in filter(None, (p.strip() for p in spec.split(','))):
+            name, _, opts = part.partition(':')
+            options = {}
+            for opt in filter(None, opts.split(';')):
+                key, _, value = opt.partition('=')
+                options[key.strip()] = float(value)
+            items.append((name.strip(), options))
+        spec = items
+
+    chain = []
+    for item in spec:
+        name, options = (item, {}) if isinstance(item, str) else (item[0], dict(item[1]))
+        if name not in FILTER_BLOCKS:
+            raise ValueError(f"unknown depth filter: {name}, expected one of {tuple(FILTER_BLOCKS)}")
+        chain.append((name, options))
+    return chain
+
+def _depth_of(frame):
+    if frame.is_frameset():
+        return frame.as_frameset().get_depth_frame()
+    return frame
+
+def valid_pixels(frame) -> int:
+    """Number of non-zero depth (or disparity) pixels of a depth frame or frameset."""
+    return int(np.count_nonzero(np.asanyarray(_depth_of(frame).get_data())))
+
+class DepthFilterChain:
+    def __init__(self, spec=DEFAULT_FILTERS, count_points: bool = True):
+        self.spec = parse_filters(spec)
+        self.count_points = count_points
+        self.filters = []
+        names = {}
+        for name, options in self.spec:
+            block = FILTER_BLOCKS[name]()
+            for key, value in options.items():
+                block.set_option(getattr(rs.option, key), value)
+            # 同一種 filter 出現多次時加上編號
+            names[name] = names.get(name, 0) + 1
+            label = name if names[name] == 1 else f'{name}#{names[name]}'
+            self.filters.append((label, block))
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.frames = 0
+        self.stats = {label: {'ms': 0.0, 'removed': 0} for label, _ in self.filters}
+
+    def process(self, frame):
+        """Run the chain on a depth frame or a frameset (returned as the same kind)."""
+        is_frameset = frame.is_frameset()
+        before = valid_pixels(frame) if self.count_points else 0
+        for label, block in self.filters:
+            t0 = time.perf_counter()
+            frame = block.process(frame)
+            self.stats[label]['ms'] += (time.perf_counter() - t0) * 1000
+            if self.count_points:
+                after = valid_pixels(frame)
+                self.stats[label]['removed'] += before - after
+                before = after
+        self.frames += 1
+        return frame.as_frameset() if is_frameset else frame
+
+    __call__ = process
+
+    def __len__(self):
+        return len(self.filters)
+
+    def summary(self) -> dict:
+        """Per filter: mean ms and mean valid pixels removed per frame (negative = filled in)."""
+        n = max(self.frames, 1)
+        return {label: {'ms': s['ms'] / n, 'removed': s['removed'] / n} for label, s in self.stats.items()}
+
+    def report(self) -> str:
+        lines = [f"depth filters over {self.frames} frame(s):"]
+        for label, s in self.summary().items():
+            removed = f"removed {s['removed']:8.0f} pts" if self.count_points else ''
+            lines.append(f"  {label:<14} {s['ms']:7.2f} ms  {removed}")
+        return '\n'.join(lines)
+
+def make_filter_chain(spec):
+    """None / empty spec -> None, a ready DepthFilterChain is passed through."""
+    if spec is None or isinstance(spec, DepthFilterChain):
+        return spec
+    chain = DepthFilterChain(spec)
+    return chain if len(chain) else None
@@ -0,0 +1,100 @@
+"""
+Multi-frame temporal fusion of aligned depth images.
+Depth frames are streamed into fixed-size per-pixel accumulators, so memory does not
+grow with the number of fused frames.
+"""
+import numpy as np
+
+FUSION_METHODS = ('median', 'mean')
+MEDIAN_SAMPLES = 16     # per-pixel reservoir of the 'median' method, 9.4 MB at 640x480
+
+class DepthAccumulator:
+    """
+    Per-pixel reduction of depth images with validity counts, in fixed-size buffers.
+
+    method='mean'   exact running mean of the valid (non-zero) samples.
+    method='median' median of a per-pixel reservoir of `samples` valid depths (uint16).
+                    Exact (np.median semantics) while a pixel has at most `samples` valid
+                    readings; past that the reservoir is a uniform random subset of all of
+                    them (Algorithm R), so the result is the median of `samples` draws.
+    """
+    def __init__(self, shape, method: str = 'median', samples: int = MEDIAN_SAMPLES, seed: int = 0):
+        if method not in FUSION_METHODS:
+            raise ValueError(f"unknown fusion method: {method}, expected one of {FUSION_METHODS}")
+        self.shape = tuple(shape)
+        self.method = method
+        self.frames = 0
+        self.count = np.zeros(self.shape, dtype=np.uint32)
+
+        if method == 'mean':
+            self.total = np.zeros(self.shape, dtype=np.float64)
+        else:
+            if samples < 1:
+                raise ValueError(f"samples must be at least 1, got {samples}")
+            self.samples = np.zeros((samples,) + self.shape, dtype=np.uint16)
+            self.rng = np.random.default_rng(seed)
+
+    def update(self, depth_image):
+        depth_image = np.asarray(depth_image)
+        if depth_image.shape != self.shape:
+            raise ValueError(f"depth shape {depth_image.shape} does not match accumulator {self.shape}")
+
+        valid = depth_image > 0
+        if self.method == 'mean':
+            np.add(self.total, depth_image, out=self.total, where=valid)
+        else:
+            self._update_reservoir(depth_image, valid)
+        self.count += valid
+        self.frames += 1
+
+    def _update_reservoir(self, depth_image, valid):
+        slots = self.samples.reshape(len(self.samples), -1)
+        x = depth_image.reshape(-1)
+        n = self.count.reshape(-1).astype(np.int64)
+        pixels = np.flatnonzero(valid)
+        seen = n[pixels]
+
+        # the n-th valid sample replaces a random slot with probability samples / (n + 1)
+        slot = np.where(seen < len(slots), seen, (self.rng.random(pixels.size) * (seen + 1)).astype(np.int64))
+        take = slot < len(slots)
+        slots[slot[take], pixels[take]] = x[pixels[take]]
+
+    def _median(self, keep):
+        # empty slots sort last, so the valid samples of a pixel are the first n entries
+        stack = self.samples.copy()
+        stack[stack == 0] = np.iinfo(stack.dtype).max
+        stack.sort(axis=0)
+
+        n = np.clip(self.count, 1, len(stack)).astype(np.int64)[None]
+        lo = np.take_along_axis(stack, (n - 1) // 2, axis=0)[0].astype(np.float64)
+        hi = np.take_along_axis(stack, n // 2, axis=0)[0].astype(np.float64)
+        return np.where(keep, (lo + hi) / 2, 0)
+
+    def result(self, min_count: int = 1, dtype=np.uint16):
+        """Fused depth image, 0 where fewer than min_count valid samples were seen."""
+        keep = self.count >= max(min_count, 1)
+        if self.method == 'mean':
+            fused = np.divide(self.total, self.count, out=np.zeros(self.shape), where=keep)
+        else:
+            fused = self._median(keep)
+        return np.rint(fused).astype(dtype)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [self.count]
+        if self.method == 'mean':
+            arrays.append(self.total)
+        else:
+            arrays.append(self.samples)
+        return sum(a.nbytes for a in arrays)
+
+def fuse_depth(depth_images, method: str = 'median', min_count: int = 1):
+    """Fuse an iterable of depth images, returns (fused depth, validity counts)."""
+    acc = None
+    for depth_image in depth_images:
+        if acc is None:
+            acc = DepthAccumulator(np.shape(depth_image), method)
+        acc.update(depth_image)
+    if acc is None:
+        raise ValueError("no depth images to fuse")
+    return acc.result(min_count), acc.count
@@ -1,13 +1,20 @@
 """
 Correctly get 2d-image from pointclouds information, NO NEED of Intel Realsense when running this program.
 Input:  .bag
-Output: .csv and .png (projection image of pointclouds)
+Output: pointcloud (.npz or .csv, see realsense.point_io), .png (projection image of pointclouds) and calibration.json (intrinsics + image-to-world matrix)
 """
 import pyrealsense2 as rs
 import numpy as np
 import pandas as pd
 import cv2
 import os
+from realsense.bag_reader import BagReader
+from realsense.calibration import build_calibration, save_calibration, SIDECAR_NAME
+from realsense.coor_reconstruct import depth_image_to_points
+from realsense.depth_filters import make_filter_chain
+from realsense.fusion import DepthAccumulator
+from realsense.point_io import write_points, point_path, color_columns, point_colors, POINT_FORMAT
+from realsense.raster import splat
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DEMO_DIR = os.path.join(BASE_DIR, 'demo_web')
@@ -15,82 +22,128 @@ MATL_DIR = os.path.join(BASE_DIR, 'material_segmentation')
 SENS_DIR = os.path.join(BASE_DIR, 'realsense')
 FILE_DIR = os.path.join(DEMO_DIR, 'results')
 
-def no_cap(bag_file: str, out_dir: str) -> dict:
-    pipeline = rs.pipeline()
-    config = rs.config()
-    config.enable_device_from_file(bag_file, False)
-    pipeline.start(config)
+def no_cap(bag_file: str, out_dir: str, frame_number: int = 9,
+           fuse_frames: int = 1, fuse_method: str = 'median', min_count: int = 1,
+           point_format: str = POINT_FORMAT, splat_radius: int = None, depth_filters=None) -> dict:
+    """
+    Export frame `frame_number` (default: the 10th frame) of a .bag as pointcloud + projection.png.
+    point_format ('npz' or 'csv') is kept by every later stage.
+    With fuse_frames > 1 the depth of fuse_frames aligned frames starting there is fused
+    per pixel (fuse_method 'median' or 'mean', see realsense.fusion) into one denoised cloud.
+    With splat_radius set, the points are also rendered into projection_points.png.
+    depth_filters: librealsense post-processing chain run on the raw depth before alignment,
+    e.g. 'decimation,spatial,hole_filling' (see realsense.depth_filters), None = raw depth.
+    """
+    depth_filter = make_filter_chain(depth_filters)
+    if fuse_frames > 1:
+        return _no_cap_fused(bag_file, out_dir, frame_number, fuse_frames, fuse_method, min_count,
+                             point_format, splat_radius, depth_filter)
 
-    current_frame = 0
+    reader = BagReader(bag_file, depth_filter=depth_filter)
     try:
-        while True:
-            frames = pipeline.wait_for_frames()
-            if not frames:
-                print("[INFO] No more frames available, exiting.")
-                break
-            current_frame += 1
-            if current_frame < 10:
-                continue
-
-            align = rs.align(rs.stream.color)
-            aligned_frames = align.process(frames)
-            depth_frame = aligned_frames.get_depth_frame()
-            color_frame = aligned_frames.get_color_frame()
-
-            if not depth_frame or not color_frame:
-                continue
-
-            color_image = np.asanyarray(color_frame.get_data())
-            pc = rs.pointcloud()
-            pc.map_to(color_frame)
-            points = pc.calculate(depth_frame)
-
-            # vtx = xyz of pointclouds
-            vtx = np.asanyarray(points.get_vertices()).view(np.float32).reshape(-1, 3)
-            tex = np.asanyarray(points.get_texture_coordinates()).view(np.float32).reshape(-1, 2)
-            valid_mask = vtx[:, 2] > 0
-            vtx = vtx[valid_mask]
-            tex = tex[valid_mask]
-            img_h, img_w = color_image.shape[:2]
-            tex_x = np.clip((tex[:, 0] * (img_w - 1)).astype(int), 0, img_w - 1)
-            tex_y = np.clip((tex[:, 1] * (img_h - 1)).astype(int), 0, img_h - 1)
-
-            colors = color_image[tex_y, tex_x]
-            blank_image = np.zeros((img_h, img_w, 3), dtype=np.uint8)
-            for i in range(len(tex_x)):
-                r, g, b = colors[i]
-                r, g, b = b, g, r
-                cv2.circle(blank_image, (tex_x[i], tex_y[i]), 2, (int(r), int(g), int(b)), -1)
-
-            projection_path = os.path.join(out_dir, f"projection.png")
-            cv2.imwrite(projection_path, color_image[:, :, ::-1])
-            print(f"[INFO] saved projection.png")
-
-            data = {
-                'x': vtx[:, 0],
-                'y': vtx[:, 1],
-                'z': vtx[:, 2],
-                'u': tex_x,
-                'v': tex_y,
-                'R': colors[:, 2],
-                'G': colors[:, 1],
-                'B': colors[:, 0]
-            }
-            df = pd.DataFrame(data)
-            pointcloud_path = os.path.join(out_dir, f"pointcloud.csv")
-            df.to_csv(pointcloud_path, index=False)
-            print(f"[INFO] saved pointcloud.csv")
-
-            return {
-                'projection': projection_path,
-                'pointcloud': pointcloud_path
-            }
+        # intrinsics + 轉換矩陣寫成 sidecar，後續 world_coordinates 不必再開 .bag
+        calibration_path = save_calibration(build_calibration(reader.profile), os.path.join(out_dir, SIDECAR_NAME))
+        print(f"[INFO] saved {SIDECAR_NAME}")
+
+        # 直接跳到指定的 frame，不必從頭播放
+        depth_frame, color_frame = reader.read_frames(frame_number)
+        if depth_filter is not None:
+            print(f"[INFO] {depth_filter.report()}")
+
+        color_image = np.asanyarray(color_frame.get_data())
+
+        # vtx = xyz of pointclouds
+        vtx, tex = reader.points(depth_frame, color_frame)
+        valid_mask = vtx[:, 2] > 0
+        vtx = vtx[valid_mask]
+        tex = tex[valid_mask]
+        img_h, img_w = color_image.shape[:2]
+        tex_x = np.clip((tex[:, 0] * (img_w - 1)).astype(int), 0, img_w - 1)
+        tex_y = np.clip((tex[:, 1] * (img_h - 1)).astype(int), 0, img_h - 1)
+
+        colors = color_image[tex_y, tex_x]
+
+        projection_path = os.path.join(out_dir, f"projection.png")
+        cv2.imwrite(projection_path, color_image[:, :, ::-1])
+        print(f"[INFO] saved projection.png")
+        if splat_radius is not None:
+            _save_points_projection(out_dir, tex_x, tex_y, colors, color_image.shape, splat_radius)
+
+        data = {
+            'x': vtx[:, 0],
+            'y': vtx[:, 1],
+            'z': vtx[:, 2],
+            'u': tex_x,
+            'v': tex_y,
+            **color_columns(colors, 'RGB')
+        }
+        df = pd.DataFrame(data)
+        pointcloud_path = write_points(df, point_path(out_dir, 'pointcloud', point_format))
+        print(f"[INFO] saved {os.path.basename(pointcloud_path)}")
+
+        return {
+            'projection': projection_path,
+            'pointcloud': pointcloud_path,
+            'calibration': calibration_path
+        }
 
     finally:
-        pipeline.stop()
+        reader.close()
         cv2.destroyAllWindows()
 
 
+def _save_points_projection(out_dir: str, u, v, colors, shape, radius: int) -> str:
+    # 點雲投影圖：每個點畫成半徑 radius 的圓點 (vectorized, 取代逐點 cv2.circle)
+    image = splat(u, v, colors, shape, radius=radius)
+    path = os.path.join(out_dir, "projection_points.png")
+    cv2.imwrite(path, image[:, :, ::-1])
+    print(f"[INFO] saved projection_points.png")
+    return path
+
+def _no_cap_fused(bag_file: str, out_dir: str, frame_number: int,
+                  fuse_frames: int, fuse_method: str, min_count: int, point_format: str,
+                  splat_radius: int = None, depth_filter=None) -> dict:
+    reader = BagReader(bag_file, depth_filter=depth_filter)
+    try:
+        calibration_path = save_calibration(build_calibration(reader.profile), os.path.join(out_dir, SIDECAR_NAME))
+        print(f"[INFO] saved {SIDECAR_NAME}")
+
+        # 一次只保留一張 depth，累加器大小固定
+        acc, color_image, intrinsics = None, None, None
+        for color, depth, intrin in reader.frames(frame_number, frame_number + fuse_frames):
+            if acc is None:
+                acc = DepthAccumulator(depth.shape, fuse_method)
+                color_image, intrinsics = color, intrin
+            acc.update(depth)
+        if acc is None:
+            raise RuntimeError(f"no frames available from frame {frame_number} of {bag_file}")
+        print(f"[INFO] fused {acc.frames} frames ({fuse_method})")
+        if depth_filter is not None:
+            print(f"[INFO] {depth_filter.report()}")
+
+        depth_image = acc.result(min_count)
+        df = depth_image_to_points(depth_image, color_image, intrinsics, reader.depth_scale)
+
+        projection_path = os.path.join(out_dir, f"projection.png")
+        cv2.imwrite(projection_path, color_image[:, :, ::-1])
+        print(f"[INFO] saved projection.png")
+        if splat_radius is not None:
+            colors = point_colors(df, 'RGB')
+            _save_points_projection(out_dir, df['u'].values, df['v'].values, colors, color_image.shape, splat_radius)
+
+        pointcloud_path = write_points(df, point_path(out_dir, 'pointcloud', point_format))
+        print(f"[INFO] saved {os.path.basename(pointcloud_path)}")
+
+        return {
+            'projection': projection_path,
+            'pointcloud': pointcloud_path,
+            'calibration': calibration_path
+        }
+
+    finally:
+        reader.close()
+
+
 # only for testing
 if __name__ == "__main__":
     bag_file = os.path.join(DEMO_DIR, '20250605_171439.bag')
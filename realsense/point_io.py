@@ -0,0 +1,136 @@
+"""
+Point-cloud interchange between pipeline stages.
+Default format is an uncompressed .npz holding one typed array per column
+(float32 xyz, uint16 u/v, uint8 RGB, categorical codes for object/material labels),
+CSV stays available by using a .csv path or export_csv(), write_ply() for viewers.
+R, G, B always hold true red / green / blue; writers fill them with color_columns()
+and readers that need an OpenCV (BGR) image take point_colors(df, 'BGR').
+"""
+import numpy as np
+import pandas as pd
+import os
+
+POINT_FORMAT = 'npz'
+POINT_FORMATS = ('npz', 'csv')
+
+POINT_SCHEMA = {
+    'x': np.float32,
+    'y': np.float32,
+    'z': np.float32,
+    'u': np.uint16,
+    'v': np.uint16,
+    'R': np.uint8,
+    'G': np.uint8,
+    'B': np.uint8,
+}
+CATEGORICAL_COLUMNS = ('object_label', 'material')
+
+_COLUMNS_KEY = '__columns__'
+_CATEGORIES_SUFFIX = '__categories'
+
+COLOR_ORDERS = ('RGB', 'BGR')
+
+def color_columns(colors, order: str = 'RGB') -> dict:
+    """(N, 3) colors in 'RGB' or 'BGR' channel order -> {'R', 'G', 'B'} columns."""
+    if order not in COLOR_ORDERS:
+        raise ValueError(f"unknown color order: {order}, expected one of {COLOR_ORDERS}")
+    colors = np.asarray(colors)
+    if order == 'BGR':
+        colors = colors[:, ::-1]
+    return {'R': colors[:, 0], 'G': colors[:, 1], 'B': colors[:, 2]}
+
+def point_colors(df: pd.DataFrame, order: str = 'RGB') -> np.ndarray:
+    """R, G, B columns -> (N, 3) uint8 in 'RGB' or 'BGR' channel order."""
+    if order not in COLOR_ORDERS:
+        raise ValueError(f"unknown color order: {order}, expected one of {COLOR_ORDERS}")
+    return df[list(order)].to_numpy(dtype=np.uint8)
+
+def point_path(out_dir: str, stem: str, fmt: str = POINT_FORMAT) -> str:
+    if fmt not in POINT_FORMATS:
+        raise ValueError(f"unknown point format: {fmt}, expected one of {POINT_FORMATS}")
+    return os.path.join(out_dir, f'{stem}.{fmt}')
+
+def point_format(path: str) -> str:
+    return os.path.splitext(path)[1].lstrip('.').lower()
+
+def derived_path(path: str, suffix: str, out_dir: str = None) -> str:
+    """pointcloud.npz -> <out_dir>/pointcloud<suffix>.npz, keeping the format."""
+    stem, ext = os.path.splitext(os.path.basename(path))
+    return os.path.join(out_dir or os.path.dirname(path), f'{stem}{suffix}{ext}')
+
+def _encode_column(name, series):
+    if name in POINT_SCHEMA:
+        return {name: series.to_numpy(dtype=POINT_SCHEMA[name])}
+
+    if name in CATEGORICAL_COLUMNS or not (pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series)):
+        # 空字串與 NaN 都存成 -1，和 CSV 讀回來是 NaN 的行為一致
+        values = series.astype(object).where(series.notna() & (series.astype(object) != ''), None)
+        codes, categories = pd.factorize(values, use_na_sentinel=True)
+        return {
+            name: codes.astype(np.int32),
+            name + _CATEGORIES_SUFFIX: np.asarray(categories, dtype=str),
+        }
+
+    if pd.api.types.is_bool_dtype(series):
+        return {name: series.to_numpy(dtype=bool)}
+    if pd.api.types.is_integer_dtype(series):
+        return {name: series.to_numpy(dtype=np.int32)}
+    return {name: series.to_numpy(dtype=np.float32)}
+
+def write_points(df: pd.DataFrame, path: str) -> str:
+    fmt = point_format(path)
+    if fmt == 'csv':
+        df.to_csv(path, index=False)
+        return path
+    if fmt != 'npz':
+        raise ValueError(f"unknown point format: {path}")
+
+    arrays = {_COLUMNS_KEY: np.asarray(list(df.columns), dtype=str)}
+    for name in df.columns:
+        arrays.update(_encode_column(name, df[name]))
+    np.savez(path, **arrays)
+    return path
+
+def read_points(path: str) -> pd.DataFrame:
+    fmt = point_format(path)
+    if fmt == 'csv':
+        return pd.read_csv(path)
+    if fmt != 'npz':
+        raise ValueError(f"unknown point format: {path}")
+
+    with np.load(path, allow_pickle=False) as data:
+        columns = {}
+        for name in data[_COLUMNS_KEY].tolist():
+            values = data[name]
+            categories_key = name + _CATEGORIES_SUFFIX
+            if categories_key in data.files:
+                values = pd.Categorical.from_codes(values, categories=data[categories_key])
+            columns[name] = values
+    return pd.DataFrame(columns)
+
+# (column, ply type, ply property name)
+_PLY_PROPERTIES = [('x', 'float', 'x'), ('y', 'float', 'y'), ('z', 'float', 'z'),
+                   ('R', 'uchar', 'red'), ('G', 'uchar', 'green'), ('B', 'uchar', 'blue')]
+_PLY_DTYPES = {'float': '<f4', 'uchar': 'u1'}
+
+def write_ply(df: pd.DataFrame, path: str) -> str:
+    """Binary little-endian PLY of the x, y, z and R, G, B columns, written in one block."""
+    columns = [(col, _PLY_DTYPES[ply_type]) for col, ply_type, _ in _PLY_PROPERTIES]
+    vertices = np.empty(len(df), dtype=columns)
+    for name, _ in columns:
+        vertices[name] = df[name].to_numpy()
+
+    header = ['ply', 'format binary_little_endian 1.0', f'element vertex {len(df)}']
+    header += [f'property {ply_type} {name}' for _, ply_type, name in _PLY_PROPERTIES]
+    header.append('end_header')
+    with open(path, 'wb') as f:
+        f.write(('\n'.join(header) + '\n').encode('ascii'))
+        f.write(vertices.tobytes())
+    return path
+
+def export_csv(path: str, csv_path: str = None) -> str:
+    """Write any point file out as CSV (pointcloud.npz -> pointcloud.csv)."""
+    if csv_path is None:
+        csv_path = os.path.splitext(path)[0] + '.csv'
+    read_points(path).to_csv(csv_path, index=False)
+    return csv_path
@@ -0,0 +1,81 @@
+"""
+Vectorized point splatting: scatter per-point values (RGB, labels, ...) into a dense image.
+Shared by no_cap, detect_objects' image reconstruction and the pointcloud viewer.
+"""
+import numpy as np
+
+def disk_offsets(radius: int):
+    """(dy, dx) offsets of a filled disk, the footprint of cv2.circle(..., thickness=-1)."""
+    r = int(radius)
+    dy, dx = np.mgrid[-r:r + 1, -r:r + 1]
+    inside = dx * dx + dy * dy <= r * r
+    return dy[inside], dx[inside]
+
+def _as_rows(a):
+    # one void item per row, so a gather / scatter moves whole pixels instead of single channels
+    a = np.ascontiguousarray(a)
+    if a.ndim == 1:
+        return a
+    return a.reshape(a.shape[0], -1).view(np.dtype((np.void, a.dtype.itemsize * int(np.prod(a.shape[1:]))))).ravel()
+
+def splat(u, v, values, shape, radius: int = 0, depth=None, out=None, return_depth: bool = False):
+    """
+    Paint values[i] at pixel (v[i], u[i]) of an image with shape[:2] = (h, w).
+
+    radius > 0    every point covers a filled disk of that radius.
+    depth=None    later points overwrite earlier ones (same result as a Python loop).
+    depth given   z-buffering, the smallest depth wins each pixel.
+    out           image to paint into (untouched pixels are kept), a zero image otherwise.
+    Out-of-bounds pixels are dropped. With return_depth the per-pixel minimum
+    depth (inf where empty) is returned as well.
+    """
+    h, w = shape[:2]
+    values = np.asarray(values)
+    u = np.asarray(u).astype(np.int32, copy=False)
+    v = np.asarray(v).astype(np.int32, copy=False)
+    idx = np.arange(u.shape[0], dtype=np.int32)
+    if depth is not None:
+        depth = np.asarray(depth)
+
+    if radius > 0:
+        dy, dx = disk_offsets(radius)
+        u = (u[None, :] + dx[:, None].astype(np.int32)).ravel()
+        v = (v[None, :] + dy[:, None].astype(np.int32)).ravel()
+        idx = np.tile(idx, len(dx))
+        if depth is not None:
+            depth = np.tile(depth, len(dx))
+
+    flat = v * w + u
+    m = (u >= 0) & (u < w) & (v >= 0) & (v < h)
+    if not m.all():
+        flat, idx = flat[m], idx[m]
+        if depth is not None:
+            depth = depth[m]
+
+    zbuf = None
+    if depth is not None:
+        zbuf = np.full(h * w, np.inf, dtype=np.result_type(depth.dtype, np.float32))
+        np.minimum.at(zbuf, flat, depth)
+        keep = depth <= zbuf[flat]
+        flat, idx = flat[keep], idx[keep]
+
+    # ties (same pixel, same depth) go to the later point
+    winner = np.full(h * w, -1, dtype=np.int32)
+    np.maximum.at(winner, flat, idx)
+
+    row_shape = values.shape[1:]
+    if out is None:
+        # dense gather, empty pixels (winner -1) pick the leading zero row
+        padded = np.concatenate([np.zeros((1,) + row_shape, dtype=values.dtype), values])
+        out = np.take(padded, winner + 1, axis=0).reshape((h, w) + row_shape)
+    else:
+        hit = np.flatnonzero(winner >= 0)
+        if out.flags.c_contiguous and out.dtype == values.dtype:
+            _as_rows(out.reshape((h * w,) + row_shape))[hit] = np.take(_as_rows(values), winner[hit])
+        else:
+            out[np.unravel_index(hit, (h, w))] = np.take(values, winner[hit], axis=0)
+
+    if return_depth:
+        depth_image = zbuf.reshape(h, w) if zbuf is not None else None
+        return out, depth_image
+    return out
@@ -0,0 +1,142 @@
+"""
+Multi-capture room stitching.
+Several .bag captures of the same room are decoded concurrently (one process per bag:
+no_cap + world_coordinates), registered to each other with Open3D (optional FPFH/RANSAC
+coarse alignment, then point-to-plane ICP on voxel-downsampled clouds) and merged into
+one cloud, de-duplicated on a voxel grid.
+"""
+import numpy as np
+import pandas as pd
+import os
+from concurrent.futures import ProcessPoolExecutor
+from realsense.point_io import read_points, write_points
+from realsense.voxel import voxel_downsample
+
+REGISTRATION_VOXEL = 0.05   # m, cloud resolution used for registration
+DEDUP_VOXEL = 0.01          # m, merged points closer than this collapse into one
+
+def _decode_capture(job: tuple) -> dict:
+    # runs in a worker process, imports stay local so the parent does not need pyrealsense2 loaded
+    from realsense.no_cap import no_cap
+    from realsense.coor_reconstruct import world_coordinates
+    bag_file, out_dir, no_cap_kwargs = job
+    os.makedirs(out_dir, exist_ok=True)
+    real_out = no_cap(bag_file, out_dir, **no_cap_kwargs)
+    world_coordinates(bag_file, real_out['pointcloud'], calibration=real_out['calibration'])
+    real_out['bag'] = bag_file
+    real_out['out_dir'] = out_dir
+    return real_out
+
+def decode_captures(bag_files, out_dir: str, workers: int = None, **no_cap_kwargs) -> list:
+    """
+    no_cap + world_coordinates for every bag in parallel, each into out_dir/capture_<i>/.
+    Returns the no_cap outputs (plus 'bag' and 'out_dir') in the order of bag_files.
+    """
+    jobs = [(bag, os.path.join(out_dir, f'capture_{i}'), no_cap_kwargs) for i, bag in enumerate(bag_files)]
+    workers = workers or min(len(jobs), os.cpu_count() or 1)
+    if workers <= 1:
+        return [_decode_capture(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_decode_capture, jobs))
+
+def _to_o3d(xyz, voxel_size: float):
+    import open3d as o3d
+    pcd = o3d.geometry.PointCloud()
+    pcd.points = o3d.utility.Vector3dVector(np.asarray(xyz, dtype=np.float64))
+    pcd = pcd.voxel_down_sample(voxel_size)
+    pcd.estimate_normals(o3d.geometry.KDTreeSearchParamHybrid(radius=voxel_size * 2, max_nn=30))
+    return pcd
+
+def _coarse_alignment(source, target, voxel_size: float):
+    # FPFH features + RANSAC, for captures taken from clearly different viewpoints
+    import open3d as o3d
+    reg = o3d.pipelines.registration
+    feature = o3d.geometry.KDTreeSearchParamHybrid(radius=voxel_size * 5, max_nn=100)
+    source_fpfh = reg.compute_fpfh_feature(source, feature)
+    target_fpfh = reg.compute_fpfh_feature(target, feature)
+    distance = voxel_size * 1.5
+    result = reg.registration_ransac_based_on_feature_matching(
+        source, target, source_fpfh, target_fpfh, True, distance,
+        reg.TransformationEstimationPointToPoint(False), 3,
+        [reg.CorrespondenceCheckerBasedOnEdgeLength(0.9), reg.CorrespondenceCheckerBasedOnDistance(distance)],
+        reg.RANSACConvergenceCriteria(100000, 0.999))
+    return result.transformation
+
+def register_pair(source_xyz, target_xyz, voxel_size: float = REGISTRATION_VOXEL,
+                  init=None, coarse: bool = False, max_iteration: int = 50) -> dict:
+    """
+    4x4 transform mapping source_xyz onto target_xyz (point-to-plane ICP).
+    init: initial guess (identity by default, the captures share the calibrated world frame),
+    coarse=True estimates it with FPFH + RANSAC instead.
+    """
+    import open3d as o3d
+    reg = o3d.pipelines.registration
+    source = _to_o3d(source_xyz, voxel_size)
+    target = _to_o3d(target_xyz, voxel_size)
+    if coarse:
+        init = _coarse_alignment(source, target, voxel_size)
+    elif init is None:
+        init = np.eye(4)
+
+    result = reg.registration_icp(
+        source, target, voxel_size * 2, init,
+        reg.TransformationEstimationPointToPlane(),
+        reg.ICPConvergenceCriteria(max_iteration=max_iteration))
+    return {
+        'transformation': np.asarray(result.transformation),
+        'fitness': result.fitness,
+        'inlier_rmse': result.inlier_rmse,
+    }
+
+def apply_transform(df: pd.DataFrame, transformation) -> pd.DataFrame:
+    T = np.asarray(transformation, dtype=np.float64)
+    xyz = df[['x', 'y', 'z']].to_numpy(dtype=np.float64) @ T[:3, :3].T + T[:3, 3]
+    out = df.copy()
+    out['x'], out['y'], out['z'] = xyz[:, 0], xyz[:, 1], xyz[:, 2]
+    return out
+
+def stitch_clouds(clouds, voxel_size: float = REGISTRATION_VOXEL, dedup_voxel: float = DEDUP_VOXEL,
+                  coarse: bool = False) -> tuple:
+    """
+    Register clouds[1:] one by one against the growing merged model (starting from clouds[0])
+    and merge them. Adds a 'capture' column, keeps object_num unique across captures.
+    Returns (merged DataFrame, list of per-capture registration results).
+    """
+    parts, registrations = [], []
+    object_offset = 0
+    model = None
+    for i, df in enumerate(clouds):
+        df = df.copy()
+        df['capture'] = np.int32(i)
+        if 'object_num' in df:
+            # 每個 capture 的 object_num 都從 1 開始，合併時往後平移
+            df['object_num'] = df['object_num'] + object_offset
+            object_offset = np.nanmax([object_offset, df['object_num'].max()])  # NaN = no object
+
+        if model is None:
+            registration = {'transformation': np.eye(4), 'fitness': 1.0, 'inlier_rmse': 0.0}
+        else:
+            registration = register_pair(df[['x', 'y', 'z']].to_numpy(), model, voxel_size, coarse=coarse)
+            df = apply_transform(df, registration['transformation'])
+        print(f"[INFO] capture {i}: fitness {registration['fitness']:.3f}, rmse {registration['inlier_rmse']:.4f}")
+        registrations.append(registration)
+        parts.append(df)
+
+        xyz = df[['x', 'y', 'z']].to_numpy()
+        model = xyz if model is None else np.vstack([model, xyz])
+
+    merged = pd.concat(parts, ignore_index=True)
+    if dedup_voxel:
+        merged = voxel_downsample(merged, dedup_voxel).drop(columns='src_index')
+    return merged, registrations
+
+def stitch_point_files(point_files, output_file: str, voxel_size: float = REGISTRATION_VOXEL,
+                       dedup_voxel: float = DEDUP_VOXEL, coarse: bool = False) -> dict:
+    """Stitch per-capture world-coordinate point files into one point file."""
+    merged, registrations = stitch_clouds([read_points(p) for p in point_files], voxel_size, dedup_voxel, coarse)
+    output_file = write_points(merged, output_file)
+    print(f"[INFO] stitched {len(point_files)} captures -> {len(merged)} points, saved {output_file}")
+    return {
+        'pointcloud': output_file,
+        'registrations': registrations,
+    }
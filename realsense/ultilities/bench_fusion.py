@@ -0,0 +1,45 @@
+"""
+Benchmark of realsense.fusion.DepthAccumulator, NO NEED of Intel Realsense.
+Streams K synthetic noisy 640x480 depth frames and reports time, peak memory
+(tracemalloc) and error against the ground truth for both reduction methods.
+Peak memory should stay flat as K grows ('median' is exact up to K = MEDIAN_SAMPLES).
+Usage: python -m realsense.ultilities.bench_fusion
+"""
+import time
+import tracemalloc
+import numpy as np
+from realsense.fusion import DepthAccumulator
+
+H, W = 480, 640
+
+def noisy_frames(truth, k, rng):
+    # one frame at a time: gaussian noise, 10% holes, 3% flying pixels
+    for _ in range(k):
+        d = truth + rng.normal(0, 8, truth.shape)
+        d[rng.random(truth.shape) < 0.10] = 0
+        d[rng.random(truth.shape) < 0.03] += 800
+        yield np.clip(d, 0, 65535).astype(np.uint16)
+
+def run(method, k, truth, seed=0):
+    rng = np.random.default_rng(seed)
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    acc = DepthAccumulator(truth.shape, method)
+    for depth in noisy_frames(truth, k, rng):
+        acc.update(depth)
+    fused = acc.result()
+    dt = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    valid = fused > 0
+    err = np.abs(fused[valid].astype(np.float64) - truth[valid])
+    return dt, peak, acc.nbytes, np.median(err), valid.mean()
+
+if __name__ == "__main__":
+    truth = np.random.default_rng(42).uniform(500, 4000, (H, W))
+    print(f"{'method':>7} {'K':>4} {'time(s)':>8} {'ms/frame':>9} {'peak(MB)':>9} {'acc(MB)':>8} {'med.err(mm)':>12} {'valid':>6}")
+    for method in ('mean', 'median'):
+        for k in (1, 5, 10, 30, 60, 120):
+            dt, peak, nbytes, err, valid = run(method, k, truth)
+            print(f"{method:>7} {k:>4} {dt:>8.2f} {dt / k * 1000:>9.1f} {peak / 2**20:>9.1f} {nbytes / 2**20:>8.1f} {err:>12.2f} {valid:>6.1%}")
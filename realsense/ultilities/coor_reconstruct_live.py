@@ -1,6 +1,18 @@
-
+"""
+Calibrated image -> world transform on a RealSense camera or a looping .bag.
+    python -m realsense.ultilities.coor_reconstruct_live                 calibration sanity test (device)
+    python -m realsense.ultilities.coor_reconstruct_live --live [--bag x.bag] [--seconds 10]
+The live mode converts every frame to a world-space cloud on a capture thread and
+publishes it into a bounded ring buffer, printing per-stage latency once a second.
+"""
 import pyrealsense2 as rs
 import numpy as np
+import argparse
+import threading
+import time
+from collections import deque
+from realsense.coor_reconstruct import pixel_rays
+from realsense.depth_filters import make_filter_chain
 
 class ImageAndDepth2RealWorldTransformator:
 
@@ -99,65 +111,309 @@ class ImageAndDepth2RealWorldTransformator:
         return np.dot(self.transformationMatrixImage2RealWorld, np.array(vPoint[0]))[0:3]
 
 
-# Get intrinsics of realsense camera:
-
-print("Connected Intel Realsense Camera devices:")
-context = rs.context()
-for device in context.devices:
-    print(f"Device {device.get_info(rs.camera_info.name)} connected")
-
-pipeline = rs.pipeline()
-
-config = rs.config()
-config.enable_stream(rs.stream.depth, rs.format.z16, 30)
-config.enable_stream(rs.stream.color, rs.format.bgr8, 30)
-
-
-# Start streaming
-pipeline_profile = pipeline.start(config)
-
-# Get stream profile and camera intrinsics
-profile = pipeline.get_active_profile()
-depth_profile = rs.video_stream_profile(profile.get_stream(rs.stream.depth))
-color_profile = rs.video_stream_profile(profile.get_stream(rs.stream.color))
-depth_intrinsics = depth_profile.get_intrinsics()
-color_intrinsics = color_profile.get_intrinsics()
-
-# depth and color_intrinsics are different, depending on resolution
-# Choose wisely which one you are calibrating!
-
-
-
-referencePoints_pixelDepth = [
-    [475, 83, 691],  # x,y,depth
-    [958, 130, 638],
-    [330, 621, 551],
-    [1395, 648, 577]
-]
-
-referencePoints_realWorld = np.array([   
-    [0.002, 0.3, 0.0,               1.0],   #x,y,z,1    the 1 is needed as 4th dimension, just set it to 1
-    [0.2468, 0.2415, 0.033,         1.0],
-    [0.0, 0.0, 0.033,               1.0],
-    [0.43, 0.0, 0.0,                1.0]
-])
-
-
-
-imageAndDepth2RealWorldTransformator = ImageAndDepth2RealWorldTransformator(color_intrinsics, referencePoints_pixelDepth, referencePoints_realWorld)
+class LiveWorldTransform:
+    """
+    Image -> world transform for a fixed stream.
+    The undistorted ray of every pixel is pushed through the 3x3 part of the calibration
+    matrix once, so a frame costs one multiply-add per valid pixel (no per-frame deprojection).
+    """
+    def __init__(self, intrinsics, image2RealWorld, depth_scale):
+        M = np.asarray(image2RealWorld, dtype=np.float64)
+        rays = pixel_rays(intrinsics).reshape(-1, 3)
+        # 標定時深度單位是 mm (同 world_coordinates)，depth_scale 把 z16 換成公尺
+        self.world_rays = (rays @ M[:3, :3].T * (depth_scale * 1000)).astype(np.float32)
+        self.offset = M[:3, 3].astype(np.float32)
+        self.shape = (intrinsics.height, intrinsics.width)
+
+    def __call__(self, depth_image):
+        """z16 depth image -> (world xyz (N, 3) float32, flat pixel index of the N valid pixels)"""
+        depth = depth_image.ravel()
+        idx = np.flatnonzero(depth)
+        # np.take is several times faster than fancy indexing for row gathers
+        xyz = np.take(self.world_rays, idx, axis=0)
+        xyz *= np.take(depth, idx).astype(np.float32)[:, np.newaxis]
+        xyz += self.offset
+        return xyz, idx
+
+
+class FrameRing:
+    """
+    Bounded ring of the newest world-space clouds.
+    publish() never blocks: when the ring is full the oldest cloud is dropped, so a slow
+    consumer skips frames instead of stalling capture.
+    dropped counts the clouds a wait_newer() consumer skipped over (never handed out).
+    """
+    def __init__(self, size=4):
+        self.buffer = deque(maxlen=size)
+        self.cond = threading.Condition()
+        self.seq = 0
+        self.dropped = 0
+
+    def publish(self, cloud: dict):
+        with self.cond:
+            self.seq += 1
+            cloud['seq'] = self.seq
+            self.buffer.append(cloud)
+            self.cond.notify_all()
+
+    def latest(self):
+        with self.cond:
+            return self.buffer[-1] if self.buffer else None
+
+    def wait_newer(self, seq: int, timeout: float = None):
+        """Newest cloud with a sequence number above seq, None on timeout."""
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.seq > seq, timeout):
+                return None
+            # 只拿最新的，seq 和它之間發佈的都沒被 consumer 看到
+            self.dropped += self.seq - seq - 1
+            return self.buffer[-1]
+
+
+class StageTimer:
+    """Rolling per-stage latency (ms) over the last window frames."""
+    def __init__(self, window=120):
+        self.window = window
+        self.samples = {}
+        self.lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self.lock:
+            self.samples.setdefault(stage, deque(maxlen=self.window)).append(seconds * 1000)
+
+    def summary(self) -> dict:
+        with self.lock:
+            return {stage: (np.mean(v), np.percentile(v, 95)) for stage, v in self.samples.items() if v}
+
+    def report(self) -> str:
+        return "  ".join(f"{stage} {mean:.1f}/{p95:.1f}ms" for stage, (mean, p95) in self.summary().items())
+
+
+class LiveReconstructor:
+    """
+    Capture thread: frames -> depth filters -> align to color -> world transform -> FrameRing.
+    source=None streams from the first connected device, a .bag path plays it in a loop.
+    calibration: sidecar / cache json (realsense.calibration), otherwise the reference
+    points are calibrated against the live color stream, which only works when the stream
+    has the resolution they were picked at (e.g. a .bag of the calibration setup); a live
+    640x480 camera needs the json.
+    filters: optional depth post-processing chain (realsense.depth_filters).
+    """
+    def __init__(self, source: str = None, ring_size: int = 4, width: int = 640, height: int = 480,
+                 fps: int = 30, calibration: str = None, filters=None):
+        self.source = source
+        self.width, self.height, self.fps = width, height, fps
+        self.calibration = calibration
+        self.ring = FrameRing(ring_size)
+        self.timer = StageTimer()
+        self.align = rs.align(rs.stream.color)
+        self.depth_filter = make_filter_chain(filters)
+        self.transform = None
+        self.frames = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _open(self):
+        from realsense.calibration import build_calibration, load_calibration, check_reference_pixels
+        from realsense.coor_reconstruct import referencePoints_pixelDepth
+        self.pipeline = rs.pipeline()
+        config = rs.config()
+        if self.source:
+            config.enable_device_from_file(self.source, True)  # repeat playback
+        else:
+            config.enable_stream(rs.stream.depth, self.width, self.height, rs.format.z16, self.fps)
+            config.enable_stream(rs.stream.color, self.width, self.height, rs.format.bgr8, self.fps)
+        self.profile = self.pipeline.start(config)
+        self.depth_scale = self.profile.get_device().first_depth_sensor().get_depth_scale()
+
+        # the matrix maps camera space to world space, it does not depend on the stream resolution
+        try:
+            if self.calibration:
+                calibration = load_calibration(self.calibration)
+            else:
+                color = self.profile.get_stream(rs.stream.color).as_video_stream_profile()
+                check_reference_pixels(referencePoints_pixelDepth, color.width(), color.height())
+                calibration = build_calibration(self.profile)
+        except ValueError as e:
+            self.pipeline.stop()
+            raise ValueError(f"{e}; pass --calibration (the calibration.json next to a capture of this setup)") from e
+        self.image2RealWorld = np.array(calibration['transformationMatrixImage2RealWorld'])
+
+    def start(self):
+        self._open()
+        self._thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def _capture_loop(self):
+        try:
+            while not self._stop.is_set():
+                t0 = time.perf_counter()
+                ok, frames = self.pipeline.try_wait_for_frames(1000)
+                if not ok:
+                    continue
+                t1 = time.perf_counter()
+                if self.depth_filter is not None:
+                    frames = self.depth_filter.process(frames)
+                t_filter = time.perf_counter()
+                aligned_frames = self.align.process(frames)
+                depth_frame = aligned_frames.get_depth_frame()
+                color_frame = aligned_frames.get_color_frame()
+                if not depth_frame or not color_frame:
+                    continue
+                depth_image = np.asanyarray(depth_frame.get_data())
+                color_image = np.asanyarray(color_frame.get_data())
+                t2 = time.perf_counter()
+
+                if self.transform is None or self.transform.shape != depth_image.shape:
+                    intrinsics = color_frame.profile.as_video_stream_profile().get_intrinsics()
+                    self.transform = LiveWorldTransform(intrinsics, self.image2RealWorld, self.depth_scale)
+                xyz, idx = self.transform(depth_image)
+                t3 = time.perf_counter()
+
+                # gathered into a new array so nothing points into the frame pool; the device
+                # stream is bgr8, recordings carry rgb8 (same check as BagReader._to_arrays)
+                rgb = np.take(color_image.reshape(-1, 3), idx, axis=0)
+                if color_frame.profile.format() == rs.format.bgr8:
+                    rgb = rgb[:, ::-1]
+                self.ring.publish({
+                    'frame': self.frames,
+                    'timestamp': frames.get_timestamp(),
+                    'published': time.perf_counter(),
+                    'xyz': xyz,
+                    'rgb': rgb,
+                    'pixel': idx,
+                })
+                t4 = time.perf_counter()
+                self.frames += 1
+
+                self.timer.add('wait', t1 - t0)
+                if self.depth_filter is not None:
+                    self.timer.add('filter', t_filter - t1)
+                self.timer.add('align', t2 - t_filter)
+                self.timer.add('transform', t3 - t2)
+                self.timer.add('publish', t4 - t3)
+                self.timer.add('process', t4 - t1)
+        finally:
+            self.pipeline.stop()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def run_live(source: str = None, seconds: float = None, ring_size: int = 4, consumer_delay: float = 0.0,
+             calibration: str = None, filters=None):
+    """Run the capture thread with a simple consumer that always takes the newest cloud."""
+    with LiveReconstructor(source, ring_size, calibration=calibration, filters=filters) as live:
+        start = last_report = time.perf_counter()
+        seq, consumed = 0, 0
+        while seconds is None or time.perf_counter() - start < seconds:
+            cloud = live.ring.wait_newer(seq, timeout=1.0)
+            if cloud is None:
+                continue
+            seq = cloud['seq']
+            live.timer.add('age', time.perf_counter() - cloud['published'])
+            consumed += 1
+            if consumer_delay:
+                time.sleep(consumer_delay)  # simulate a slow consumer
+
+            now = time.perf_counter()
+            if now - last_report >= 1.0:
+                elapsed = now - start
+                print(f"[live] capture {live.frames / elapsed:.1f} FPS, consumer {consumed / elapsed:.1f} FPS, "
+                      f"dropped {live.ring.dropped}, {len(cloud['xyz'])} pts | {live.timer.report()}")
+                last_report = now
+        if live.depth_filter is not None:
+            print(live.depth_filter.report())
+
+
+def sanity_test():
+    # Get intrinsics of realsense camera:
+
+    print("Connected Intel Realsense Camera devices:")
+    context = rs.context()
+    for device in context.devices:
+        print(f"Device {device.get_info(rs.camera_info.name)} connected")
+
+    pipeline = rs.pipeline()
+
+    config = rs.config()
+    config.enable_stream(rs.stream.depth, rs.format.z16, 30)
+    config.enable_stream(rs.stream.color, rs.format.bgr8, 30)
+
+
+    # Start streaming
+    pipeline_profile = pipeline.start(config)
+
+    # Get stream profile and camera intrinsics
+    profile = pipeline.get_active_profile()
+    depth_profile = rs.video_stream_profile(profile.get_stream(rs.stream.depth))
+    color_profile = rs.video_stream_profile(profile.get_stream(rs.stream.color))
+    depth_intrinsics = depth_profile.get_intrinsics()
+    color_intrinsics = color_profile.get_intrinsics()
+
+    # depth and color_intrinsics are different, depending on resolution
+    # Choose wisely which one you are calibrating!
+
+
+
+    referencePoints_pixelDepth = [
+        [475, 83, 691],  # x,y,depth
+        [958, 130, 638],
+        [330, 621, 551],
+        [1395, 648, 577]
+    ]
+
+    referencePoints_realWorld = np.array([   
+        [0.002, 0.3, 0.0,               1.0],   #x,y,z,1    the 1 is needed as 4th dimension, just set it to 1
+        [0.2468, 0.2415, 0.033,         1.0],
+        [0.0, 0.0, 0.033,               1.0],
+        [0.43, 0.0, 0.0,                1.0]
+    ])
+
+
+
+    imageAndDepth2RealWorldTransformator = ImageAndDepth2RealWorldTransformator(color_intrinsics, referencePoints_pixelDepth, referencePoints_realWorld)
+
+
+    print("Test: 450, 631, 585   #0.02 rechts von I2 und 0.033 tiefer")
+    r = imageAndDepth2RealWorldTransformator.pixelDepth2RealWorld(450, 631, 585)
+    print("Result:", r)
+
+    print("Test: 901,138,678     #0.02 links von I1 und 0.033 tiefer")
+    r = imageAndDepth2RealWorldTransformator.pixelDepth2RealWorld(901, 138, 678)
+    print("Result:", r)
 
 
-print("Test: 450, 631, 585   #0.02 rechts von I2 und 0.033 tiefer")
-r = imageAndDepth2RealWorldTransformator.pixelDepth2RealWorld(450, 631, 585)
-print("Result:", r)
+    # 打印深度影像解析度
+    print("Depth Resolution:", depth_intrinsics.width, "x", depth_intrinsics.height)
 
-print("Test: 901,138,678     #0.02 links von I1 und 0.033 tiefer")
-r = imageAndDepth2RealWorldTransformator.pixelDepth2RealWorld(901, 138, 678)
-print("Result:", r)
+    # 打印顏色影像解析度
+    print("Color Resolution:", color_intrinsics.width, "x", color_intrinsics.height)
+    pipeline.stop()
 
 
-# 打印深度影像解析度
-print("Depth Resolution:", depth_intrinsics.width, "x", depth_intrinsics.height)
+# only for testing
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--live', action='store_true', help='stream world-space clouds instead of the calibration test')
+    parser.add_argument('--bag', default=None, help='loop a .bag instead of the connected camera')
+    parser.add_argument('--seconds', type=float, default=None)
+    parser.add_argument('--ring', type=int, default=4, help='ring buffer size (frames)')
+    parser.add_argument('--consumer-delay', type=float, default=0.0, help='seconds, to see frames being dropped')
+    parser.add_argument('--calibration', default=None, help='calibration json (sidecar or cache)')
+    parser.add_argument('--filters', default=None, help="depth filter chain, e.g. 'decimation,spatial,hole_filling'")
+    args = parser.parse_args()
 
-# 打印顏色影像解析度
-print("Color Resolution:", color_intrinsics.width, "x", color_intrinsics.height)
+    if args.live:
+        run_live(args.bag, args.seconds, args.ring, args.consumer_delay, args.calibration, args.filters)
+    else:
+        sanity_test()
@@ -20,18 +20,22 @@ Keyboard:
     [d]     Cycle through decimation values
     [z]     Toggle point scaling
     [c]     Toggle color source
+    [m]     Toggle painter / z-buffer rendering
+    [f]     Toggle FPS overlay
     [s]     Save PNG (./out.png)
-    [e]     Export points to ply (./out.ply)
+    [e]     Export points to binary ply (./out.ply) and ./points.npz, in the background
     [q\ESC] Quit
 """
 
 import math
 import time
+import threading
 import pandas as pd
 import cv2
 import numpy as np
 import pyrealsense2 as rs
-import open3d as o3d
+from realsense.point_io import write_points, write_ply, point_path, color_columns, POINT_FORMAT
+from realsense.raster import splat
 
 class AppState:
 
@@ -46,6 +50,8 @@ class AppState:
         self.decimate = 1
         self.scale = True
         self.color = True
+        self.zbuffer = False
+        self.overlay = True
 
     def reset(self):
         self.pitch, self.yaw, self.distance = 0, 0, 2
@@ -61,6 +67,12 @@ class AppState:
     def pivot(self):
         return self.translation + np.array((0, 0, self.distance), dtype=np.float32)
 
+    @property
+    def view_key(self):
+        """everything the rendered image depends on besides the point data"""
+        return (self.pitch, self.yaw, tuple(self.translation), self.distance,
+                self.decimate, self.scale, self.color, self.zbuffer, any(self.mouse_btns))
+
 
 state = AppState()
 
@@ -233,9 +245,15 @@ def frustum(out, intrinsics, color=(0x40, 0x40, 0x40)):
         line3d(out, view(bottom_left), view(top_left), color)
 
 
-def pointcloud(out, verts, texcoords, color, painter=True):
-    """draw point cloud with optional painter's algorithm"""
-    if painter:
+def pointcloud(out, verts, texcoords, color, painter=True, zbuffer=False):
+    """draw point cloud with optional painter's algorithm, or z-buffered (nearest point per pixel)"""
+    if zbuffer:
+        # no sort, every pixel keeps the point with the smallest view-space depth
+        v = view(verts)
+        depth = v[:, 2]
+        proj = project(v)
+        painter = False
+    elif painter:
         # Painter's algo, sort points from back to front
 
         # get reverse sorted indices by z (in view-space)
@@ -272,10 +290,55 @@ def pointcloud(out, verts, texcoords, color, painter=True):
     np.clip(v, 0, cw-1, out=v)
 
     # perform uv-mapping
-    out[i[m], j[m]] = color[u[m], v[m]]
+    if zbuffer:
+        m &= ~np.isnan(proj).any(axis=1)  # near-clipped points
+        splat(j[m], i[m], color[u[m], v[m]], out.shape, depth=depth[m], out=out)
+    else:
+        out[i[m], j[m]] = color[u[m], v[m]]
+
+
+def draw_overlay(img, fps, render_ms, cached):
+    """FPS / frame time text in the top-left corner"""
+    text = "%s  %.0f FPS  render %.2fms%s" % (
+        "z-buffer" if state.zbuffer else "painter", fps, render_ms, "  (cached)" if cached else "")
+    cv2.putText(img, text, (8, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 3, cv2.LINE_AA)
+    cv2.putText(img, text, (8, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0xff, 0xff, 0xff), 1, cv2.LINE_AA)
+
+
+def texcoords_to_pixels(texcoords, size):
+    """texcoords [0..1] -> integer (u, v) pixel of the mapped frame, same rounding as pointcloud()"""
+    cw, ch = size
+    uv = (texcoords * (cw, ch) + 0.5).astype(np.int32)
+    np.clip(uv[:, 0], 0, cw-1, out=uv[:, 0])
+    np.clip(uv[:, 1], 0, ch-1, out=uv[:, 1])
+    return uv[:, 0], uv[:, 1]
+
+
+def export_points(verts, texcoords, color, bgr=True, ply_path='./out.ply', points_path=None):
+    """write a snapshot of the cloud as binary ply + pipeline point file, points without depth dropped"""
+    t0 = time.time()
+    valid = verts[:, 2] > 0
+    verts, texcoords = verts[valid], texcoords[valid]
+    u, v = texcoords_to_pixels(texcoords, color.shape[:2][::-1])
+    df = pd.DataFrame({
+        'x': verts[:, 0], 'y': verts[:, 1], 'z': verts[:, 2],
+        'u': u, 'v': v,
+        **color_columns(color[v, u], 'BGR' if bgr else 'RGB')
+    })
+    write_ply(df, ply_path)
+    write_points(df, points_path or point_path('.', 'points', POINT_FORMAT))
+    print(f"exported {len(df)} points ({time.time() - t0:.2f}s)")
 
 
 out = np.empty((h, w, 3), dtype=np.uint8)
+export_thread = None
+
+# dirty-view cache: re-render only when the view or the point data changed
+data_version = 0
+rendered_key = None
+dt = 0.0
+fps = 0.0
+last_loop = time.time()
 
 while True:
     # Grab camera data
@@ -311,35 +374,50 @@ while True:
         v, t = points.get_vertices(), points.get_texture_coordinates()
         verts = np.asanyarray(v).view(np.float32).reshape(-1, 3)  # xyz
         texcoords = np.asanyarray(t).view(np.float32).reshape(-1, 2)  # uv
+        data_version += 1
 
     # Render
-    now = time.time()
+    render_key = (data_version, state.view_key)
+    cached = render_key == rendered_key
+    if not cached:
+        now = time.time()
 
-    out.fill(0)
+        out.fill(0)
 
-    grid(out, (0, 0.5, 1), size=1, n=10)
-    frustum(out, depth_intrinsics)
-    axes(out, view([0, 0, 0]), state.rotation, size=0.1, thickness=1)
+        grid(out, (0, 0.5, 1), size=1, n=10)
+        frustum(out, depth_intrinsics)
+        axes(out, view([0, 0, 0]), state.rotation, size=0.1, thickness=1)
 
-    if not state.scale or out.shape[:2] == (h, w):
-        pointcloud(out, verts, texcoords, color_source)
-    else:
-        tmp = np.zeros((h, w, 3), dtype=np.uint8)
-        pointcloud(tmp, verts, texcoords, color_source)
-        tmp = cv2.resize(
-            tmp, out.shape[:2][::-1], interpolation=cv2.INTER_NEAREST)
-        np.putmask(out, tmp > 0, tmp)
+        if not state.scale or out.shape[:2] == (h, w):
+            pointcloud(out, verts, texcoords, color_source, zbuffer=state.zbuffer)
+        else:
+            tmp = np.zeros((h, w, 3), dtype=np.uint8)
+            pointcloud(tmp, verts, texcoords, color_source, zbuffer=state.zbuffer)
+            tmp = cv2.resize(
+                tmp, out.shape[:2][::-1], interpolation=cv2.INTER_NEAREST)
+            np.putmask(out, tmp > 0, tmp)
+
+        if any(state.mouse_btns):
+            axes(out, view(state.pivot), state.rotation, thickness=4)
 
-    if any(state.mouse_btns):
-        axes(out, view(state.pivot), state.rotation, thickness=4)
+        dt = time.time() - now
+        rendered_key = render_key
 
-    dt = time.time() - now
+    loop_time = time.time() - last_loop
+    last_loop = time.time()
+    fps = 0.9 * fps + 0.1 / max(loop_time, 1e-6)
 
     cv2.setWindowTitle(
         state.WIN_NAME, "RealSense (%dx%d) %dFPS (%.2fms) %s" %
-        (w, h, 1.0/dt, dt*1000, "PAUSED" if state.paused else ""))
+        (w, h, fps, dt*1000, "PAUSED" if state.paused else ""))
 
-    cv2.imshow(state.WIN_NAME, out)
+    if state.overlay:
+        # draw on a copy so the cached frame stays clean
+        display = out.copy()
+        draw_overlay(display, fps, dt*1000, cached)
+        cv2.imshow(state.WIN_NAME, display)
+    else:
+        cv2.imshow(state.WIN_NAME, out)
     key = cv2.waitKey(1)
 
     if key == ord("r"):
@@ -358,56 +436,30 @@ while True:
     if key == ord("c"):
         state.color ^= True
 
+    if key == ord("m"):
+        state.zbuffer ^= True
+
+    if key == ord("f"):
+        state.overlay ^= True
+
     if key == ord("s"):
         cv2.imwrite('./out.png', out)
 
     if key == ord("e"):
-        points.export_to_ply('./out.ply', mapped_frame)
-        pcd = o3d.io.read_point_cloud("./out.ply")
-        o3d.io.write_point_cloud("out_ascii.ply", pcd, write_ascii=True)
-        
-        # 取得 color_frame 內參
-        color_intrinsics = color_frame.profile.as_video_stream_profile().intrinsics
-        fx, fy = color_intrinsics.fx, color_intrinsics.fy
-        cx, cy = color_intrinsics.ppx, color_intrinsics.ppy
-        print(f"內參: fx={fx}, fy={fy}, cx={cx}, cy={cy}")
-
-        # 讀取 PLY，並轉換成 CSV
-        with open("out_ascii.ply", "r") as f:
-            points = []
-            for line in f:
-                if line.startswith("end_header"):
-                    continue
-                data = line.strip().split()
-                if len(data) == 6:
-                    x, y, z = float(data[0]), float(data[1]), float(data[2])
-                    r, g, b = int(data[3]), int(data[4]), int(data[5])
-                    # (open3d -> D435：翻轉y軸)
-                    y = -y
-
-                    # 透視投影計算 u, v
-                    if z > 0:  # 確保 Z > 0 才計算
-                        u = int((x / z) * fx + cx)
-                        v = int((y / z) * fy + cy)
-                    else:   
-                        u, v = -1, -1  # 避免無效值
-                    # 儲存點資訊
-                    point = {
-                        'x': x, 'y': y, 'z': z, 
-                        'u': u, 'v': v,
-                        'red': r, 'green': g, 'blue': b
-                    }
-                    points.append(point)
-                    
-            df = pd.DataFrame(points)
-            df.to_csv("points.csv", index=False)
-            print("saved successed!")
-
-            
-            
+        if export_thread is not None and export_thread.is_alive():
+            print("export still running")
+        else:
+            # snapshot the arrays, the frame buffers are reused by the next wait_for_frames()
+            export_thread = threading.Thread(
+                target=export_points,
+                args=(verts.copy(), texcoords.copy(), color_source.copy(), state.color),
+                daemon=True)
+            export_thread.start()
 
     if key in (27, ord("q")) or cv2.getWindowProperty(state.WIN_NAME, cv2.WND_PROP_AUTOSIZE) < 0:
         break
 
 # Stop streaming
+if export_thread is not None:
+    export_thread.join()
 pipeline.stop()
\ No newline at end of file
@@ -0,0 +1,75 @@
+"""
+Voxel-grid downsampling of a pointcloud table.
+Runs right after world_coordinates, so detection, material lookup, clustering and
+stitching work on one point per occupied voxel instead of every pixel. Image stages
+detect on no_cap's projection.png and label each voxel through its representative u / v.
+"""
+import numpy as np
+import pandas as pd
+from realsense.point_io import read_points, write_points
+
+def voxel_downsample(df: pd.DataFrame, voxel_size: float) -> pd.DataFrame:
+    """
+    One row per occupied voxel of edge voxel_size (same unit as x, y, z):
+      x, y, z    centroid of the voxel's points
+      R, G, B    mean color
+      u, v       pixel of the point nearest to the centroid (for image lookups)
+      count      number of source points (summed when the input already has a count)
+      src_index  row of that nearest point in the input table
+    Any other column (labels, capture id, ...) is taken from that nearest point.
+    """
+    if voxel_size <= 0:
+        raise ValueError(f"voxel_size must be positive, got {voxel_size}")
+    if len(df) == 0:
+        return df.assign(count=np.zeros(0, dtype=np.uint32), src_index=np.zeros(0, dtype=np.int64))
+
+    xyz = df[['x', 'y', 'z']].to_numpy(dtype=np.float64)
+    cells = np.floor((xyz - xyz.min(axis=0)) / voxel_size).astype(np.int64)
+    dims = cells.max(axis=0) + 1
+    keys = (cells[:, 0] * dims[1] + cells[:, 1]) * dims[2] + cells[:, 2]
+
+    # hash-based grouping, O(N)
+    voxel, _ = pd.factorize(keys, sort=False)
+    n_voxels = voxel.max() + 1
+    count = np.bincount(voxel, minlength=n_voxels)
+    if 'count' in df:
+        total = np.bincount(voxel, weights=df['count'].to_numpy(dtype=np.float64), minlength=n_voxels)
+    else:
+        total = count
+
+    centroid = np.column_stack([
+        np.bincount(voxel, weights=xyz[:, i], minlength=n_voxels) / count for i in range(3)
+    ])
+
+    # representative point: nearest to its voxel centroid
+    dist = np.square(xyz - centroid[voxel]).sum(axis=1)
+    nearest = np.full(n_voxels, np.inf)
+    np.minimum.at(nearest, voxel, dist)
+    candidate = np.flatnonzero(dist == nearest[voxel])
+    src_index = np.full(n_voxels, len(df), dtype=np.int64)
+    np.minimum.at(src_index, voxel[candidate], candidate)
+
+    out = pd.DataFrame({
+        'x': centroid[:, 0],
+        'y': centroid[:, 1],
+        'z': centroid[:, 2],
+        'u': df['u'].to_numpy()[src_index],
+        'v': df['v'].to_numpy()[src_index],
+    })
+    for c in ('R', 'G', 'B'):
+        mean = np.bincount(voxel, weights=df[c].to_numpy(dtype=np.float64), minlength=n_voxels) / count
+        out[c] = np.rint(mean).astype(np.uint8)
+    out['count'] = total.astype(np.uint32)
+    out['src_index'] = src_index
+    for c in df.columns:
+        if c not in out:
+            out[c] = df[c].take(src_index).to_numpy()
+    return out
+
+def voxel_downsample_file(point_file: str, voxel_size: float, output_file: str = None) -> str:
+    """Downsample a pointcloud file in place (or into output_file), keeping its format."""
+    df = read_points(point_file)
+    out = voxel_downsample(df, voxel_size)
+    output_file = write_points(out, output_file or point_file)
+    print(f"[INFO] voxel {voxel_size}: {len(df)} -> {len(out)} points, saved {output_file}")
+    return output_file
@@ -0,0 +1,133 @@
+"""realsense/bag_reader.py: lazy frame index, seeking and the cached index, on a fake playback device."""
+import datetime
+import os
+import pytest
+
+rs = pytest.importorskip('pyrealsense2')
+from realsense import bag_reader
+from realsense.bag_reader import BagReader
+
+FRAME_NS = 33_333_333
+
+class FakeFrameset:
+    def __init__(self, number):
+        self.number = number
+
+    def get_timestamp(self):
+        return 1000.0 + self.number * FRAME_NS / 1e6
+
+    def get_depth_frame(self):
+        return self
+
+    def get_color_frame(self):
+        return self
+
+class FakePlayback:
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+
+    def set_real_time(self, real_time):
+        pass
+
+    def get_position(self):
+        return self.pipeline.last * FRAME_NS
+
+    def seek(self, offset: datetime.timedelta):
+        ns = offset // datetime.timedelta(microseconds=1) * 1000
+        self.pipeline.next = -(-ns // FRAME_NS)
+
+class FakeProfile:
+    def __init__(self, pipeline):
+        self.playback = FakePlayback(pipeline)
+
+    def get_device(self):
+        return self
+
+    def as_playback(self):
+        return self.playback
+
+class FakePipeline:
+    frames = 100
+    decoded = 0
+
+    def start(self, config):
+        self.next, self.last = 0, None
+        return FakeProfile(self)
+
+    def stop(self):
+        pass
+
+    def try_wait_for_frames(self, timeout):
+        if self.next >= self.frames:
+            return False, None
+        FakePipeline.decoded += 1
+        self.last, self.next = self.next, self.next + 1
+        return True, FakeFrameset(self.last)
+
+class FakeConfig:
+    def enable_device_from_file(self, path, repeat):
+        pass
+
+class FakeAlign:
+    def __init__(self, *args):
+        pass
+
+    def process(self, frames):
+        return frames
+
+@pytest.fixture
+def bag(tmp_path, monkeypatch):
+    for name, fake in [('pipeline', FakePipeline), ('config', FakeConfig), ('align', FakeAlign), ('pointcloud', object)]:
+        monkeypatch.setattr(bag_reader.rs, name, fake, raising=False)
+    FakePipeline.decoded = 0
+    path = tmp_path / 'capture.bag'
+    path.write_bytes(b'bag')
+    return str(path)
+
+def frame_number(reader, n):
+    depth_frame, _ = reader.read_frames(n)
+    return depth_frame.number
+
+def test_fresh_bag_decodes_up_to_the_frame(bag):
+    reader = BagReader(bag)
+    assert frame_number(reader, 9) == 9
+    assert FakePipeline.decoded == 10
+    assert not reader.complete and not os.path.exists(bag + bag_reader.INDEX_SUFFIX)
+
+    # indexed frames are seeked to, the next one is read in order
+    assert frame_number(reader, 3) == 3
+    assert frame_number(reader, 4) == 4
+    assert FakePipeline.decoded == 12
+    assert frame_number(reader, 20) == 20
+    # seek back to the last indexed frame 9, then decode 10..20
+    assert FakePipeline.decoded == 12 + 1 + (20 - 9)
+
+def test_full_index_is_cached(bag):
+    reader = BagReader(bag)
+    assert len(reader) == FakePipeline.frames
+    assert reader.complete and os.path.exists(bag + bag_reader.INDEX_SUFFIX)
+    with pytest.raises(IndexError):
+        reader.read_frames(FakePipeline.frames)
+    assert frame_number(reader, 0) == 0
+
+    FakePipeline.decoded = 0
+    cached = BagReader(bag)
+    assert cached.complete and len(cached) == FakePipeline.frames
+    assert frame_number(cached, 80) == 80
+    assert FakePipeline.decoded == 1
+
+def test_frame_at_indexes_only_what_it_needs(bag):
+    reader = BagReader(bag)
+    ts = FakeFrameset(30).get_timestamp()
+    assert reader.frame_at(ts + 1) == 30
+    assert not reader.complete and reader.indexed <= 32
+    assert reader.frame_at(1e9) == FakePipeline.frames - 1
+    assert reader.complete
+
+def test_frames_streams_in_order(bag, monkeypatch):
+    monkeypatch.setattr(BagReader, '_to_arrays', staticmethod(lambda depth_frame, color_frame: depth_frame.number))
+    reader = BagReader(bag)
+    assert list(reader.frames(5, 12, step=3)) == [5, 8, 11]
+    assert FakePipeline.decoded == 12
+    assert list(reader.frames(97)) == [97, 98, 99]
+    assert list(reader.frames(120, 130)) == []
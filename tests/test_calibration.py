@@ -0,0 +1,64 @@
+"""realsense/calibration.py: build_calibration on the stream profiles no_cap sees."""
+import numpy as np
+import pytest
+
+rs = pytest.importorskip('pyrealsense2')
+from realsense import calibration
+from realsense.calibration import build_calibration, transformator_from_calibration
+
+class FakeStream:
+    def __init__(self, kind, fmt, width, height):
+        self.kind, self.fmt, self.w, self.h = kind, fmt, width, height
+
+    def stream_type(self):
+        return self.kind
+
+    def format(self):
+        return self.fmt
+
+    def fps(self):
+        return 30
+
+    def as_video_stream_profile(self):
+        return self
+
+    def width(self):
+        return self.w
+
+    def height(self):
+        return self.h
+
+    def get_intrinsics(self):
+        intrinsics = rs.intrinsics()
+        intrinsics.width, intrinsics.height = self.w, self.h
+        intrinsics.ppx, intrinsics.ppy = self.w / 2, self.h / 2
+        intrinsics.fx = intrinsics.fy = 0.94 * self.w
+        intrinsics.model = rs.distortion.none
+        intrinsics.coeffs = [0.0] * 5
+        return intrinsics
+
+class FakeDevice:
+    def get_info(self, info):
+        return 'test-serial'
+
+class FakeProfile:
+    def __init__(self, width, height):
+        self.streams = {rs.stream.depth: FakeStream(rs.stream.depth, rs.format.z16, width, height),
+                        rs.stream.color: FakeStream(rs.stream.color, rs.format.rgb8, width, height)}
+
+    def get_stream(self, kind):
+        return self.streams[kind]
+
+    def get_device(self):
+        return FakeDevice()
+
+@pytest.mark.parametrize('width, height', [(640, 480), (1280, 720), (1920, 1080)])
+def test_no_cap_calibration_accepts_common_resolutions(tmp_path, monkeypatch, width, height):
+    # no_cap / run_pipeline / stitch calibrate every capture, whatever its resolution
+    monkeypatch.setattr(calibration, 'CALIB_DIR', str(tmp_path))
+    result = build_calibration(FakeProfile(width, height))
+    assert result['color_profile']['width'] == width
+    assert np.isfinite(result['transformationMatrixImage2RealWorld']).all()
+    # the second run comes from the cache
+    assert build_calibration(FakeProfile(width, height)) == result
+    transformator_from_calibration(result)
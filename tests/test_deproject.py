@@ -0,0 +1,77 @@
+"""realsense/coor_reconstruct.py: vectorized deprojection against the per-point librealsense path."""
+import numpy as np
+import pytest
+
+rs = pytest.importorskip('pyrealsense2')
+from realsense.coor_reconstruct import ImageAndDepth2RealWorldTransformator, deproject_pixels, pixel_rays
+
+# (model, width, height, fx, fy, coeffs), coefficients in the range the cameras report
+INTRINSICS = {
+    'none': (rs.distortion.none, 640, 480, 615.0, 615.0, [0.0] * 5),
+    'brown_conrady': (rs.distortion.brown_conrady, 1280, 720, 910.0, 908.0, [0.12, -0.25, 0.001, -0.0008, 0.1]),
+    'inverse_brown_conrady': (rs.distortion.inverse_brown_conrady, 640, 480, 385.0, 385.0,
+                              [-0.055, 0.064, -0.0005, 0.0009, -0.021]),
+    'kannala_brandt4': (rs.distortion.kannala_brandt4, 848, 800, 286.0, 287.0, [-0.0078, 0.045, -0.042, 0.0079, 0.0]),
+    'ftheta': (rs.distortion.ftheta, 848, 800, 286.0, 287.0, [0.92, 0.0, 0.0, 0.0, 0.0]),
+}
+
+def make_intrinsics(name):
+    model, width, height, fx, fy, coeffs = INTRINSICS[name]
+    intrinsics = rs.intrinsics()
+    intrinsics.width, intrinsics.height = width, height
+    intrinsics.ppx, intrinsics.ppy = width / 2 + 3.7, height / 2 - 2.1
+    intrinsics.fx, intrinsics.fy = fx, fy
+    intrinsics.model = model
+    intrinsics.coeffs = coeffs
+    return intrinsics
+
+def sample_pixels(intrinsics, n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    u = rng.integers(0, intrinsics.width, n)
+    v = rng.integers(0, intrinsics.height, n)
+    if intrinsics.model in (rs.distortion.kannala_brandt4, rs.distortion.ftheta):
+        # fisheye corners lie past 90 deg off-axis, where a z-depth means nothing and tan() diverges
+        # (float32 librealsense and float64 numpy part ways); keep the pixels within ~70 deg
+        inside = np.hypot((u - intrinsics.ppx) / intrinsics.fx, (v - intrinsics.ppy) / intrinsics.fy) < 1.2
+        u, v = u[inside], v[inside]
+    else:
+        # corners, where the distortion terms are largest
+        u = np.concatenate([u, [0, intrinsics.width - 1, 0, intrinsics.width - 1]])
+        v = np.concatenate([v, [0, 0, intrinsics.height - 1, intrinsics.height - 1]])
+    depth = rng.uniform(0.3, 4.0, u.size)
+    return u, v, depth
+
+@pytest.mark.parametrize('name', list(INTRINSICS))
+def test_deproject_pixels_matches_rs(name):
+    intrinsics = make_intrinsics(name)
+    u, v, depth = sample_pixels(intrinsics)
+    expected = np.array([rs.rs2_deproject_pixel_to_point(intrinsics, [float(a), float(b)], float(d))
+                         for a, b, d in zip(u, v, depth)])
+    # librealsense computes in float32
+    np.testing.assert_allclose(deproject_pixels(intrinsics, u, v, depth), expected, rtol=1e-4, atol=1e-5)
+
+@pytest.mark.parametrize('name', list(INTRINSICS))
+def test_pixel_rays_match_deproject(name):
+    intrinsics = make_intrinsics(name)
+    u, v, depth = sample_pixels(intrinsics, n=100)
+    rays = pixel_rays(intrinsics)
+    np.testing.assert_allclose(rays[v, u] * depth[:, None], deproject_pixels(intrinsics, u, v, depth), rtol=1e-12)
+
+def calibrated(intrinsics):
+    # reference pixels spread over the image at different depths (mm), world = a rigid motion of them (m)
+    fractions = [(.2, .2, 700), (.8, .25, 650), (.25, .8, 550), (.75, .7, 900), (.5, .5, 800)]
+    pixelDepth = [[fu * intrinsics.width, fv * intrinsics.height, d] for fu, fv, d in fractions]
+    camera = deproject_pixels(intrinsics, *np.array(pixelDepth).T) / 1000
+    angle = np.deg2rad(30)
+    rotation = np.array([[np.cos(angle), 0, np.sin(angle)], [0, 1, 0], [-np.sin(angle), 0, np.cos(angle)]])
+    world = camera @ rotation.T + [0.1, -0.4, 1.2]
+    return ImageAndDepth2RealWorldTransformator(intrinsics, pixelDepth, np.column_stack([world, np.ones(len(world))]))
+
+@pytest.mark.parametrize('name', list(INTRINSICS))
+def test_real_world_batch_matches_per_point(name):
+    intrinsics = make_intrinsics(name)
+    transformator = calibrated(intrinsics)
+    u, v, depth = sample_pixels(intrinsics, seed=1)
+    expected = np.array([transformator.pixelDepth2RealWorld(a, b, d) for a, b, d in zip(u, v, depth * 1000)])
+    np.testing.assert_allclose(transformator.pixelDepth2RealWorld_batch(u, v, depth * 1000), expected,
+                               rtol=1e-4, atol=1e-5)
@@ -0,0 +1,81 @@
+"""realsense/fusion.py: fused depth against nanmedian / nanmean over the valid samples, bounded memory."""
+import warnings
+import numpy as np
+import pytest
+from realsense.fusion import DepthAccumulator, fuse_depth, MEDIAN_SAMPLES
+
+def noisy_frames(k, shape=(48, 64), seed=0):
+    rng = np.random.default_rng(seed)
+    truth = rng.uniform(500, 4000, shape)
+    frames = []
+    for _ in range(k):
+        d = truth + rng.normal(0, 8, shape)
+        d[rng.random(shape) < 0.3] = 0
+        d[rng.random(shape) < 0.05] += 800
+        frames.append(np.clip(d, 0, 65535).astype(np.uint16))
+    return frames
+
+def reference(frames, reduce, min_count=1):
+    stack = np.stack(frames).astype(np.float64)
+    count = (stack > 0).sum(axis=0)
+    stack[stack == 0] = np.nan
+    with warnings.catch_warnings():
+        # all-hole pixels
+        warnings.simplefilter('ignore', RuntimeWarning)
+        fused = reduce(stack, axis=0)
+    return np.where(count >= min_count, np.rint(np.nan_to_num(fused)), 0).astype(np.uint16), count
+
+@pytest.mark.parametrize('method, reduce', [('median', np.nanmedian), ('mean', np.nanmean)])
+@pytest.mark.parametrize('k', [1, 4, 5, MEDIAN_SAMPLES])
+def test_matches_reference(method, reduce, k):
+    frames = noisy_frames(k)
+    fused, count = fuse_depth(frames, method)
+    ref, ref_count = reference(frames, reduce)
+    np.testing.assert_array_equal(count, ref_count)
+    np.testing.assert_array_equal(fused, ref)
+
+def test_median_min_count():
+    frames = noisy_frames(5, seed=1)
+    acc = DepthAccumulator(frames[0].shape, 'median')
+    for f in frames:
+        acc.update(f)
+    ref, _ = reference(frames, np.nanmedian, min_count=3)
+    np.testing.assert_array_equal(acc.result(min_count=3), ref)
+
+def test_median_memory_is_bounded():
+    frames = noisy_frames(40, seed=2)
+    acc = DepthAccumulator(frames[0].shape, 'median', samples=8)
+    nbytes = acc.nbytes
+    for f in frames:
+        acc.update(f)
+    assert acc.nbytes == nbytes == acc.count.nbytes + 8 * frames[0].size * 2
+
+    # past the reservoir size the result is the median of a random subset of the valid samples
+    exact, _ = reference(frames, np.nanmedian)
+    err = np.abs(acc.result().astype(np.float64) - exact)
+    assert np.median(err) <= 4 and np.percentile(err, 99) <= 25
+    stack = np.stack(frames).astype(np.float64)
+    stack[stack == 0] = np.nan
+    assert ((acc.result() >= np.nanmin(stack, axis=0)) & (acc.result() <= np.nanmax(stack, axis=0))).all()
+
+def test_median_is_reproducible():
+    frames = noisy_frames(30, seed=3)
+    a, _ = fuse_depth(frames, 'median')
+    b, _ = fuse_depth(frames, 'median')
+    np.testing.assert_array_equal(a, b)
+
+def test_median_rejects_flying_pixels():
+    # two of five samples are outliers, the median stays on the surface
+    frames = [np.full((2, 2), d, dtype=np.uint16) for d in (1000, 1002, 1001, 9000, 9000)]
+    fused, _ = fuse_depth(frames, 'median')
+    assert (fused == 1002).all()
+
+def test_shape_and_method_checks():
+    with pytest.raises(ValueError):
+        DepthAccumulator((4, 4), 'mode')
+    with pytest.raises(ValueError):
+        DepthAccumulator((4, 4), 'median', samples=0)
+    with pytest.raises(ValueError):
+        DepthAccumulator((4, 4)).update(np.zeros((4, 5), dtype=np.uint16))
+    with pytest.raises(ValueError):
+        fuse_depth([])
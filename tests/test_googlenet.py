@@ -0,0 +1,40 @@
+"""models/googlenet.py: fused LRN against the original AvgPool3d LRN, at the googlenet call sites."""
+import pytest
+import torch
+from material_segmentation.models.googlenet import LRN, googlenet
+
+@pytest.mark.parametrize('shape', [(2, 64, 64, 64), (2, 192, 64, 64), (1, 7, 5, 3)])
+def test_fused_lrn_matches_pool(shape):
+    torch.manual_seed(0)
+    x = torch.relu(torch.randn(shape)) * 30
+    pool, fused = LRN(impl='pool'), LRN(impl='fused')
+    with torch.no_grad():
+        ref = pool(x)
+        out = fused(x)
+    torch.testing.assert_close(out, ref, rtol=1e-5, atol=1e-6)
+    with torch.inference_mode():
+        torch.testing.assert_close(fused(x), ref, rtol=1e-5, atol=1e-6)
+
+def test_fused_lrn_grad_matches_pool():
+    torch.manual_seed(0)
+    x = torch.relu(torch.randn(2, 64, 16, 16)) * 30
+    xa = x.clone().requires_grad_(True)
+    xb = x.clone().requires_grad_(True)
+    LRN(impl='pool')(xa).square().sum().backward()
+    LRN(impl='fused')(xb).square().sum().backward()
+    torch.testing.assert_close(xb.grad, xa.grad, rtol=1e-4, atol=1e-5)
+
+def test_fused_lrn_googlenet():
+    torch.manual_seed(0)
+    pool_model = googlenet(lrn='pool').eval()
+    fused_model = googlenet(lrn='fused').eval()
+    fused_model.load_state_dict(pool_model.state_dict())
+    x = torch.randn(2, 3, 256, 256) * 50
+    with torch.inference_mode():
+        ref, out = pool_model(x), fused_model(x)
+    assert torch.equal(ref.argmax(1), out.argmax(1))
+    torch.testing.assert_close(out, ref, rtol=1e-4, atol=1e-4 * ref.abs().max().item())
+
+def test_unknown_lrn_impl():
+    with pytest.raises(ValueError):
+        LRN(impl='cuda')
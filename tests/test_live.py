@@ -0,0 +1,37 @@
+"""realsense/ultilities/coor_reconstruct_live.py: FrameRing drop accounting, live calibration guard."""
+import pytest
+
+pytest.importorskip('pyrealsense2')
+from realsense.ultilities.coor_reconstruct_live import FrameRing
+from realsense.calibration import check_reference_pixels
+from realsense.coor_reconstruct import referencePoints_pixelDepth
+
+def test_dropped_counts_skipped_clouds():
+    ring = FrameRing(size=2)
+    for i in range(3):
+        ring.publish({'frame': i})
+    cloud = ring.wait_newer(0)
+    assert cloud['seq'] == 3 and ring.dropped == 2
+    for i in range(10):
+        ring.publish({'frame': i})
+    assert ring.wait_newer(cloud['seq'])['seq'] == 13
+    assert ring.dropped == 2 + 9
+
+def test_consumer_keeping_up_drops_nothing():
+    ring = FrameRing(size=2)
+    seq = 0
+    for i in range(50):
+        ring.publish({'frame': i})
+        seq = ring.wait_newer(seq)['seq']
+    assert seq == 50
+    assert ring.dropped == 0
+
+def test_wait_newer_timeout():
+    ring = FrameRing()
+    assert ring.wait_newer(0, timeout=.01) is None
+    assert ring.dropped == 0
+
+def test_reference_pixels_need_their_resolution():
+    with pytest.raises(ValueError):
+        check_reference_pixels(referencePoints_pixelDepth, 640, 480)
+    check_reference_pixels(referencePoints_pixelDepth, 1920, 1080)
@@ -0,0 +1,41 @@
+"""
+run_on_image_cpu: the frozen TorchScript graph (export_torchscript) against the eager googlenet.
+Freezing folds / reorders float ops, so logits match to float tolerance and labelmaps exactly.
+"""
+import cv2
+import numpy as np
+import pytest
+import torch
+
+pytest.importorskip('pydensecrf')
+from material_segmentation.run_on_image_cpu import TILE, load_minc_model, multi_scale_inference, image_tensor
+from material_segmentation.bench_minc import weights_or_random, sample_images
+
+@pytest.fixture(scope='module')
+def models():
+    weights = weights_or_random()
+    return load_minc_model(weights, 'eager'), load_minc_model(weights, 'torchscript')
+
+@pytest.fixture(scope='module')
+def images():
+    return sample_images(512)
+
+def test_torchscript_matches_eager_on_tiles(models, images):
+    eager, scripted = models
+    x = torch.stack([image_tensor(img[:TILE, :TILE]) for img in images])
+    with torch.inference_mode():
+        torch.testing.assert_close(scripted(x), eager(x), rtol=1e-4, atol=1e-4)
+
+@pytest.mark.parametrize('size', [(512, 512), (300, 417)])
+def test_torchscript_matches_eager_on_whole_images(models, images, size):
+    eager, scripted = models
+    x = image_tensor(cv2.resize(images[0], size[::-1])).unsqueeze(0)
+    with torch.inference_mode():
+        torch.testing.assert_close(scripted(x), eager(x), rtol=1e-4, atol=1e-4)
+
+def test_torchscript_multi_scale_labelmap(models, images):
+    eager, scripted = models
+    with torch.inference_mode():
+        for img in images[:2]:
+            np.testing.assert_array_equal(multi_scale_inference(img, scripted).argmax(-1),
+                                          multi_scale_inference(img, eager).argmax(-1))
@@ -0,0 +1,83 @@
+"""
+CPU precision modes of the MINC googlenet (run_on_image_cpu.quantize_minc_model) against fp32:
+argmax labelmap agreement of multi-scale inference on the sample images, with the real weights
+when present, bench_minc.normalized_googlenet otherwise (plain random weights give one label
+everywhere, agreement is then trivially 100%).
+"""
+import os
+import shutil
+import numpy as np
+import pytest
+import torch
+
+pytest.importorskip('pydensecrf')
+from material_segmentation.run_on_image_cpu import (CALIBRATION_DIR, export_static_int8, load_minc_model,
+                                                    multi_scale_inference, quantize_minc_model)
+from material_segmentation.bench_minc import weights_or_random, sample_images
+
+SIZE = 256
+
+@pytest.fixture(scope='module')
+def weights():
+    return weights_or_random()
+
+@pytest.fixture(scope='module')
+def calibration_dir(tmp_path_factory):
+    path = tmp_path_factory.mktemp('calibration')
+    for name in sorted(os.listdir(CALIBRATION_DIR))[:2]:
+        shutil.copy(os.path.join(CALIBRATION_DIR, name), path / name)
+    return str(path)
+
+@pytest.fixture(scope='module')
+def images():
+    return sample_images(SIZE)
+
+@pytest.fixture(scope='module')
+def reference(weights, images):
+    model = load_minc_model(weights)
+    with torch.inference_mode():
+        labelmaps = [multi_scale_inference(img, model).argmax(-1) for img in images]
+    # 要有好幾種 label，不然 agreement 沒有意義
+    assert len(np.unique(np.concatenate(labelmaps))) >= 3
+    return labelmaps
+
+def agreement(model, images, reference) -> float:
+    with torch.inference_mode():
+        return np.mean([np.mean(multi_scale_inference(img, model).argmax(-1) == ref)
+                        for img, ref in zip(images, reference)])
+
+@pytest.mark.parametrize('precision, channels_last, threshold', [
+    ('dynamic_int8', False, .94),
+    ('dynamic_int8', True, .94),
+    ('bf16', True, .98),
+])
+def test_label_agreement(weights, images, reference, precision, channels_last, threshold):
+    model = load_minc_model(weights, precision=precision, channels_last=channels_last)
+    assert agreement(model, images, reference) >= threshold
+
+def test_static_int8_agreement(weights, calibration_dir, images, reference):
+    # 在 inference_mode 裡建 (bench / service 都是)，LRN(fused) 的 in-place 分支不能進 FX graph
+    with torch.inference_mode():
+        model = quantize_minc_model(load_minc_model(weights), 'static_int8', calibration_dir=calibration_dir)
+    assert agreement(model, images, reference) >= .94
+
+def test_dynamic_int8_keeps_negative_logits(weights):
+    fp32 = load_minc_model(weights)
+    int8 = load_minc_model(weights, precision='dynamic_int8')
+    x = torch.randn(2, 3, SIZE, SIZE) * 50
+    with torch.inference_mode():
+        ref, out = fp32(x), int8(x)
+    assert (ref < 0).any()
+    assert out.min() < 0
+    assert (torch.sign(out) == torch.sign(ref)).float().mean() > .9
+
+def test_static_int8_cache(weights, calibration_dir, tmp_path):
+    path = str(tmp_path / 'static_int8.pt')
+    assert export_static_int8(weights, calibration_dir=calibration_dir, path=path) == path
+    mtime = os.path.getmtime(path)
+    assert export_static_int8(weights, calibration_dir=calibration_dir, path=path) == path
+    assert os.path.getmtime(path) == mtime      # 沒有重新 calibrate
+    model = torch.jit.load(path)
+    x = torch.randn(1, 3, SIZE + 128, SIZE) * 50
+    with torch.inference_mode():
+        assert model(x).shape == (1, 23, (SIZE + 128) // 16, SIZE // 16)
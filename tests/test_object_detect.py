@@ -0,0 +1,71 @@
+"""material_segmentation/object_detect.py: point assignment, batch API and backend options."""
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('ultralytics')
+from material_segmentation import object_detect
+from material_segmentation.object_detect import assign_objects, detect_objects_batch, set_detector_threads
+from material_segmentation.bench_assign_objects import synthetic_points, synthetic_detections, loop_assign
+
+@pytest.mark.parametrize('backend', ['onnx', 'openvino'])
+def test_threads_rejected_for_exported_backends(backend):
+    with pytest.raises(ValueError):
+        set_detector_threads(2, backend)
+    set_detector_threads(None, backend)
+
+def test_reconstruct_image_is_bgr(tmp_path):
+    from realsense.point_io import color_columns, write_points, read_points
+    from material_segmentation.object_detect import reconstruct_image
+    rng = np.random.default_rng(0)
+    rgb = rng.integers(0, 256, (6, 8, 3), dtype=np.uint8)
+    v, u = np.nonzero(np.ones(rgb.shape[:2], dtype=bool))
+    df = pd.DataFrame({'x': u, 'y': v, 'z': np.ones(u.size), 'u': u, 'v': v, **color_columns(rgb[v, u], 'RGB')})
+    df = read_points(write_points(df, str(tmp_path / 'pointcloud.npz')))
+    np.testing.assert_array_equal(reconstruct_image(df, 8, 6), rgb[:, :, ::-1])
+
+def test_assign_objects_leaves_input_unchanged():
+    df = synthetic_points(500)
+    before = df.copy()
+    out = assign_objects(df, synthetic_detections(5))
+    pd.testing.assert_frame_equal(df, before)
+    assert 'object_label' in out and 'object_label' not in df
+
+class FakeDetector:
+    names = {}
+    def __call__(self, images, **kwargs):
+        return [None] * len(images)
+
+def test_batch_leaves_point_tables_unchanged(monkeypatch):
+    detections = synthetic_detections(3)
+    monkeypatch.setattr(object_detect, 'get_detector', lambda *a, **k: FakeDetector())
+    monkeypatch.setattr(object_detect, 'detection_table', lambda result, names: detections)
+    frames = [synthetic_points(200, seed=s).assign(R=1, G=2, B=3) for s in range(3)]
+    before = [f.copy() for f in frames]
+    outputs = detect_objects_batch(frames, batch_size=2)
+    for frame, ref, out in zip(frames, before, outputs):
+        pd.testing.assert_frame_equal(frame, ref)
+        pd.testing.assert_frame_equal(out['points'], assign_objects(ref, detections))
+
+@pytest.mark.parametrize('boxes', [0, 1, 10, 50])
+def test_assign_objects_matches_loop(boxes):
+    df = synthetic_points(20000, seed=boxes)
+    detection_results = synthetic_detections(boxes, seed=boxes)
+    pd.testing.assert_frame_equal(assign_objects(df, detection_results), loop_assign(df.copy(), detection_results))
+
+def test_assign_objects_boxes_on_image_border():
+    # 框的 x2 / y2 貼齊 width / height，點也可能落在邊界上
+    df = pd.DataFrame({'u': np.array([0, 639, 640, 5], dtype=np.uint16), 'v': np.array([0, 479, 480, 5], dtype=np.uint16)})
+    detection_results = pd.DataFrame({'label': ['a', 'b'], 'x1': [0.0, 3.0], 'y1': [0.0, 3.0],
+                                      'x2': [640.0, 10.0], 'y2': [480.0, 10.0]})
+    pd.testing.assert_frame_equal(assign_objects(df, detection_results), loop_assign(df.copy(), detection_results))
+
+def test_voxel_labels_follow_the_representative_pixel():
+    from realsense.voxel import voxel_downsample
+    df = synthetic_points(5000, seed=5)
+    detection_results = synthetic_detections(10, seed=5)
+    full = assign_objects(df, detection_results)
+    out = voxel_downsample(df.assign(R=0, G=0, B=0), .5)
+    voxels = assign_objects(out, detection_results)
+    for c in ('object_label', 'object_num', 'bbox_x1', 'bbox_y2'):
+        np.testing.assert_array_equal(voxels[c].to_numpy(), full[c].to_numpy()[out['src_index']])
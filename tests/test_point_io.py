@@ -0,0 +1,62 @@
+"""realsense/point_io.py: the R, G, B columns hold true red / green / blue through every writer and reader."""
+import numpy as np
+import pandas as pd
+import pytest
+from realsense.point_io import color_columns, point_colors, write_points, read_points, write_ply, _PLY_PROPERTIES, _PLY_DTYPES
+
+# one saturated pixel per channel, (H, W, 3) RGB
+RGB_FRAME = np.array([[[255, 0, 0], [0, 255, 0], [0, 0, 255]],
+                      [[10, 20, 30], [200, 100, 50], [0, 0, 0]]], dtype=np.uint8)
+
+def frame_table(rgb_frame) -> pd.DataFrame:
+    v, u = np.nonzero(np.ones(rgb_frame.shape[:2], dtype=bool))
+    return pd.DataFrame({
+        'x': u.astype(np.float32), 'y': v.astype(np.float32), 'z': np.ones(u.size, dtype=np.float32),
+        'u': u, 'v': v,
+        **color_columns(rgb_frame[v, u], 'RGB'),
+    })
+
+def read_ply(path) -> np.ndarray:
+    with open(path, 'rb') as f:
+        data = f.read()
+    body = data[data.index(b'end_header\n') + len(b'end_header\n'):]
+    return np.frombuffer(body, dtype=[(name, _PLY_DTYPES[t]) for _, t, name in _PLY_PROPERTIES])
+
+def test_color_orders_agree():
+    rgb = RGB_FRAME.reshape(-1, 3)
+    from_rgb = color_columns(rgb, 'RGB')
+    from_bgr = color_columns(rgb[:, ::-1], 'BGR')
+    for col in 'RGB':
+        np.testing.assert_array_equal(from_rgb[col], from_bgr[col])
+    assert from_rgb['R'][0] == 255 and from_rgb['B'][2] == 255
+
+    df = pd.DataFrame(from_rgb)
+    np.testing.assert_array_equal(point_colors(df, 'RGB'), rgb)
+    np.testing.assert_array_equal(point_colors(df, 'BGR'), rgb[:, ::-1])
+
+def test_invalid_order():
+    with pytest.raises(ValueError):
+        color_columns(RGB_FRAME.reshape(-1, 3), 'GBR')
+    with pytest.raises(ValueError):
+        point_colors(pd.DataFrame(color_columns(RGB_FRAME.reshape(-1, 3))), 'rgb')
+
+@pytest.mark.parametrize('fmt', ['npz', 'csv'])
+def test_point_file_round_trip(tmp_path, fmt):
+    df = frame_table(RGB_FRAME)
+    back = read_points(write_points(df, str(tmp_path / f'pointcloud.{fmt}')))
+    np.testing.assert_array_equal(point_colors(back, 'RGB'), RGB_FRAME.reshape(-1, 3))
+
+def test_ply_colors_are_true_rgb(tmp_path):
+    df = frame_table(RGB_FRAME)
+    vertices = read_ply(write_ply(df, str(tmp_path / 'out.ply')))
+    rgb = np.column_stack([vertices['red'], vertices['green'], vertices['blue']])
+    np.testing.assert_array_equal(rgb, RGB_FRAME.reshape(-1, 3))
+
+def test_depth_image_to_points_keeps_rgb():
+    rs = pytest.importorskip('pyrealsense2')
+    from realsense.coor_reconstruct import depth_image_to_points
+    intrinsics = rs.intrinsics()
+    intrinsics.width, intrinsics.height = RGB_FRAME.shape[1], RGB_FRAME.shape[0]
+    depth = np.full(RGB_FRAME.shape[:2], 1000, dtype=np.uint16)
+    df = depth_image_to_points(depth, RGB_FRAME, intrinsics, 0.001)
+    np.testing.assert_array_equal(point_colors(df, 'RGB'), RGB_FRAME[df['v'], df['u']])
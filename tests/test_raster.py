@@ -0,0 +1,59 @@
+"""realsense/raster.py: splat against the per-point cv2.circle / pixel loops it replaced."""
+import cv2
+import numpy as np
+import pytest
+from realsense.raster import splat, disk_offsets
+
+H, W = 60, 80
+
+def random_points(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    # 有些點落在影像外，圓點只畫到一部分
+    u = rng.integers(-6, W + 6, n)
+    v = rng.integers(-6, H + 6, n)
+    colors = rng.integers(0, 256, (n, 3), dtype=np.uint8)
+    depth = rng.uniform(0.5, 3, n)
+    return u, v, colors, depth
+
+def loop_splat(u, v, colors, radius, image=None):
+    image = np.zeros((H, W, 3), dtype=np.uint8) if image is None else image.copy()
+    for x, y, c in zip(u, v, colors):
+        if radius > 0:
+            cv2.circle(image, (int(x), int(y)), radius, tuple(int(k) for k in c), -1)
+        elif 0 <= x < W and 0 <= y < H:
+            image[y, x] = c
+    return image
+
+@pytest.mark.parametrize('radius', range(0, 9))
+def test_disk_offsets_match_cv2_circle(radius):
+    mask = np.zeros((2 * radius + 1, 2 * radius + 1), dtype=np.uint8)
+    cv2.circle(mask, (radius, radius), radius, 1, -1)
+    dy, dx = disk_offsets(radius)
+    disk = np.zeros_like(mask)
+    disk[dy + radius, dx + radius] = 1
+    np.testing.assert_array_equal(disk, mask)
+
+@pytest.mark.parametrize('radius', [0, 1, 2, 4])
+def test_splat_matches_loop(radius):
+    u, v, colors, _ = random_points(seed=radius)
+    np.testing.assert_array_equal(splat(u, v, colors, (H, W), radius=radius), loop_splat(u, v, colors, radius))
+
+@pytest.mark.parametrize('contiguous', [True, False])
+def test_splat_into_existing_image(contiguous):
+    u, v, colors, _ = random_points(seed=7)
+    base = np.random.default_rng(1).integers(0, 256, (H, W, 3), dtype=np.uint8)
+    out = base.copy() if contiguous else np.asfortranarray(base)
+    splat(u, v, colors, (H, W), radius=2, out=out)
+    np.testing.assert_array_equal(out, loop_splat(u, v, colors, 2, base))
+
+def test_splat_depth_keeps_nearest():
+    u, v, colors, depth = random_points(n=2000, seed=3)
+    out, zbuf = splat(u, v, colors, (H, W), depth=depth, return_depth=True)
+
+    ref = np.zeros((H, W, 3), dtype=np.uint8)
+    ref_z = np.full((H, W), np.inf)
+    for x, y, c, z in zip(u, v, colors, depth):
+        if 0 <= x < W and 0 <= y < H and z <= ref_z[y, x]:
+            ref[y, x], ref_z[y, x] = c, z
+    np.testing.assert_array_equal(out, ref)
+    np.testing.assert_array_equal(zbuf, ref_z)
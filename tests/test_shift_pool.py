@@ -0,0 +1,65 @@
+"""models/googlenet.py, models/vgg.py: size-generic shift_pool against the 256x256-only original."""
+import pytest
+import torch
+import torch.nn as nn
+
+pytest.importorskip('pydensecrf')
+import material_segmentation.models.googlenet as googlenet_module
+import material_segmentation.models.vgg as vgg_module
+from material_segmentation.bench_fcn import old_shift_pool, model_output
+
+MODULES = [('googlenet', googlenet_module), ('vgg16', vgg_module)]
+POOLS = [('maxpool', lambda: nn.MaxPool2d(3, stride=2, ceil_mode=True)),
+         ('adapool', lambda: nn.AdaptiveAvgPool2d((8, 8)))]
+
+def interleave_reference(x, pool2d):
+    # out[2i + dy, 2j + dx] = pool(padded x shifted by (dy, dx))[i, j], cropped to the input size
+    n, c, h, w = x.shape
+    x = nn.functional.pad(x, (1, 1, 1, 1))
+    if isinstance(pool2d, nn.AdaptiveAvgPool2d):
+        size = ((h + 1) // 2, (w + 1) // 2)
+        pool2d = lambda t: nn.functional.adaptive_avg_pool2d(t, size)
+    shifts = [pool2d(x[:, :, dy:dy + h + 1, dx:dx + w + 1]) for dy in (0, 1) for dx in (0, 1)]
+    ho, wo = shifts[0].shape[2:]
+    out = torch.zeros(n, c, 2 * ho, 2 * wo)
+    for k, s in enumerate(shifts):
+        out[:, :, k // 2::2, k % 2::2] = s
+    return out[:, :, :h, :w]
+
+@pytest.mark.parametrize('name, module', MODULES)
+@pytest.mark.parametrize('pool_name, pool', POOLS)
+def test_shift_pool_16x16_unchanged(name, module, pool_name, pool):
+    torch.manual_seed(0)
+    x = torch.relu(torch.randn(2, 64, 16, 16))
+    assert torch.equal(module.shift_pool(x, pool()), old_shift_pool(x, pool()))
+
+@pytest.mark.parametrize('name, module', MODULES)
+@pytest.mark.parametrize('pool_name, pool', POOLS)
+@pytest.mark.parametrize('size', [(16, 16), (32, 48), (19, 23), (7, 12)])
+def test_shift_pool_any_size(name, module, pool_name, pool, size):
+    torch.manual_seed(0)
+    x = torch.relu(torch.randn(1, 8, *size))
+    out = module.shift_pool(x, pool())
+    assert out.shape == x.shape
+    assert torch.equal(out, interleave_reference(x, pool()))
+
+@pytest.mark.parametrize('name, module', MODULES)
+def test_model_256x256_unchanged(name, module):
+    torch.manual_seed(0)
+    model = googlenet_module.googlenet().eval() if name == 'googlenet' else vgg_module.vgg16().eval()
+    rgb = torch.randn(1, 3, 256, 256) * 50
+    with torch.inference_mode():
+        new = model_output(module, model, rgb, module.shift_pool)
+        old = model_output(module, model, rgb, old_shift_pool)
+    assert new.shape == (1, 23, 16, 16)
+    assert torch.equal(new, old)
+
+@pytest.mark.parametrize('name, module', MODULES)
+@pytest.mark.parametrize('size', [(300, 417), (200, 136)])
+def test_model_any_size(name, module, size):
+    torch.manual_seed(0)
+    model = googlenet_module.googlenet().eval() if name == 'googlenet' else vgg_module.vgg16().eval()
+    with torch.inference_mode():
+        out = model(torch.randn(1, 3, *size) * 50)
+    assert out.shape == (1, 23, size[0] // 16, size[1] // 16)
+    assert torch.isfinite(out).all()
@@ -0,0 +1,75 @@
+"""realsense/voxel.py: voxel_downsample against a pandas groupby reference."""
+import numpy as np
+import pandas as pd
+import pytest
+from realsense.voxel import voxel_downsample
+
+def random_cloud(n=2000, seed=0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'x': rng.uniform(-1, 2, n).astype(np.float32),
+        'y': rng.uniform(0, 1, n).astype(np.float32),
+        'z': rng.uniform(0, 3, n).astype(np.float32),
+        'u': rng.integers(0, 640, n).astype(np.uint16),
+        'v': rng.integers(0, 480, n).astype(np.uint16),
+        'R': rng.integers(0, 256, n).astype(np.uint8),
+        'G': rng.integers(0, 256, n).astype(np.uint8),
+        'B': rng.integers(0, 256, n).astype(np.uint8),
+        'material': rng.choice(['wood', 'fabric', 'glass'], n),
+    })
+
+def groupby_reference(df: pd.DataFrame, voxel_size: float) -> pd.DataFrame:
+    xyz = df[['x', 'y', 'z']].to_numpy(dtype=np.float64)
+    cell = np.floor((xyz - xyz.min(axis=0)) / voxel_size).astype(np.int64)
+    t = df.assign(cx=cell[:, 0], cy=cell[:, 1], cz=cell[:, 2], x=xyz[:, 0], y=xyz[:, 1], z=xyz[:, 2])
+    rows = []
+    for _, g in t.groupby(['cx', 'cy', 'cz'], sort=False):
+        centroid = g[['x', 'y', 'z']].mean().to_numpy()
+        dist = np.square(g[['x', 'y', 'z']].to_numpy() - centroid).sum(axis=1)
+        nearest = g.index[np.flatnonzero(dist == dist.min()).min()]
+        rows.append({
+            'x': centroid[0], 'y': centroid[1], 'z': centroid[2],
+            'u': df.at[nearest, 'u'], 'v': df.at[nearest, 'v'],
+            'R': np.rint(g['R'].astype(np.float64).mean()),
+            'G': np.rint(g['G'].astype(np.float64).mean()),
+            'B': np.rint(g['B'].astype(np.float64).mean()),
+            'count': len(g), 'src_index': nearest, 'material': df.at[nearest, 'material'],
+        })
+    return pd.DataFrame(rows)
+
+@pytest.mark.parametrize('voxel_size', [.1, .3, 1.0])
+def test_matches_groupby(voxel_size):
+    df = random_cloud()
+    out = voxel_downsample(df, voxel_size).sort_values('src_index').reset_index(drop=True)
+    ref = groupby_reference(df, voxel_size).sort_values('src_index').reset_index(drop=True)
+    assert len(out) == len(ref)
+    np.testing.assert_array_equal(out['src_index'], ref['src_index'])
+    np.testing.assert_allclose(out[['x', 'y', 'z']], ref[['x', 'y', 'z']], rtol=1e-9, atol=1e-9)
+    for c in ('u', 'v', 'R', 'G', 'B', 'count'):
+        np.testing.assert_array_equal(out[c].to_numpy(), ref[c].to_numpy().astype(out[c].dtype), err_msg=c)
+    assert out['material'].tolist() == ref['material'].tolist()
+    assert out['count'].sum() == len(df)
+
+def test_counts_accumulate():
+    df = random_cloud()
+    once = voxel_downsample(df, .1).drop(columns='src_index')
+    twice = voxel_downsample(once, .5)
+    assert twice['count'].sum() == len(df)
+
+def test_empty_and_invalid():
+    df = random_cloud().iloc[:0]
+    assert len(voxel_downsample(df, .1)) == 0
+    with pytest.raises(ValueError):
+        voxel_downsample(random_cloud(10), 0)
+
+def test_image_labels_follow_the_representative_pixel():
+    # detection / material lookups on the downsampled cloud == labelling every point, then taking src_index
+    pytest.importorskip('pydensecrf')
+    from material_segmentation.run_on_image_cpu import get_material
+    df = random_cloud(seed=3)
+    labelmap = np.random.default_rng(4).integers(0, 4, (480, 640))
+    labels = ['wood', 'fabric', 'glass']
+    full = df.apply(lambda row: get_material(row, labelmap, labels), axis=1)
+    out = voxel_downsample(df, .3)
+    voxels = out.apply(lambda row: get_material(row, labelmap, labels), axis=1)
+    assert voxels.tolist() == full.iloc[out['src_index']].tolist()